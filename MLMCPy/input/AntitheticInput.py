@@ -0,0 +1,77 @@
+import numpy as np
+
+from Input import Input
+
+
+class AntitheticInput(Input):
+    """
+    Draws samples from another input in antithetic pairs: each sample is
+    followed by its reflection, a sample with the same distribution that is
+    negatively correlated with it. The outputs of monotone models on the two
+    samples of a pair are then negatively correlated as well, so that their
+    mean varies less than the mean of two independent samples.
+    MLMCSimulator averages the outputs of each pair before computing the
+    statistics of a level.
+    """
+    sample_group_size = 2
+
+    def __init__(self, data, reflection):
+        """
+        :param data: Input from which the first sample of each pair is drawn.
+        :type data: Input
+        :param reflection: Maps a 2d ndarray of samples, one per row, to
+            their antithetic samples, such as lambda x: 1. - x for samples
+            uniform on (0, 1), or lambda x: 2. * mean - x for samples of any
+            distribution symmetric about its mean.
+        :type reflection: function
+        """
+        if not isinstance(data, Input):
+            raise TypeError("data must inherit from Input class.")
+
+        if not callable(reflection):
+            raise TypeError("reflection must be a function.")
+
+        self._data = data
+        self._reflection = reflection
+
+    def draw_samples(self, num_samples):
+        """
+        Returns num_samples samples, each sample drawn from the wrapped input
+        followed by its reflection. An odd number of samples ends with an
+        unpaired sample.
+
+        :param num_samples: Number of samples to return.
+        :type num_samples: int
+        :return: 2d ndarray with one sample per row.
+        """
+        if not isinstance(num_samples, int):
+            raise TypeError("num_samples must be an integer.")
+
+        if num_samples <= 0:
+            raise ValueError("num_samples must be a positive integer.")
+
+        samples = self._data.draw_samples((num_samples + 1) // 2)
+
+        return self.create_pairs(samples, self._reflection)[:num_samples]
+
+    def reset_sampling(self):
+        """
+        Resets sampling of the wrapped input.
+        """
+        self._data.reset_sampling()
+
+    @staticmethod
+    def create_pairs(samples, reflection):
+        """
+        Follows each sample with its reflection.
+
+        :param samples: ndarray of samples, one per row.
+        :param reflection: Maps a 2d ndarray of samples to their antithetic
+            samples.
+        :return: 2d ndarray with twice as many rows as samples.
+        """
+        samples = samples.reshape(samples.shape[0], -1)
+        reflected_samples = np.reshape(reflection(samples), samples.shape)
+
+        return np.stack([samples, reflected_samples], axis=1) \
+            .reshape(-1, samples.shape[1])
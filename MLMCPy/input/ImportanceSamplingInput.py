@@ -0,0 +1,173 @@
+import numpy as np
+import scipy.stats
+
+from Input import Input
+from RandomInput import RandomInput
+
+
+class ImportanceSamplingInput(Input):
+    """
+    Draws samples from a biasing density in place of the nominal density of
+    the inputs, and gives the likelihood ratio of each sample: its nominal
+    density over its biasing density. MLMCSimulator multiplies the output
+    differences of each sample by its likelihood ratio, so that the
+    estimates remain those of the nominal density. A biasing density
+    concentrated on a rare event, such as a far tail of the outputs of a
+    CDFWrapperModel, puts far more samples in the event, so that its
+    probability is estimated with far fewer samples.
+    """
+    def __init__(self, data, nominal_density, biasing_density):
+        """
+        :param data: Input drawing samples from the biasing density.
+        :type data: Input
+        :param nominal_density: Density of the inputs, given either as a
+            function of a 2d ndarray of samples, one per row, or as an object
+            with a pdf function such as a frozen scipy.stats distribution.
+            If a density value is returned for each dimension of a sample,
+            the dimensions are taken as independent and the values are
+            multiplied.
+        :type nominal_density: function
+        :param biasing_density: Density of the samples drawn from data,
+            given as for nominal_density.
+        :type biasing_density: function
+        """
+        self.__check_init_parameters(data, nominal_density, biasing_density)
+
+        self._data = data
+        self._nominal_density = nominal_density
+        self._biasing_density = biasing_density
+
+    def draw_samples(self, num_samples):
+        """
+        Returns num_samples samples of the biasing density.
+
+        :param num_samples: Number of samples to return.
+        :type num_samples: int
+        :return: 2d ndarray with one sample per row.
+        """
+        return self._data.draw_samples(num_samples)
+
+    def reset_sampling(self):
+        """
+        Resets sampling of the wrapped input.
+        """
+        self._data.reset_sampling()
+
+    def get_likelihood_ratios(self, samples):
+        """
+        Computes the nominal density over the biasing density of each sample.
+
+        :param samples: ndarray of samples, one per row.
+        :return: 1d ndarray of likelihood ratios.
+        """
+        samples = samples.reshape(samples.shape[0], -1)
+
+        return self._evaluate_density(self._nominal_density, samples) / \
+            self._evaluate_density(self._biasing_density, samples)
+
+    @classmethod
+    def from_cross_entropy(cls, data, nominal_density, model, threshold,
+                           exceedance=True, num_samples=1000,
+                           elite_fraction=.1, max_iterations=10):
+        """
+        Tunes a normal biasing density for the event that the output of a
+        model exceeds a threshold, or is at or below it, with the cross
+        entropy method. The density has the mean and covariance of pilot
+        samples of the nominal density. Its mean is then moved to the
+        likelihood ratio weighted mean of the samples with the largest
+        elite_fraction of outputs in the direction of the event, and samples
+        are drawn again, until these samples reach the threshold. Only the
+        mean is tuned, since refitting the covariance to few samples with
+        uneven weights can collapse it. A cheap model, such as the coarsest
+        level of a simulation, is usually good enough.
+
+        :param data: Input drawing samples of the nominal density.
+        :type data: Input
+        :param nominal_density: Density of the inputs, given as for
+            __init__().
+        :type nominal_density: function
+        :param model: Model with a single output.
+        :type model: Model
+        :param threshold: Output value defining the event.
+        :type threshold: float
+        :param exceedance: Whether the event is an output above the
+            threshold rather than at or below it.
+        :type exceedance: bool
+        :param num_samples: Number of samples of each iteration.
+        :type num_samples: int
+        :param elite_fraction: Fraction of samples the mean is moved to.
+        :type elite_fraction: float
+        :param max_iterations: Maximum number of moves of the mean.
+        :type max_iterations: int
+        :return: ImportanceSamplingInput drawing from the tuned density.
+        """
+        if not isinstance(num_samples, int):
+            raise TypeError("num_samples must be an integer.")
+
+        if not 0. < elite_fraction < 1. or \
+                num_samples * elite_fraction < 2:
+            raise ValueError("elite_fraction must be in (0, 1) and leave " +
+                             "at least two samples.")
+
+        samples = data.draw_samples(num_samples)
+        samples = samples.reshape(samples.shape[0], -1)
+
+        mean = np.mean(samples, axis=0)
+        covariance = np.atleast_2d(np.cov(samples, rowvar=False))
+        likelihood_ratios = np.ones(samples.shape[0])
+
+        # The event is taken as a large score in both directions.
+        direction = 1. if exceedance else -1.
+
+        for _ in range(max_iterations):
+
+            scores = direction * np.ravel(model.evaluate_batch(samples))
+
+            level = min(np.percentile(scores, 100. * (1. - elite_fraction)),
+                        direction * threshold)
+            elite = scores >= level
+
+            mean = np.average(samples[elite], axis=0,
+                              weights=likelihood_ratios[elite])
+
+            if level >= direction * threshold:
+                break
+
+            biasing_density = scipy.stats.multivariate_normal(mean, covariance)
+
+            samples = np.random.multivariate_normal(mean, covariance,
+                                                    num_samples)
+
+            likelihood_ratios = \
+                cls._evaluate_density(nominal_density, samples) / \
+                cls._evaluate_density(biasing_density, samples)
+
+        biasing_data = RandomInput(np.random.multivariate_normal, mean=mean,
+                                   cov=covariance)
+        biasing_density = scipy.stats.multivariate_normal(mean, covariance)
+
+        return cls(biasing_data, nominal_density, biasing_density)
+
+    @staticmethod
+    def _evaluate_density(density, samples):
+        """
+        :param density: Function or object with a pdf function.
+        :param samples: 2d ndarray of samples.
+        :return: 1d ndarray of the density of each sample.
+        """
+        density = getattr(density, 'pdf', density)
+        values = np.reshape(density(samples), (samples.shape[0], -1))
+
+        return np.prod(values, axis=1)
+
+    @staticmethod
+    def __check_init_parameters(data, nominal_density, biasing_density):
+
+        if not isinstance(data, Input):
+            raise TypeError("data must inherit from Input class.")
+
+        for density in [nominal_density, biasing_density]:
+
+            if not callable(getattr(density, 'pdf', density)):
+                raise TypeError("densities must be functions or have a " +
+                                "pdf function.")
@@ -5,6 +5,10 @@ class Input(object):
     """
     Abstract base class defining data inputs from which samples can be drawn.
     """
+    # Number of consecutive samples forming a group, such as an antithetic
+    # pair, whose outputs are averaged before computing level statistics.
+    sample_group_size = 1
+
     @abc.abstractmethod
     def draw_samples(self, num_samples):
         """
@@ -0,0 +1,72 @@
+import numpy as np
+
+from StratifiedInput import StratifiedInput
+
+
+class LatinHypercubeInput(StratifiedInput):
+    """
+    Draws Latin hypercube samples in blocks. Each block divides every
+    dimension into as many equal intervals as it has samples, and places
+    exactly one sample in each interval of each dimension, pairing the
+    intervals of different dimensions at random. Unlike a grid of strata,
+    the block size does not grow with the number of dimensions, and means
+    over a block of functions dominated by the separate effects of each
+    dimension vary much less than over independent samples.
+
+    Blocks are drawn, extended, and divided among CPUs as in StratifiedInput.
+    """
+    def __init__(self, num_dimensions, block_size, distributions=None,
+                 random_seed=None):
+        """
+        :param num_dimensions: Number of values in each sample.
+        :type num_dimensions: int
+        :param block_size: Number of samples of each block.
+        :type block_size: int
+        :param distributions: Inverse cumulative distribution function of
+            each dimension, given either as a function of values in (0, 1) or
+            as an object with a ppf function such as a frozen
+            scipy.stats distribution. A single entry is used for all
+            dimensions. Samples are uniform on (0, 1) if None.
+        :type distributions: list or function
+        :param random_seed: Seed of the blocks.
+        :type random_seed: int
+        """
+        self.__check_init_parameters(num_dimensions, block_size,
+                                     distributions)
+
+        self._num_dimensions = num_dimensions
+
+        self.sample_group_size = block_size
+
+        self._set_distributions(distributions)
+        self._set_random_seed(random_seed)
+
+    def _get_unit_block(self, random_state):
+        """
+        Places one uniformly distributed point in each interval of each
+        dimension of the unit cube.
+
+        :param random_state: numpy RandomState of the block.
+        :return: 2d ndarray with one point per row.
+        """
+        block_size = self.sample_group_size
+
+        intervals = np.array([random_state.permutation(block_size)
+                              for _ in range(self._num_dimensions)]).T
+
+        offsets = random_state.uniform(size=intervals.shape)
+
+        return (intervals + offsets) / float(block_size)
+
+    @classmethod
+    def __check_init_parameters(cls, num_dimensions, block_size,
+                                distributions):
+
+        cls._check_dimensions_and_distributions(num_dimensions,
+                                                distributions)
+
+        if not isinstance(block_size, int):
+            raise TypeError("block_size must be an integer.")
+
+        if block_size < 1:
+            raise ValueError("block_size must be a positive integer.")
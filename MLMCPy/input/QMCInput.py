@@ -0,0 +1,272 @@
+import numpy as np
+
+from UnitCubeInput import UnitCubeInput
+
+# Degree s, polynomial coefficients a, and initial direction numbers m of
+# dimensions 2 to 21 of the Sobol sequence, from the new-joe-kuo-6.21201
+# table of Joe and Kuo.
+_DIRECTION_NUMBERS = [(1, 0, [1]),
+                      (2, 1, [1, 3]),
+                      (3, 1, [1, 3, 1]),
+                      (3, 2, [1, 1, 1]),
+                      (4, 1, [1, 1, 3, 3]),
+                      (4, 4, [1, 3, 5, 13]),
+                      (5, 2, [1, 1, 5, 5, 17]),
+                      (5, 4, [1, 1, 5, 5, 5]),
+                      (5, 7, [1, 1, 7, 11, 19]),
+                      (5, 11, [1, 1, 5, 1, 1]),
+                      (5, 13, [1, 1, 1, 3, 11]),
+                      (5, 14, [1, 3, 5, 5, 31]),
+                      (6, 1, [1, 3, 3, 9, 7, 49]),
+                      (6, 13, [1, 1, 1, 15, 21, 21]),
+                      (6, 16, [1, 3, 1, 13, 27, 49]),
+                      (6, 19, [1, 1, 1, 15, 7, 5]),
+                      (6, 22, [1, 3, 1, 15, 13, 25]),
+                      (6, 25, [1, 1, 5, 5, 19, 61]),
+                      (7, 1, [1, 3, 7, 11, 23, 15, 103]),
+                      (7, 4, [1, 3, 7, 13, 13, 15, 69])]
+
+# Number of bits of each coordinate of a point.
+_NUM_BITS = 32
+
+
+class QMCInput(UnitCubeInput):
+    """
+    Draws randomized quasi-Monte Carlo samples from a Sobol sequence, which
+    fill the unit cube more evenly than independent random samples, so that
+    means of smooth functions converge faster. The points are randomized by
+    a random linear scramble and digital shift, which keeps their even
+    spacing while making each randomization an unbiased sample. Points are
+    mapped to the desired distributions through inverse cumulative
+    distribution functions.
+
+    Points can be generated starting from any position of the sequence, so
+    when running on multiple CPUs each one only generates its own share.
+    """
+    def __init__(self, num_dimensions, distributions=None, random_seed=None):
+        """
+        :param num_dimensions: Number of values in each sample, at most 21.
+        :type num_dimensions: int
+        :param distributions: Inverse cumulative distribution function of
+            each dimension, given either as a function of values in (0, 1) or
+            as an object with a ppf function such as a frozen
+            scipy.stats distribution. A single entry is used for all
+            dimensions. Samples are uniform on (0, 1) if None.
+        :type distributions: list or function
+        :param random_seed: Seed of the randomizations.
+        :type random_seed: int
+        """
+        self.__check_init_parameters(num_dimensions, distributions)
+
+        self._num_dimensions = num_dimensions
+
+        self._set_distributions(distributions)
+
+        if random_seed is None:
+            random_seed = np.random.randint(2 ** 31 - 1)
+
+        self._random_seed = random_seed
+
+        self._direction_numbers = self._compute_direction_numbers()
+
+        # Scrambled direction numbers and shifts of each randomization.
+        self._randomizations = {}
+
+        # Position of the next point drawn by draw_samples().
+        self._position = 0
+
+    def draw_samples(self, num_samples):
+        """
+        Returns the next num_samples points of the first randomization.
+
+        :param num_samples: Number of samples to return.
+        :type num_samples: int
+        :return: 2d ndarray with one sample per row.
+        """
+        return self.draw_cpu_samples(num_samples, 0, 1)
+
+    def draw_cpu_samples(self, num_samples, cpu_rank, num_cpus):
+        """
+        Returns the share of the current CPU of the next num_samples points of
+        the first randomization, generating only that share. Shares are
+        consecutive blocks of points in order of CPU rank.
+
+        :param num_samples: Total number of samples over all CPUs.
+        :type num_samples: int
+        :param cpu_rank: Rank of this CPU.
+        :type cpu_rank: int
+        :param num_cpus: Number of CPUs.
+        :type num_cpus: int
+        :return: 2d ndarray with one sample per row.
+        """
+        if not isinstance(num_samples, int):
+            raise TypeError("num_samples must be an integer.")
+
+        if num_samples <= 0:
+            raise ValueError("num_samples must be a positive integer.")
+
+        start, num_cpu_samples = \
+            self.get_cpu_share(num_samples, cpu_rank, num_cpus)
+
+        samples = self.get_points(0, self._position + start, num_cpu_samples)
+        self._position += num_samples
+
+        return samples
+
+    def get_points(self, randomization, start, num_points):
+        """
+        Returns consecutive points of an independent randomization of the
+        sequence.
+
+        :param randomization: Number identifying the randomization.
+        :type randomization: int
+        :param start: Position in the sequence of the first point.
+        :type start: int
+        :param num_points: Number of points.
+        :type num_points: int
+        :return: 2d ndarray with one point per row.
+        """
+        if start + num_points > 2 ** _NUM_BITS:
+            raise ValueError("Only the first 2^32 points can be generated.")
+
+        direction_numbers, shift = self._get_randomization(randomization)
+
+        indices = np.arange(start, start + num_points, dtype=np.uint64)
+        points = np.zeros((num_points, self._num_dimensions), dtype=np.uint64)
+
+        # Each point is the exclusive or of the direction numbers selected by
+        # the bits of its index.
+        num_index_bits = int(start + num_points - 1).bit_length() \
+            if num_points > 0 else 0
+
+        for bit in range(num_index_bits):
+
+            selected = ((indices >> np.uint64(bit)) & np.uint64(1)) \
+                .astype(bool)
+
+            points[selected] ^= direction_numbers[:, bit]
+
+        points ^= shift
+
+        # Take the center of the cell so that points are never 0 or 1.
+        uniform_points = (points + .5) / 2. ** _NUM_BITS
+
+        return self._apply_distributions(uniform_points)
+
+    def reset_sampling(self):
+        """
+        Restarts draw_samples() from the beginning of the sequence.
+        """
+        self._position = 0
+
+    @staticmethod
+    def get_cpu_share(num_samples, cpu_rank, num_cpus):
+        """
+        Determines the block of samples of a CPU, with the same division of
+        samples among CPUs as MLMCSimulator.
+
+        :return: tuple of the offset of the block and its number of samples.
+        """
+        num_cpu_samples = num_samples // num_cpus
+        remainder = num_samples - num_cpu_samples * num_cpus
+
+        start = cpu_rank * num_cpu_samples + min(cpu_rank, remainder)
+
+        if cpu_rank < remainder:
+            num_cpu_samples += 1
+
+        return start, num_cpu_samples
+
+    def _compute_direction_numbers(self):
+        """
+        Computes the direction numbers of each dimension, with the first bit
+        of each coordinate stored in the most significant of 32 bits.
+
+        :return: 2d ndarray with one row of 32 direction numbers per dimension.
+        """
+        direction_numbers = np.zeros((self._num_dimensions, _NUM_BITS),
+                                     dtype=np.uint64)
+
+        for bit in range(_NUM_BITS):
+            direction_numbers[0, bit] = 1 << (_NUM_BITS - 1 - bit)
+
+        for dimension in range(1, self._num_dimensions):
+
+            degree, coefficients, initial_numbers = \
+                _DIRECTION_NUMBERS[dimension - 1]
+
+            numbers = [m << (_NUM_BITS - 1 - bit)
+                       for bit, m in enumerate(initial_numbers)]
+
+            for bit in range(degree, _NUM_BITS):
+
+                number = numbers[bit - degree] ^ \
+                    (numbers[bit - degree] >> degree)
+
+                for i in range(1, degree):
+                    if (coefficients >> (degree - 1 - i)) & 1:
+                        number ^= numbers[bit - i]
+
+                numbers.append(number)
+
+            direction_numbers[dimension] = numbers
+
+        return direction_numbers
+
+    def _get_randomization(self, randomization):
+        """
+        Returns the scrambled direction numbers and digital shift of a
+        randomization, creating them on first use. Each coordinate is
+        multiplied by a random lower triangular binary matrix with unit
+        diagonal and then combined with a random shift by exclusive or.
+        """
+        if randomization in self._randomizations:
+            return self._randomizations[randomization]
+
+        random_state = np.random.RandomState([self._random_seed,
+                                              randomization])
+
+        scrambled = np.zeros_like(self._direction_numbers)
+
+        for dimension in range(self._num_dimensions):
+
+            for row in range(_NUM_BITS):
+
+                # Bits of the matrix row, left of and on the diagonal.
+                row_bits = random_state.randint(0, 2, row + 1)
+                row_bits[row] = 1
+
+                mask = 0
+                for column, row_bit in enumerate(row_bits):
+                    if row_bit:
+                        mask |= 1 << (_NUM_BITS - 1 - column)
+
+                parity = self._get_parity(self._direction_numbers[dimension] &
+                                          np.uint64(mask))
+
+                scrambled[dimension] |= parity << \
+                    np.uint64(_NUM_BITS - 1 - row)
+
+        shift = random_state.randint(0, 2 ** 16, (2, self._num_dimensions))
+        shift = (shift[0].astype(np.uint64) << np.uint64(16)) | \
+            shift[1].astype(np.uint64)
+
+        self._randomizations[randomization] = (scrambled, shift)
+
+        return scrambled, shift
+
+    @staticmethod
+    def _get_parity(values):
+        """
+        Returns 1 for values with an odd number of set bits and 0 otherwise.
+        """
+        for shift in [16, 8, 4, 2, 1]:
+            values = values ^ (values >> np.uint64(shift))
+
+        return values & np.uint64(1)
+
+    @classmethod
+    def __check_init_parameters(cls, num_dimensions, distributions):
+
+        cls._check_dimensions_and_distributions(num_dimensions, distributions,
+                                                len(_DIRECTION_NUMBERS) + 1)
@@ -1,16 +1,18 @@
 import numpy as np
 
 from Input import Input
+from AntitheticInput import AntitheticInput
 
 
 class RandomInput(Input):
     """
     Used to draw samples from a specified distribution . Any distribution
     function provided must accept a "size" parameter that determines the
-    sample size.
+    sample size. Samples can be drawn in antithetic pairs, as in
+    AntitheticInput.
     """
     def __init__(self, distribution_function, random_seed=None,
-                 **distribution_function_args):
+                 antithetic_function=None, **distribution_function_args):
         """
         :param distribution_function: Returns a sample of a distribution
             with the sample sized determined by a "size" parameter. Typically,
@@ -19,11 +21,24 @@ class RandomInput(Input):
         :param distribution_function_args: Any arguments required by the
             distribution function, with the exception of "size", which will be
             provided to the function when draw_samples is called.
+        :param antithetic_function: Maps a 2d ndarray of samples, one per
+            row, to their antithetic samples. If provided, each sample drawn
+            is followed by its antithetic sample.
+        :type antithetic_function: function
         """
 
         if not callable(distribution_function):
             raise TypeError('distribution_function must be a function.')
 
+        if antithetic_function is not None and \
+                not callable(antithetic_function):
+            raise TypeError('antithetic_function must be a function.')
+
+        self._antithetic_function = antithetic_function
+
+        if antithetic_function is not None:
+            self.sample_group_size = 2
+
         self._distribution = distribution_function
         self._args = distribution_function_args
 
@@ -49,7 +64,11 @@ class RandomInput(Input):
         if num_samples <= 0:
             raise ValueError("num_samples must be a positive integer.")
 
-        self._args['size'] = num_samples
+        # Only the first sample of each antithetic pair is drawn.
+        if self._antithetic_function is not None:
+            self._args['size'] = (num_samples + 1) // 2
+        else:
+            self._args['size'] = num_samples
 
         sample = self._distribution(**self._args)
 
@@ -57,6 +76,10 @@ class RandomInput(Input):
         # one dimensional data to a 2d array with one column.
         samples = sample.reshape(sample.shape[0], -1)
 
+        if self._antithetic_function is not None:
+            samples = AntitheticInput.create_pairs(
+                samples, self._antithetic_function)[:num_samples]
+
         return samples
 
     def reset_sampling(self):
@@ -0,0 +1,179 @@
+import numpy as np
+
+from UnitCubeInput import UnitCubeInput
+
+
+class StratifiedInput(UnitCubeInput):
+    """
+    Draws stratified samples in blocks. The unit cube is divided into a grid
+    of strata, and each block has one uniformly distributed point in every
+    stratum, so that each block covers the cube evenly and the means of
+    smooth functions over a block vary less than over independent samples.
+    Points are mapped to the desired distributions through inverse
+    cumulative distribution functions.
+
+    Blocks are independent of each other, so a level can be extended by
+    drawing more blocks, and MLMCSimulator estimates variances from the
+    means of the blocks, with sample sizes in whole blocks. Each block is
+    generated from its own position in the sequence of blocks, so that when
+    running on multiple CPUs each one only generates its own share.
+    """
+    def __init__(self, num_dimensions, num_strata, distributions=None,
+                 random_seed=None):
+        """
+        :param num_dimensions: Number of values in each sample.
+        :type num_dimensions: int
+        :param num_strata: Number of strata along each dimension, given
+            either for all dimensions or for each one. Each block has as many
+            samples as there are strata.
+        :type num_strata: int or list of ints
+        :param distributions: Inverse cumulative distribution function of
+            each dimension, given either as a function of values in (0, 1) or
+            as an object with a ppf function such as a frozen
+            scipy.stats distribution. A single entry is used for all
+            dimensions. Samples are uniform on (0, 1) if None.
+        :type distributions: list or function
+        :param random_seed: Seed of the blocks.
+        :type random_seed: int
+        """
+        self.__check_init_parameters(num_dimensions, num_strata,
+                                     distributions)
+
+        if not isinstance(num_strata, list):
+            num_strata = [num_strata]
+
+        if len(num_strata) == 1:
+            num_strata = num_strata * num_dimensions
+
+        self._num_dimensions = num_dimensions
+        self._num_strata = num_strata
+
+        self.sample_group_size = int(np.prod(num_strata))
+
+        self._set_distributions(distributions)
+        self._set_random_seed(random_seed)
+
+    def draw_samples(self, num_samples):
+        """
+        Returns the samples of the next blocks, ending with a partial block
+        if num_samples is not a multiple of the block size.
+
+        :param num_samples: Number of samples to return.
+        :type num_samples: int
+        :return: 2d ndarray with one sample per row.
+        """
+        return self.draw_cpu_samples(num_samples, 0, 1)
+
+    def draw_cpu_samples(self, num_samples, cpu_rank, num_cpus):
+        """
+        Returns the share of the current CPU of the samples of the next
+        blocks, generating only that share. Blocks are divided among CPUs as
+        MLMCSimulator divides sample groups, in consecutive runs of blocks in
+        order of CPU rank.
+
+        :param num_samples: Total number of samples over all CPUs.
+        :type num_samples: int
+        :param cpu_rank: Rank of this CPU.
+        :type cpu_rank: int
+        :param num_cpus: Number of CPUs.
+        :type num_cpus: int
+        :return: 2d ndarray with one sample per row.
+        """
+        if not isinstance(num_samples, int):
+            raise TypeError("num_samples must be an integer.")
+
+        if num_samples <= 0:
+            raise ValueError("num_samples must be a positive integer.")
+
+        block_size = self.sample_group_size
+        num_blocks = -(-num_samples // block_size)
+
+        num_cpu_blocks = num_blocks // num_cpus
+        remainder = num_blocks - num_cpu_blocks * num_cpus
+
+        start = cpu_rank * num_cpu_blocks + min(cpu_rank, remainder)
+
+        if cpu_rank < remainder:
+            num_cpu_blocks += 1
+
+        blocks = [self.get_block(self._position + block)
+                  for block in range(start, start + num_cpu_blocks)]
+
+        self._position += num_blocks
+
+        samples = np.zeros((0, self._num_dimensions))
+        if blocks:
+            samples = np.vstack(blocks)
+
+        # Only the last block overall may be partial.
+        num_cpu_samples = min(samples.shape[0],
+                              max(num_samples - start * block_size, 0))
+
+        return samples[:num_cpu_samples]
+
+    def get_block(self, block):
+        """
+        Returns the samples of a block, which depend only on the random seed
+        and the position of the block.
+
+        :param block: Position of the block in the sequence of blocks.
+        :type block: int
+        :return: 2d ndarray with one sample per row.
+        """
+        random_state = np.random.RandomState([self._random_seed, block])
+
+        return self._apply_distributions(
+            self._get_unit_block(random_state))
+
+    def reset_sampling(self):
+        """
+        Restarts draw_samples() from the first block.
+        """
+        self._position = 0
+
+    def _get_unit_block(self, random_state):
+        """
+        Places one uniformly distributed point in each stratum of the unit
+        cube.
+
+        :param random_state: numpy RandomState of the block.
+        :return: 2d ndarray with one point per row.
+        """
+        strata = np.indices(self._num_strata).reshape(self._num_dimensions,
+                                                      -1).T
+
+        offsets = random_state.uniform(size=strata.shape)
+
+        return (strata + offsets) / np.array(self._num_strata, dtype=float)
+
+    def _set_random_seed(self, random_seed):
+
+        if random_seed is None:
+            random_seed = np.random.randint(2 ** 31 - 1)
+
+        self._random_seed = random_seed
+
+        # Position of the next block drawn by draw_samples().
+        self._position = 0
+
+    @classmethod
+    def __check_init_parameters(cls, num_dimensions, num_strata,
+                                distributions):
+
+        cls._check_dimensions_and_distributions(num_dimensions,
+                                                distributions)
+
+        if not isinstance(num_strata, list):
+            num_strata = [num_strata]
+
+        if len(num_strata) not in [1, num_dimensions]:
+            raise ValueError("Provide one number of strata or one per " +
+                             "dimension.")
+
+        for strata in num_strata:
+
+            if not isinstance(strata, int):
+                raise TypeError("num_strata must be integers.")
+
+            if strata < 1:
+                raise ValueError("num_strata must be positive integers.")
@@ -0,0 +1,78 @@
+import numpy as np
+
+from Input import Input
+
+
+class UnitCubeInput(Input):
+    """
+    Abstract base class of inputs generating points in the unit cube, such as
+    quasi-Monte Carlo or stratified points, which are mapped to the desired
+    distributions through inverse cumulative distribution functions.
+    """
+    def _set_distributions(self, distributions):
+        """
+        :param distributions: Inverse cumulative distribution function of
+            each dimension, or a single one for all dimensions, or None.
+        """
+        if distributions is not None and not isinstance(distributions, list):
+            distributions = [distributions]
+
+        if distributions is not None and len(distributions) == 1:
+            distributions = distributions * self._num_dimensions
+
+        self._distributions = distributions
+
+    def _apply_distributions(self, uniform_points):
+        """
+        :param uniform_points: 2d ndarray of points in the unit cube, one per
+            row.
+        :return: 2d ndarray of the points mapped to the distributions of
+            each dimension.
+        """
+        if self._distributions is None:
+            return uniform_points
+
+        points = np.empty_like(uniform_points)
+
+        for dimension, distribution in enumerate(self._distributions):
+
+            inverse_cdf = getattr(distribution, 'ppf', distribution)
+            points[:, dimension] = inverse_cdf(uniform_points[:, dimension])
+
+        return points
+
+    @staticmethod
+    def _check_dimensions_and_distributions(num_dimensions, distributions,
+                                            max_dimensions=None):
+        """
+        Inspect the number of dimensions and distributions given to init.
+
+        :param max_dimensions: Largest number of dimensions supported, or
+            None if unlimited.
+        """
+        if not isinstance(num_dimensions, int):
+            raise TypeError("num_dimensions must be an integer.")
+
+        if max_dimensions is not None and \
+                not 1 <= num_dimensions <= max_dimensions:
+
+            raise ValueError("num_dimensions must be between 1 and %s." %
+                             max_dimensions)
+
+        if num_dimensions < 1:
+            raise ValueError("num_dimensions must be a positive integer.")
+
+        if distributions is None:
+            return
+
+        if not isinstance(distributions, list):
+            distributions = [distributions]
+
+        if len(distributions) not in [1, num_dimensions]:
+            raise ValueError("Provide one distribution or one per dimension.")
+
+        for distribution in distributions:
+
+            if not callable(getattr(distribution, 'ppf', distribution)):
+                raise TypeError("distributions must be functions or have " +
+                                "a ppf function.")
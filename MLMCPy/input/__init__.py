@@ -1,3 +1,8 @@
 from Input import Input
 from RandomInput import RandomInput
 from InputFromData import InputFromData
+from QMCInput import QMCInput
+from AntitheticInput import AntitheticInput
+from ImportanceSamplingInput import ImportanceSamplingInput
+from StratifiedInput import StratifiedInput
+from LatinHypercubeInput import LatinHypercubeInput
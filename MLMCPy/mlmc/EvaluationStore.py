@@ -0,0 +1,277 @@
+import hashlib
+import numpy as np
+import os
+import pickle
+import sqlite3
+
+from MLMCPy.model import Model
+
+
+class EvaluationStore(object):
+    """
+    Keeps model outputs in an sqlite file so that they can be reused by later
+    simulations. Outputs are addressed by a hash of the identity of the model
+    and the values of the sample. When the file grows beyond its size limit,
+    the least recently used outputs are discarded.
+
+    Pass an EvaluationStore to MLMCSimulator to have it consult the store
+    before evaluating a model.
+    """
+    def __init__(self, path, max_bytes=None):
+        """
+        :param path: Path of the sqlite file. Created if it does not exist.
+        :type path: str
+        :param max_bytes: Maximum total size in bytes of the stored outputs.
+            Unlimited if None.
+        :type max_bytes: int
+        """
+        self.__check_init_parameters(path, max_bytes)
+
+        self._path = path
+        self._max_bytes = max_bytes
+
+        # Several processes may share the file, so wait for locks.
+        self._connection = sqlite3.connect(path, timeout=60.)
+
+        with self._connection:
+            self._connection.execute("CREATE TABLE IF NOT EXISTS evaluations "
+                                     "(key BLOB PRIMARY KEY, "
+                                     "output BLOB NOT NULL, "
+                                     "evaluation_time REAL NOT NULL, "
+                                     "size INTEGER NOT NULL, "
+                                     "last_used INTEGER NOT NULL)")
+
+            self._connection.execute("CREATE INDEX IF NOT EXISTS "
+                                     "evaluations_last_used ON "
+                                     "evaluations (last_used)")
+
+        # Increasing counter used to order entries by their last use.
+        self._clock = self._connection.execute(
+            "SELECT COALESCE(MAX(last_used), 0) FROM evaluations").fetchone()[0]
+
+        # Running total of the stored size, so that saving does not need to
+        # add up the sizes of all entries. Outputs saved by other processes
+        # sharing the file after it was opened are not counted.
+        self._size = self.get_size()
+
+    @classmethod
+    def get_model_key(cls, model):
+        """
+        Determines the identity of a model. Models may define a cache_key
+        attribute to name themselves; otherwise the key is a hash of the
+        class and attributes of the model, so models of the same class with
+        the same settings and data share stored outputs. Attributes named in
+        the runtime_attributes of a model, such as caches and counters that
+        change as it is evaluated, are left out so that the key stays the
+        same once the model has been used.
+
+        :param model: Model to be identified.
+        :return: str identifying the model.
+        """
+        cache_key = getattr(model, 'cache_key', None)
+        if cache_key is not None:
+            return str(cache_key)
+
+        try:
+            pickled_model = pickle.dumps(cls._get_configuration(model), 2)
+        except (pickle.PicklingError, TypeError):
+            raise TypeError("Model of type %s can not be pickled; give it a "
+                            "cache_key attribute to store its outputs."
+                            % type(model).__name__)
+
+        return hashlib.sha1(pickled_model).hexdigest()
+
+    def load(self, model_key, samples):
+        """
+        Retrieves stored outputs of a model.
+
+        :param model_key: str identifying the model.
+        :param samples: 2d ndarray with one sample per row.
+        :return: tuple containing a list with a 1d ndarray of outputs for each
+            sample, or None where no output is stored, and the total time that
+            was originally spent computing the retrieved outputs.
+        """
+        keys = [self._get_key(model_key, sample) for sample in samples]
+
+        outputs = [None] * len(keys)
+        evaluation_time = 0.
+        found_keys = []
+
+        for i, key in enumerate(keys):
+
+            row = self._connection.execute("SELECT output, evaluation_time "
+                                           "FROM evaluations WHERE key = ?",
+                                           (sqlite3.Binary(key),)).fetchone()
+            if row is None:
+                continue
+
+            outputs[i] = np.frombuffer(bytes(row[0]), dtype=float).copy()
+            evaluation_time += row[1]
+            found_keys.append(key)
+
+        if found_keys:
+            self._mark_used(found_keys)
+
+        return outputs, evaluation_time
+
+    def save(self, model_key, samples, outputs, evaluation_time=0.):
+        """
+        Stores outputs of a model.
+
+        :param model_key: str identifying the model.
+        :param samples: 2d ndarray with one sample per row.
+        :param outputs: 2d ndarray with one row of outputs per sample.
+        :param evaluation_time: Total time spent computing the outputs.
+        """
+        num_samples = samples.shape[0]
+        if num_samples == 0:
+            return
+
+        time_per_sample = evaluation_time / float(num_samples)
+
+        rows = []
+        for sample, output in zip(samples, outputs):
+
+            output = np.ascontiguousarray(output, dtype=float).ravel()
+            self._clock += 1
+
+            key = sqlite3.Binary(self._get_key(model_key, sample))
+
+            # Outputs already stored for the sample are replaced.
+            replaced_row = self._connection.execute(
+                "SELECT size FROM evaluations WHERE key = ?",
+                (key,)).fetchone()
+
+            if replaced_row is not None:
+                self._size -= replaced_row[0]
+
+            self._size += output.nbytes
+
+            rows.append((key, sqlite3.Binary(output.tobytes()),
+                         time_per_sample, output.nbytes, self._clock))
+
+        with self._connection:
+            self._connection.executemany("INSERT OR REPLACE INTO evaluations "
+                                         "VALUES (?, ?, ?, ?, ?)", rows)
+
+        self._discard_least_recently_used()
+
+    def get_size(self):
+        """
+        :return: Total size in bytes of the stored outputs.
+        """
+        return self._connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM evaluations").fetchone()[0]
+
+    def is_empty(self):
+        """
+        :return: bool indicating whether no outputs are stored, without
+            querying the database.
+        """
+        return self._size == 0
+
+    def __len__(self):
+
+        return self._connection.execute(
+            "SELECT COUNT(*) FROM evaluations").fetchone()[0]
+
+    def close(self):
+        """
+        Closes the sqlite file.
+        """
+        self._connection.close()
+
+    @classmethod
+    def _get_configuration(cls, value):
+        """
+        Replaces each model within a value, including models wrapped by other
+        models, by its class and its attributes other than its
+        runtime_attributes.
+        """
+        if isinstance(value, Model):
+            runtime_attributes = getattr(value, 'runtime_attributes', ())
+
+            attributes = [(name, cls._get_configuration(attribute))
+                          for name, attribute in sorted(vars(value).items())
+                          if name not in runtime_attributes]
+
+            model_class = type(value)
+            return model_class.__module__, model_class.__name__, attributes
+
+        if isinstance(value, (list, tuple)):
+            return type(value)(cls._get_configuration(item) for item in value)
+
+        return value
+
+    @staticmethod
+    def _get_key(model_key, sample):
+        """
+        Computes a hash of the model identity and the values and shape of a
+        sample.
+        """
+        sample = np.ascontiguousarray(sample, dtype=float)
+
+        key = hashlib.sha1(model_key.encode())
+        key.update(sample.tobytes())
+        key.update(str(sample.shape).encode())
+
+        return key.digest()
+
+    def _mark_used(self, keys):
+
+        rows = []
+        for key in keys:
+            self._clock += 1
+            rows.append((self._clock, sqlite3.Binary(key)))
+
+        with self._connection:
+            self._connection.executemany("UPDATE evaluations SET last_used = ? "
+                                         "WHERE key = ?", rows)
+
+    def _discard_least_recently_used(self):
+        """
+        Deletes the least recently used outputs until the stored outputs fit
+        within max_bytes.
+        """
+        if self._max_bytes is None:
+            return
+
+        excess_bytes = self._size - self._max_bytes
+        if excess_bytes <= 0:
+            return
+
+        # Only the oldest entries are read, in the order of the index.
+        rows = self._connection.execute("SELECT key, size FROM evaluations "
+                                        "ORDER BY last_used")
+
+        discarded_keys = []
+        for key, size in rows:
+
+            if excess_bytes <= 0:
+                break
+
+            discarded_keys.append((key,))
+            excess_bytes -= size
+            self._size -= size
+
+        with self._connection:
+            self._connection.executemany("DELETE FROM evaluations "
+                                         "WHERE key = ?", discarded_keys)
+
+    @staticmethod
+    def __check_init_parameters(path, max_bytes):
+
+        if not isinstance(path, str):
+            raise TypeError("path must be a string.")
+
+        directory = os.path.dirname(os.path.abspath(path))
+        if not os.path.isdir(directory):
+            raise IOError("Directory of path does not exist.")
+
+        if max_bytes is not None:
+
+            if not isinstance(max_bytes, int):
+                raise TypeError("max_bytes must be an integer.")
+
+            if max_bytes < 1:
+                raise ValueError("max_bytes must be a positive integer.")
@@ -0,0 +1,421 @@
+import itertools
+import timeit
+import numpy as np
+
+from MLMCSimulator import MLMCSimulator
+
+
+class MFMCSimulator(MLMCSimulator):
+    """
+    Computes an estimate based on the Multifidelity Monte Carlo algorithm of
+    Peherstorfer, Willcox, and Gunzburger. The last model of the list is the
+    high fidelity model, and the others serve as control variates of any kind,
+    such as surrogates or reduced order models, without needing to form a
+    hierarchy of discretizations.
+
+    A pilot sample evaluated on all models provides their costs and their
+    correlations with the high fidelity model. Models are then ordered by
+    decreasing correlation, the subset of models reaching the target precision
+    at least cost is selected, and each model is evaluated on the first m_i
+    samples of a common sample sequence, with m_i increasing along the order.
+    The estimate is the high fidelity mean plus weighted differences of the
+    means of each low fidelity model over its own and the previous model's
+    samples.
+    """
+    def __init__(self, data, models, batch_size=None, executor=None,
+                 evaluation_store=None):
+        """
+        :param data: Provides a data sampling function. Inputs drawing
+            samples in groups, such as AntitheticInput, are not supported.
+        :type data: Input
+        :param models: Models sharing the same inputs and outputs, with the
+            high fidelity model last.
+        :type models: list(Model)
+        :param batch_size: Maximum number of samples passed to a model's
+            evaluate_batch function at once.
+        :type batch_size: int
+        :param executor: Executor to which model evaluations are submitted
+            so that they can run concurrently.
+        :type executor: concurrent.futures.Executor or ModelPool
+        :param evaluation_store: Store of model outputs kept on disk.
+        :type evaluation_store: EvaluationStore
+        """
+        if not isinstance(models, list):
+            raise TypeError("models must be a list of models.")
+
+        # The pilot statistics and nested sample sets treat samples as
+        # independent, which those of a group are not.
+        if getattr(data, 'sample_group_size', 1) > 1:
+            raise TypeError("%s does not support inputs drawing samples in "
+                            "groups." % type(self).__name__)
+
+        MLMCSimulator.__init__(self, data, models, batch_size, executor,
+                               evaluation_store)
+
+        # Positions in the list of models of the selected models, starting
+        # with the high fidelity model.
+        self._model_order = None
+
+        # Control variate weight of each selected model and quantity of
+        # interest. The weight of the high fidelity model is one.
+        self._weights = None
+
+        # Pilot standard deviations of the outputs of each model, and their
+        # correlations with the high fidelity outputs.
+        self._deviations = None
+        self._correlations = None
+
+    def simulate(self, epsilon, initial_sample_sizes=100, target_cost=None,
+                 verbose=False):
+        """
+        Perform MFMC simulation.
+
+        :param epsilon: Desired accuracy to be achieved for each quantity of
+            interest.
+        :type epsilon: float, list of floats, or ndarray.
+        :param initial_sample_sizes: Number of pilot samples evaluated on all
+            models to estimate costs and correlations.
+        :type initial_sample_sizes: int
+        :param target_cost: Target cost to run simulation (optional).
+            If specified, the sample sizes reaching epsilon are scaled to
+            this cost.
+        :type target_cost: float or int
+        :param verbose: Whether to print useful diagnostic information.
+        :type verbose: bool
+        :return: Tuple of ndarrays
+            (estimates, sample count per model, variances). Models that were
+            not selected have a sample count of zero.
+        """
+        self._verbose = verbose and self._cpu_rank == 0
+
+        self.__check_simulate_parameters(initial_sample_sizes, target_cost)
+
+        self._target_cost = None
+        self._process_target_cost(target_cost)
+
+        self._determine_input_output_size()
+        self._process_epsilon(epsilon)
+
+        costs, pilot_outputs = \
+            self._evaluate_pilot_samples(initial_sample_sizes)
+
+        self._compute_allocation(costs, pilot_outputs)
+
+        # Sampling is restarted so that the pilot outputs are reused from
+        # the cache where the data can be redrawn identically.
+        self._reset_sampling()
+
+        start_time = timeit.default_timer()
+        self._estimates = self._run_estimator_simulation()
+        run_time = timeit.default_timer() - start_time
+
+        self._variances = self._compute_estimator_variances()
+
+        if self._verbose:
+            self._show_summary_data(self._estimates, self._variances,
+                                    run_time)
+
+        return self._estimates, self._sample_sizes, self._variances
+
+    def get_weights(self):
+        """
+        Returns the control variate weights of the last simulation.
+
+        :return: 2d ndarray with a row of weights per model, in the order of
+            the list of models, and a column per quantity of interest. Models
+            that were not selected have weights of zero.
+        """
+        return self._weights
+
+    def _evaluate_pilot_samples(self, num_samples):
+        """
+        Evaluates all models on the same pilot samples, timing each model.
+
+        :param num_samples: Number of pilot samples.
+        :return: tuple of ndarrays:
+            1d ndarray of the cost of each model
+            3d ndarray of the outputs of each model on all CPUs, indexed by
+            model, sample, and quantity of interest
+        """
+        if self._verbose:
+            print "Determining costs: "
+
+        self._model_output_cache = [dict() for _ in range(self._num_levels)]
+        self._caching_model_outputs = self._caching_enabled
+
+        samples = self._draw_samples(num_samples)
+
+        compute_times = np.zeros(self._num_levels)
+        outputs = np.zeros((self._num_levels, samples.shape[0],
+                            self._output_size))
+
+        for model_index in range(self._num_levels):
+
+            start_time = timeit.default_timer()
+            start_worker_time = self._worker_evaluation_time
+            start_stored_time = self._stored_evaluation_time
+
+            outputs[model_index] = self._weight_outputs(
+                samples, self._evaluate_model(model_index, samples))
+
+            compute_times[model_index] = \
+                self._get_evaluation_time(start_time, start_worker_time) + \
+                self._stored_evaluation_time - start_stored_time
+
+        self._caching_model_outputs = False
+
+        cpu_sample_sizes = np.ones(self._num_levels) * samples.shape[0]
+        costs = self._compute_costs(compute_times, cpu_sample_sizes)
+
+        return costs, self._gather_arrays(outputs, axis=1)
+
+    def _get_costs_from_models(self):
+        """
+        Collect cost value from each model.
+        :return: ndarray of the cost of evaluating each model.
+        """
+        return np.array([model.cost for model in self._models], dtype=float)
+
+    def _compute_allocation(self, costs, pilot_outputs):
+        """
+        Computes the correlations of the pilot outputs of each model with the
+        high fidelity outputs and selects the models and sample sizes.
+
+        :param costs: 1d ndarray of the cost of each model.
+        :param pilot_outputs: 3d ndarray of pilot outputs.
+        """
+        deviations = np.std(pilot_outputs, axis=1)
+
+        high_fidelity_outputs = pilot_outputs[-1]
+        covariances = np.mean((pilot_outputs - np.mean(pilot_outputs, axis=1,
+                                                       keepdims=True)) *
+                              (high_fidelity_outputs -
+                               np.mean(high_fidelity_outputs, axis=0)),
+                              axis=1)
+
+        # Constant outputs are uncorrelated with everything.
+        with np.errstate(divide='ignore', invalid='ignore'):
+            correlations = covariances / (deviations * deviations[-1])
+
+        correlations[~np.isfinite(correlations)] = 0.
+        correlations[-1] = 1.
+
+        if self._verbose:
+            print 'Pilot correlations with the high fidelity model: \n%s' % \
+                  correlations
+
+        self._deviations = deviations
+        self._correlations = correlations
+
+        self._select_models(costs, deviations, correlations)
+
+    def _select_models(self, costs, deviations, correlations):
+        """
+        Orders the low fidelity models by decreasing correlation with the
+        high fidelity model and selects the subset whose optimal sample sizes
+        reach epsilon at least cost. Sets the sample sizes and weights.
+
+        :param costs: 1d ndarray of the cost of each model.
+        :param deviations: 2d ndarray of output standard deviations.
+        :param correlations: 2d ndarray of correlations with the high
+            fidelity output.
+        """
+        high_fidelity = self._num_levels - 1
+
+        mean_squared_correlations = np.mean(np.square(correlations), axis=1)
+        low_fidelity = sorted(range(high_fidelity),
+                              key=lambda i: -mean_squared_correlations[i])
+
+        best_cost = np.inf
+        best_order = [high_fidelity]
+        best_sample_sizes = None
+
+        for num_low_fidelity in range(len(low_fidelity) + 1):
+            for subset in itertools.combinations(low_fidelity,
+                                                 num_low_fidelity):
+
+                order = [high_fidelity] + list(subset)
+                sample_sizes = self._compute_mfmc_sample_sizes(
+                    costs[order], deviations[order], correlations[order])
+
+                if sample_sizes is None:
+                    continue
+
+                cost = np.dot(costs[order], sample_sizes)
+
+                if cost < best_cost:
+                    best_cost = cost
+                    best_order = order
+                    best_sample_sizes = sample_sizes
+
+        if self._target_cost is not None:
+            best_sample_sizes = self._fit_mfmc_sample_sizes_to_target_cost(
+                costs[best_order], best_sample_sizes)
+
+        self._model_order = best_order
+
+        self._sample_sizes = np.zeros(self._num_levels, dtype=int)
+        self._sample_sizes[best_order] = best_sample_sizes
+
+        self._weights = np.zeros((self._num_levels, self._output_size))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self._weights[best_order] = correlations[best_order] * \
+                deviations[high_fidelity] / deviations[best_order]
+
+        self._weights[~np.isfinite(self._weights)] = 0.
+
+        if self._verbose:
+            print 'Selected models: %s' % best_order
+            print 'Sample sizes: %s' % self._sample_sizes
+
+    def _compute_mfmc_sample_sizes(self, costs, deviations, correlations):
+        """
+        Computes the sample sizes of a sequence of models minimizing cost for
+        the variance epsilon squared of each quantity of interest. The sample
+        size of each model is the largest over the quantities of interest.
+
+        :param costs: 1d ndarray of model costs, high fidelity model first.
+        :param deviations: 2d ndarray of output standard deviations.
+        :param correlations: 2d ndarray of correlations with the high
+            fidelity output.
+        :return: 1d ndarray of sample sizes, or None if the sample sizes do
+            not increase along the sequence, in which case the models do not
+            reduce the cost.
+        """
+        squared_correlations = np.vstack([np.square(correlations),
+                                          np.zeros(self._output_size)])
+
+        # Sample sizes relative to the high fidelity sample size.
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratios = np.sqrt(costs[0] * (squared_correlations[:-1] -
+                                         squared_correlations[1:]) /
+                             (costs[:, np.newaxis] *
+                              (1. - squared_correlations[1])))
+
+        ratios[0] = 1.
+
+        if np.any(~np.isfinite(ratios)) or \
+                np.any(np.diff(ratios, axis=0) <= 0):
+            return None
+
+        # Estimator variance times the high fidelity sample size.
+        variance_factors = np.square(deviations[0]) * \
+            (1. - np.sum((1. / ratios[:-1] - 1. / ratios[1:]) *
+                         squared_correlations[1:-1], axis=0))
+
+        high_fidelity_sample_sizes = variance_factors / \
+            np.square(self._epsilons)
+
+        sample_sizes = np.amax(ratios * high_fidelity_sample_sizes, axis=1)
+
+        return np.maximum(np.ceil(sample_sizes), 1).astype(int)
+
+    def _fit_mfmc_sample_sizes_to_target_cost(self, costs, sample_sizes):
+        """
+        Scales sample sizes to the target cost, keeping at least one sample
+        per model. As in MLMCSimulator, the target cost is per CPU.
+
+        :param costs: 1d ndarray of the costs of the selected models.
+        :param sample_sizes: 1d ndarray of sample sizes of the selected models.
+        :return: 1d ndarray of scaled sample sizes.
+        """
+        budget = self._target_cost * float(self._num_cpus)
+        scale = budget / np.dot(costs, sample_sizes)
+
+        sample_sizes = np.floor(sample_sizes * scale).astype(int)
+
+        return np.maximum(sample_sizes, 1)
+
+    def _run_estimator_simulation(self):
+        """
+        Evaluates the selected models on nested sample sets. Samples are
+        drawn in blocks, and each block is evaluated by the models whose
+        sample sets include it.
+
+        :return: 1d ndarray of estimates for each quantity of interest.
+        """
+        num_models = len(self._model_order)
+        sample_sizes = self._sample_sizes[self._model_order]
+
+        # Sums of outputs of each model over its own samples, and over the
+        # samples of the previous model.
+        output_sums = np.zeros((num_models, self._output_size))
+        previous_output_sums = np.zeros_like(output_sums)
+
+        num_drawn = 0
+        actual_sample_sizes = np.zeros(num_models, dtype=int)
+
+        for block in range(num_models):
+
+            num_block_samples = sample_sizes[block] - num_drawn
+            if num_block_samples <= 0:
+                actual_sample_sizes[block] = num_drawn
+                continue
+
+            samples = self._draw_samples(num_block_samples)
+            num_drawn += self._sum_over_all_cpus(samples.shape[0])
+            actual_sample_sizes[block] = num_drawn
+
+            for position in range(block, num_models):
+
+                outputs = self._weight_outputs(
+                    samples, self._evaluate_model(self._model_order[position],
+                                                  samples))
+                block_sums = self._sum_over_all_cpus(np.sum(outputs, axis=0))
+
+                output_sums[position] += block_sums
+                if block < position:
+                    previous_output_sums[position] += block_sums
+
+        self._sample_sizes[self._model_order] = actual_sample_sizes
+
+        means = output_sums / actual_sample_sizes[:, np.newaxis]
+        previous_means = previous_output_sums[1:] / \
+            actual_sample_sizes[:-1, np.newaxis]
+
+        weights = self._weights[self._model_order]
+
+        return means[0] + np.sum(weights[1:] * (means[1:] - previous_means),
+                                 axis=0)
+
+    def _compute_estimator_variances(self):
+        """
+        Computes the variance of the estimate from the pilot statistics.
+
+        :return: 1d ndarray of variances for each quantity of interest.
+        """
+        deviations = self._deviations
+        correlations = self._correlations
+
+        order = self._model_order
+        inverse_sample_sizes = 1. / self._sample_sizes[order][:, np.newaxis]
+
+        variances = np.square(deviations[order[0]]) * \
+            (inverse_sample_sizes[0] -
+             np.sum((inverse_sample_sizes[:-1] - inverse_sample_sizes[1:]) *
+                    np.square(correlations[order[1:]]), axis=0))
+
+        return variances
+
+    @staticmethod
+    def __check_simulate_parameters(initial_sample_sizes, target_cost):
+        """
+        Inspect parameters to simulate method.
+        :param initial_sample_sizes: int number of pilot samples.
+        :param target_cost: float or int specifying desired simulation cost.
+        """
+        if not isinstance(initial_sample_sizes, int):
+            raise TypeError("initial_sample_sizes must be an integer.")
+
+        if initial_sample_sizes < 2:
+            raise ValueError("initial_sample_sizes must be at least 2.")
+
+        if target_cost is not None:
+
+            if not (isinstance(target_cost, float) or
+                    isinstance(target_cost, int)):
+
+                raise TypeError('maximum cost must be an int or float.')
+
+            if target_cost <= 0:
+                raise ValueError("maximum cost must be greater than zero.")
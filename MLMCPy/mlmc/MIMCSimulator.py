@@ -0,0 +1,212 @@
+import itertools
+import numpy as np
+
+from MLMCSimulator import MLMCSimulator
+from ModelPool import ModelPool
+
+
+class MIMCSimulator(MLMCSimulator):
+    """
+    Computes an estimate based on the Multi-Index Monte Carlo algorithm.
+    Models are indexed by a tuple with one entry per discretization parameter,
+    such as (time step level, mesh level), so that each parameter can be
+    refined independently. The estimate is the sum over an index set of the
+    means of mixed differences of model outputs.
+
+    Each index of the index set takes the place of a level of MLMCSimulator,
+    so the index set is sampled with the same cost and variance based
+    allocation, and all simulate() options are available.
+    """
+    def __init__(self, data, models, index_set=None, batch_size=None,
+                 executor=None, evaluation_store=None, chunk_size=10000):
+        """
+        :param data: Provides a data sampling function.
+        :type data: Input
+        :param models: Models keyed by their index tuples, or a function
+            taking an index tuple and returning the model with that index.
+        :type models: dict or function
+        :param index_set: Indices whose mixed differences are summed. Must be
+            downward closed: with each index, every index with smaller or equal
+            entries is included as well. Defaults to the keys of models. See
+            get_total_degree_index_set().
+        :type index_set: list(tuple(int))
+        :param batch_size: Maximum number of samples passed to a model's
+            evaluate_batch function at once.
+        :type batch_size: int
+        :param executor: Executor to which model evaluations are submitted
+            so that they can run concurrently.
+        :type executor: concurrent.futures.Executor
+        :param evaluation_store: Store of model outputs kept on disk.
+        :type evaluation_store: EvaluationStore
+        :param chunk_size: Maximum number of samples evaluated at once when
+            running an index.
+        :type chunk_size: int
+        """
+        self.__check_init_parameters(models, index_set, executor)
+
+        if index_set is None:
+            index_set = models.keys()
+
+        # Order indices by total degree so that coarse indices come first.
+        self._index_set = sorted(set(tuple(index) for index in index_set),
+                                 key=lambda index: (sum(index), index))
+
+        if isinstance(models, dict):
+            index_models = [models[index] for index in self._index_set]
+        else:
+            index_models = [models(index) for index in self._index_set]
+
+        # Position of the model of each index in the list of models.
+        self._model_positions = dict((index, position) for position, index
+                                     in enumerate(self._index_set))
+
+        # Models and signs of the terms of the mixed difference of each index.
+        self._difference_terms = [self._get_difference_terms(index)
+                                  for index in self._index_set]
+
+        MLMCSimulator.__init__(self, data, index_models, batch_size, executor,
+                               evaluation_store, chunk_size=chunk_size)
+
+    @staticmethod
+    def get_total_degree_index_set(num_dimensions, max_degree):
+        """
+        Creates the index set of all indices whose entries sum to at most
+        max_degree.
+
+        :param num_dimensions: Number of entries in each index.
+        :type num_dimensions: int
+        :param max_degree: Maximum sum of the entries of an index.
+        :type max_degree: int
+        :return: list of index tuples.
+        """
+        if not isinstance(num_dimensions, int) or \
+                not isinstance(max_degree, int):
+
+            raise TypeError("num_dimensions and max_degree must be integers.")
+
+        if num_dimensions < 1 or max_degree < 0:
+            raise ValueError("num_dimensions must be positive and " +
+                             "max_degree must not be negative.")
+
+        return [index for index in
+                itertools.product(range(max_degree + 1), repeat=num_dimensions)
+                if sum(index) <= max_degree]
+
+    def get_index_set(self):
+        """
+        :return: list of index tuples in the order of the sample sizes and
+            variances returned by simulate().
+        """
+        return list(self._index_set)
+
+    def _get_difference_terms(self, index):
+        """
+        Lists the terms of the mixed difference of an index: the sum over all
+        offsets e with entries of 0 or 1 of (-1)^|e| times the output of the
+        model with index - e, leaving out terms with negative entries.
+
+        :param index: tuple index.
+        :return: list of tuples containing the position of a model and the
+            sign of its term.
+        """
+        terms = []
+        for offset in itertools.product([0, 1], repeat=len(index)):
+
+            lower_index = tuple(np.subtract(index, offset))
+
+            if min(lower_index) < 0:
+                continue
+
+            sign = (-1) ** sum(offset)
+            terms.append((self._model_positions[lower_index], sign))
+
+        return terms
+
+    def _evaluate_level(self, samples, level):
+        """
+        Computes the mixed differences of model outputs of the index at the
+        given position of the index set for a block of samples.
+
+        :param samples: 2d ndarray of samples.
+        :param level: position of the index in the index set.
+        :return: 2d ndarray of mixed differences.
+        """
+        outputs = np.zeros((samples.shape[0], self._output_size))
+
+        for model_position, sign in self._difference_terms[level]:
+            outputs += sign * self._evaluate_model(model_position, samples)
+
+        return self._weight_outputs(samples, outputs)
+
+    def _get_costs_from_models(self):
+        """
+        Collect cost value from each model.
+        :return: ndarray of the cost of computing the mixed difference of
+            each index.
+        """
+        costs = np.zeros(self._num_levels)
+
+        for level, terms in enumerate(self._difference_terms):
+            for model_position, _ in terms:
+                costs[level] += self._models[model_position].cost
+
+        return costs
+
+    def _estimate_convergence_rates(self):
+        """
+        Rates of change between levels do not apply to index sets.
+        """
+        return
+
+    @staticmethod
+    def __check_init_parameters(models, index_set, executor):
+        """
+        Inspect parameters given to init method.
+        :param models: dict or function provided to init().
+        :param index_set: list of tuples or None provided to init().
+        :param executor: Executor or None provided to init().
+        """
+        if not isinstance(models, dict) and not callable(models):
+            raise TypeError("models must be a dict or a function.")
+
+        if index_set is None:
+
+            if not isinstance(models, dict):
+                raise ValueError("index_set must be given when models is " +
+                                 "a function.")
+
+            index_set = models.keys()
+
+        if not isinstance(index_set, list) or len(index_set) == 0:
+            raise TypeError("index_set must be a non-empty list of tuples.")
+
+        index_set = set(tuple(index) for index in index_set)
+
+        dimensions = set(len(index) for index in index_set)
+        if len(dimensions) != 1:
+            raise ValueError("All indices must have the same length.")
+
+        for index in index_set:
+
+            if min(index) < 0:
+                raise ValueError("Index entries must not be negative.")
+
+            # Downward closed sets contain the neighbor below each index.
+            for dimension, entry in enumerate(index):
+
+                if entry == 0:
+                    continue
+
+                lower_index = index[:dimension] + (entry - 1,) + \
+                    index[dimension + 1:]
+
+                if lower_index not in index_set:
+                    raise ValueError("index_set must be downward closed; " +
+                                     "%s is missing." % str(lower_index))
+
+            if isinstance(models, dict) and index not in models:
+                raise ValueError("No model given for index %s." % str(index))
+
+        if isinstance(executor, ModelPool):
+            raise TypeError("MIMCSimulator does not support ModelPool " +
+                            "executors.")
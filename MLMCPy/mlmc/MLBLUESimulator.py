@@ -0,0 +1,401 @@
+import itertools
+import numpy as np
+from scipy.optimize import minimize
+
+from MFMCSimulator import MFMCSimulator
+
+
+class MLBLUESimulator(MFMCSimulator):
+    """
+    Computes an estimate based on the multilevel best linear unbiased
+    estimator of Schaden and Ullmann, which generalizes MLMC, MFMC, and
+    approximate control variate estimators to any set of models.
+
+    Models are evaluated jointly in groups: each group is a subset of the
+    models, evaluated together on samples of its own. The means of all model
+    outputs are estimated at once by generalized least squares from the
+    group means, weighting each group by the inverse of its pilot output
+    covariance. The sample size of each group is chosen to minimize the
+    variance of the estimate of the high fidelity model, the last model of
+    the list, at a given cost. This allocation is found numerically from the
+    full pilot covariance matrix of the model outputs, so that models need
+    not form a hierarchy or be ordered by correlation.
+
+    The pilot samples are drawn and timed as in MFMCSimulator.
+    """
+    def __init__(self, data, models, groups=None, batch_size=None,
+                 executor=None, evaluation_store=None):
+        """
+        :param data: Provides a data sampling function.
+        :type data: Input
+        :param models: Models sharing the same inputs and outputs, with the
+            high fidelity model last.
+        :type models: list(Model)
+        :param groups: Groups of models that may be evaluated together, each
+            given as a tuple of positions in the list of models. Defaults to
+            all subsets of the models, which gives the least variance but
+            grows exponentially with the number of models.
+        :type groups: list(tuple(int))
+        :param batch_size: Maximum number of samples passed to a model's
+            evaluate_batch function at once.
+        :type batch_size: int
+        :param executor: Executor to which model evaluations are submitted
+            so that they can run concurrently.
+        :type executor: concurrent.futures.Executor or ModelPool
+        :param evaluation_store: Store of model outputs kept on disk.
+        :type evaluation_store: EvaluationStore
+        """
+        MFMCSimulator.__init__(self, data, models, batch_size, executor,
+                               evaluation_store)
+
+        if groups is None:
+            groups = [group for size in range(1, self._num_levels + 1)
+                      for group in itertools.combinations(
+                          range(self._num_levels), size)]
+
+        self.__check_groups(groups, self._num_levels)
+
+        self._groups = [tuple(sorted(group)) for group in groups]
+
+        # Number of samples of each group.
+        self._group_sample_sizes = np.zeros(len(self._groups), dtype=int)
+
+        # Weights of the model output means of each group in the estimate,
+        # with a row per model of the group and a column per quantity of
+        # interest.
+        self._group_weights = None
+
+        # Pilot covariances of model outputs, indexed by quantity of
+        # interest and the two models.
+        self._covariances = None
+
+    def get_weights(self):
+        """
+        Returns the weights of the output means of each group in the estimate
+        of the last simulation.
+
+        :return: dict mapping each group with samples to a 2d ndarray of
+            weights, with a row per model of the group and a column per
+            quantity of interest.
+        """
+        if self._group_weights is None:
+            return None
+
+        return dict((group, weights) for group, weights, sample_size in
+                    zip(self._groups, self._group_weights,
+                        self._group_sample_sizes) if sample_size > 0)
+
+    def get_group_sample_sizes(self):
+        """
+        :return: dict mapping each group to its number of samples in the
+            last simulation.
+        """
+        return dict(zip(self._groups, self._group_sample_sizes))
+
+    def _compute_allocation(self, costs, pilot_outputs):
+        """
+        Computes the pilot covariances of the model outputs and the sample
+        size of each group. Sample sizes minimizing the variance at unit cost
+        are scaled to reach epsilon, or to the target cost if one was given.
+
+        :param costs: 1d ndarray of the cost of each model.
+        :param pilot_outputs: 3d ndarray of pilot outputs.
+        """
+        self._covariances = np.array([
+            np.cov(pilot_outputs[:, :, qoi])
+            for qoi in range(self._output_size)]).reshape(
+                self._output_size, self._num_levels, self._num_levels)
+
+        group_costs = np.array([np.sum(costs[list(group)])
+                                for group in self._groups])
+
+        unit_sample_sizes, unit_variance = \
+            self._solve_allocation(group_costs)
+
+        if self._target_cost is not None:
+            # As in MLMCSimulator, the target cost is per CPU.
+            budget = self._target_cost * float(self._num_cpus)
+            sample_sizes = np.floor(unit_sample_sizes * budget)
+        else:
+            # Variances are inversely proportional to the scale of all
+            # sample sizes.
+            sample_sizes = np.ceil(unit_sample_sizes * unit_variance)
+
+        sample_sizes = sample_sizes.astype(int)
+
+        # The estimate needs samples of the high fidelity model.
+        high_fidelity = self._num_levels - 1
+        if not np.any([sample_size > 0 and high_fidelity in group
+                       for group, sample_size in
+                       zip(self._groups, sample_sizes)]):
+
+            covering = [high_fidelity in group for group in self._groups]
+            best_group = np.argmax(np.where(covering, unit_sample_sizes, -1.))
+            sample_sizes[best_group] = 1
+
+        self._set_group_sample_sizes(sample_sizes)
+
+        if self._verbose:
+            print 'Group sample sizes: %s' % self.get_group_sample_sizes()
+
+    def _solve_allocation(self, group_costs):
+        """
+        Finds the group sample sizes at unit total cost that minimize the
+        largest ratio of estimator variance to epsilon squared over the
+        quantities of interest, using sequential quadratic programming.
+
+        :param group_costs: 1d ndarray of the cost of each group.
+        :return: tuple of a 1d ndarray of sample sizes and the largest
+            variance ratio they achieve.
+        """
+        num_groups = len(self._groups)
+        precisions = self._get_group_precisions()
+        epsilons_squared = np.square(self._epsilons)
+
+        # Start with an equal share of the cost for each group.
+        initial_sample_sizes = 1. / (num_groups * group_costs)
+
+        # Ratios are normalized by those of the initial sample sizes so
+        # that the optimization is independent of the scale of the outputs.
+        normalization = np.amax(
+            self._get_variances(initial_sample_sizes, precisions) /
+            epsilons_squared)
+
+        if not normalization > 0.:
+            normalization = 1.
+
+        def variance_ratios(sample_sizes):
+            return self._get_variances(sample_sizes, precisions) / \
+                (epsilons_squared * normalization)
+
+        def variance_ratio_gradients(sample_sizes):
+            return self._get_variance_gradients(sample_sizes, precisions) / \
+                (epsilons_squared * normalization)[:, np.newaxis]
+
+        # The last variable bounds the variance ratio of every quantity of
+        # interest from above, and is minimized.
+        constraints = [
+            {'type': 'ineq',
+             'fun': lambda x: x[-1] - variance_ratios(x[:-1]),
+             'jac': lambda x: np.hstack([
+                 -variance_ratio_gradients(x[:-1]),
+                 np.ones((self._output_size, 1))])},
+            {'type': 'eq',
+             'fun': lambda x: np.array([np.dot(group_costs, x[:-1]) - 1.]),
+             'jac': lambda x: np.append(group_costs, 0.)[np.newaxis]}]
+
+        initial_point = np.append(initial_sample_sizes, 1.)
+        bounds = [(0., None)] * num_groups + [(0., None)]
+
+        result = minimize(lambda x: x[-1], initial_point,
+                          jac=lambda x: np.append(np.zeros(num_groups), 1.),
+                          bounds=bounds, constraints=constraints,
+                          method='SLSQP', options={'maxiter': 500})
+
+        sample_sizes = np.maximum(result.x[:-1], 0.)
+
+        # Groups with a negligible share of the cost are left out.
+        sample_sizes[sample_sizes * group_costs < 1e-6] = 0.
+
+        if not np.any(sample_sizes > 0) or \
+                not np.all(np.isfinite(variance_ratios(sample_sizes))):
+            sample_sizes = initial_sample_sizes
+
+        sample_sizes /= np.dot(group_costs, sample_sizes)
+
+        variance_ratio = np.amax(variance_ratios(sample_sizes)) * normalization
+
+        return sample_sizes, variance_ratio
+
+    def _get_group_precisions(self):
+        """
+        Computes the inverse of the pilot covariance of each group, embedded
+        into a matrix over all models.
+
+        :return: 4d ndarray indexed by group, quantity of interest, and two
+            models.
+        """
+        precisions = np.zeros((len(self._groups), self._output_size,
+                               self._num_levels, self._num_levels))
+
+        for i, group in enumerate(self._groups):
+
+            indices = np.ix_(group, group)
+
+            for qoi in range(self._output_size):
+                precisions[i, qoi][indices] = \
+                    np.linalg.pinv(self._covariances[qoi][indices])
+
+        return precisions
+
+    def _get_information_matrices(self, sample_sizes, precisions):
+        """
+        :return: 3d ndarray of the sum of the group precisions weighted by
+            their sample sizes, for each quantity of interest.
+        """
+        return np.tensordot(sample_sizes, precisions, axes=1)
+
+    def _get_high_fidelity_columns(self, information):
+        """
+        Solves the information matrix of each quantity of interest for the
+        unit vector of the high fidelity model, leaving out models without
+        samples.
+
+        :param information: 3d ndarray of information matrices.
+        :return: 2d ndarray with a row per quantity of interest, or None if
+            the high fidelity model has no samples.
+        """
+        columns = np.zeros((self._output_size, self._num_levels))
+
+        for qoi in range(self._output_size):
+
+            diagonal = np.diag(information[qoi])
+            active = np.flatnonzero(diagonal > 1e-12 * np.max(diagonal))
+
+            if len(active) == 0 or active[-1] != self._num_levels - 1:
+                return None
+
+            unit_vector = np.zeros(len(active))
+            unit_vector[-1] = 1.
+
+            columns[qoi, active] = np.linalg.lstsq(
+                information[qoi][np.ix_(active, active)], unit_vector,
+                rcond=None)[0]
+
+        return columns
+
+    def _get_variances(self, sample_sizes, precisions):
+        """
+        Computes the variance of the estimate of the high fidelity mean for
+        each quantity of interest, which is the last diagonal entry of the
+        inverse information matrix, or infinite if the high fidelity model
+        has no samples.
+
+        :return: 1d ndarray of variances.
+        """
+        information = self._get_information_matrices(sample_sizes, precisions)
+        columns = self._get_high_fidelity_columns(information)
+
+        if columns is None:
+            return np.ones(self._output_size) * np.inf
+
+        return columns[:, -1]
+
+    def _get_variance_gradients(self, sample_sizes, precisions):
+        """
+        Computes the derivatives of the variances with respect to the group
+        sample sizes.
+
+        :return: 2d ndarray indexed by quantity of interest and group.
+        """
+        information = self._get_information_matrices(sample_sizes, precisions)
+        columns = self._get_high_fidelity_columns(information)
+
+        if columns is None:
+            return np.zeros((self._output_size, len(self._groups)))
+
+        return -np.einsum('qi,gqij,qj->qg', columns, precisions, columns)
+
+    def _set_group_sample_sizes(self, sample_sizes):
+        """
+        Sets the sample size of each group, the resulting number of
+        evaluations of each model, and the weights of the group means.
+
+        :param sample_sizes: 1d ndarray of group sample sizes.
+        """
+        self._group_sample_sizes = np.array(sample_sizes, dtype=int)
+
+        self._sample_sizes = np.zeros(self._num_levels, dtype=int)
+        for group, sample_size in zip(self._groups, self._group_sample_sizes):
+            self._sample_sizes[list(group)] += sample_size
+
+        precisions = self._get_group_precisions()
+        information = self._get_information_matrices(
+            self._group_sample_sizes.astype(float), precisions)
+
+        columns = self._get_high_fidelity_columns(information)
+
+        # The estimate is the high fidelity entry of the generalized least
+        # squares solution, a weighted sum of the group means.
+        self._group_weights = []
+        for i, group in enumerate(self._groups):
+
+            weights = self._group_sample_sizes[i] * \
+                np.einsum('qij,qj->iq', precisions[i], columns)
+
+            self._group_weights.append(weights[list(group)])
+
+    def _run_estimator_simulation(self):
+        """
+        Evaluates each group of models on its own samples and combines the
+        group means with their weights.
+
+        :return: 1d ndarray of estimates for each quantity of interest.
+        """
+        group_sample_sizes = np.zeros_like(self._group_sample_sizes)
+        group_means = []
+
+        for i, group in enumerate(self._groups):
+
+            means = np.zeros((len(group), self._output_size))
+            group_means.append(means)
+
+            if self._group_sample_sizes[i] == 0:
+                continue
+
+            samples = self._draw_samples(self._group_sample_sizes[i])
+            group_sample_sizes[i] = self._sum_over_all_cpus(samples.shape[0])
+
+            for position, model_index in enumerate(group):
+
+                outputs = self._weight_outputs(
+                    samples, self._evaluate_model(model_index, samples))
+                means[position] = \
+                    self._sum_over_all_cpus(np.sum(outputs, axis=0)) / \
+                    max(group_sample_sizes[i], 1)
+
+        # Weights are recomputed if the data ran out of samples.
+        if np.any(group_sample_sizes != self._group_sample_sizes):
+            self._set_group_sample_sizes(group_sample_sizes)
+
+        estimates = np.zeros(self._output_size)
+        for weights, means in zip(self._group_weights, group_means):
+            estimates += np.sum(weights * means, axis=0)
+
+        return estimates
+
+    def _compute_estimator_variances(self):
+        """
+        Computes the variance of the estimate from the pilot covariances.
+
+        :return: 1d ndarray of variances for each quantity of interest.
+        """
+        return self._get_variances(self._group_sample_sizes.astype(float),
+                                   self._get_group_precisions())
+
+    @staticmethod
+    def __check_groups(groups, num_models):
+        """
+        Inspect groups given to init method.
+        :param groups: list of tuples of model positions.
+        :param num_models: int number of models.
+        """
+        if not isinstance(groups, list) or len(groups) == 0:
+            raise TypeError("groups must be a non-empty list of tuples.")
+
+        for group in groups:
+
+            if len(group) == 0 or len(set(group)) != len(group):
+                raise ValueError("Each group must contain distinct models.")
+
+            for model_index in group:
+
+                if not isinstance(model_index, int):
+                    raise TypeError("groups must contain model positions.")
+
+                if model_index < 0 or model_index >= num_models:
+                    raise ValueError("Model position %s is out of range." %
+                                     model_index)
+
+        if not np.any([num_models - 1 in group for group in groups]):
+            raise ValueError("The high fidelity model must be in a group.")
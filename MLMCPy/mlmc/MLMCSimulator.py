@@ -1,41 +1,135 @@
 import numpy as np
 import timeit
+from collections import deque
 from datetime import timedelta
 import imp
 
 from MLMCPy.input import Input
 from MLMCPy.model import Model
+from EvaluationStore import EvaluationStore
+from ModelPool import ModelPool
+from RunningStatistics import RunningStatistics
+from SampleAllocator import SampleAllocator
 
 
 class MLMCSimulator:
     """
     Computes an estimate based on the Multi-Level Monte Carlo algorithm.
     """
-    def __init__(self, data, models):
+    def __init__(self, data, models, batch_size=None, executor=None,
+                 evaluation_store=None, max_levels=10, chunk_size=10000):
         """
         Requires a data object that provides input samples and a list of models
         of increasing fidelity.
 
-        :param data: Provides a data sampling function.
+        :param data: Provides a data sampling function. If samples are drawn
+            in groups, such as the antithetic pairs of AntitheticInput, sample
+            sizes are whole numbers of groups, and the outputs of each group
+            are averaged before computing the statistics of a level. If the
+            data provides likelihood ratios of its samples, as
+            ImportanceSamplingInput does, output differences are weighted by
+            them.
         :type data: Input
         :param models: Each model Produces outputs from sample data input.
-        :type models: list(Model)
+            Alternatively, a model factory: a function taking a level index
+            and returning the model of that level, with each level refining
+            the one below by a factor of two. The simulation then starts with
+            three levels, and adaptive simulations add finer levels until the
+            estimated bias meets the target precision.
+        :type models: list(Model) or function
+        :param batch_size: Maximum number of samples passed to a model's
+            evaluate_batch function at once. If None, all samples of a chunk
+            are evaluated in a single block.
+        :type batch_size: int
+        :param executor: Executor to which model evaluations are submitted
+            so that they can run concurrently, such as a
+            concurrent.futures.ThreadPoolExecutor, or a ModelPool of worker
+            processes holding their own copies of the models. Results are
+            always collected in sample order. If None, models are evaluated
+            serially.
+        :type executor: concurrent.futures.Executor or ModelPool
+        :param evaluation_store: Store of model outputs kept on disk. Outputs
+            found in the store are reused instead of evaluating the models,
+            and newly computed outputs are added to it, so that repeated
+            simulations only evaluate samples that have not been seen before.
+        :type evaluation_store: EvaluationStore
+        :param max_levels: Maximum number of levels created with a model
+            factory.
+        :type max_levels: int
+        :param chunk_size: Maximum number of samples over all CPUs drawn and
+            evaluated at once when running a level. The output differences
+            of each chunk are added to running level statistics and
+            discarded, so that memory use does not grow with sample sizes.
+            Rounded up to whole sample groups.
+        :type chunk_size: int
         """
         # Detect whether we have access to multiple CPUs.
         self.__detect_parallelization()
 
-        self.__check_init_parameters(data, models)
+        # Creates the models of additional levels on demand.
+        self._model_factory = None
+        if callable(models):
+            self._model_factory = models
+            models = [models(level) for level in range(3)]
+
+        self.__check_init_parameters(data, models, batch_size, executor,
+                                     evaluation_store, self._model_factory,
+                                     max_levels, chunk_size)
 
         self._data = data
         self._models = models
+
+        # Number of consecutive samples whose outputs are averaged.
+        self._sample_group_size = getattr(data, 'sample_group_size', 1)
         self._num_levels = len(self._models)
 
+        self._num_initial_levels = self._num_levels
+        self._max_levels = max_levels
+
+        # Estimated rates of change of level means, variances, and costs.
+        self._convergence_rates = None
+
+        # Number of samples evaluated per call to a model's evaluate_batch.
+        self._batch_size = batch_size
+
+        # Number of samples of a level held in memory at once, in whole
+        # sample groups.
+        self._chunk_size = -(-chunk_size // self._sample_group_size) * \
+            self._sample_group_size
+
+        # Used to run model evaluations concurrently within this process.
+        self._executor = executor
+
+        # Total time spent evaluating models on ModelPool workers.
+        self._worker_evaluation_time = 0.
+
+        # Outputs of previous simulations, identified by model key.
+        self._evaluation_store = evaluation_store
+        self._model_keys = None
+        if evaluation_store is not None:
+            self._model_keys = [EvaluationStore.get_model_key(model)
+                                for model in models]
+
+        # Total time originally spent computing outputs loaded from the store.
+        self._stored_evaluation_time = 0.
+
+        # Number of AsyncModel evaluations allowed to run at once. Only set
+        # while running simulate_async.
+        self._max_in_flight = None
+
         # Sample size to be taken at each level.
         self._sample_sizes = np.zeros(self._num_levels, dtype=np.int)
 
         # Used to compute sample sizes based on a fixed cost.
         self._target_cost = None
 
+        # Whether sample sizes are multiples of the number of CPUs.
+        self._balance_cpus = False
+
+        # Whether sample sizes meet the epsilons of all quantities of
+        # interest jointly rather than each one separately.
+        self._joint_allocation = False
+
         # Sample sizes used in setup.
         self._initial_sample_sizes = np.empty(0, dtype=int)
 
@@ -52,14 +146,47 @@ class MLMCSimulator:
         self._cached_inputs = np.empty(0)
         self._cached_outputs = np.empty(0)
 
+        # Outputs of each model computed in the setup phase, keyed by the
+        # bytes of the input sample. Shared by all levels using the model.
+        self._model_output_cache = [dict() for _ in range(self._num_levels)]
+
+        # Outputs of the model one level below each model computed by its
+        # evaluate_pair function, kept apart from that model's own outputs.
+        self._pair_output_cache = [dict() for _ in range(self._num_levels)]
+
+        # Whether newly computed model outputs are added to the cache.
+        self._caching_model_outputs = False
+
+        # Number of samples drawn over all CPUs since sampling was last
+        # restarted, of which the first _num_cacheable_samples may have
+        # outputs in the cache.
+        self._num_drawn_samples = 0
+        self._num_cacheable_samples = 0
+
+        # Block of samples drawn last on this CPU and the number of its
+        # leading samples which may have outputs in the cache. Its other
+        # samples are not looked up.
+        self._drawn_samples = None
+        self._num_drawn_cacheable_samples = 0
+
         # Whether to allow use of model output caching.
         self._caching_enabled = True
 
         # Enabled diagnostic text output.
         self._verbose = False
 
+        # Whether setup phase outputs are included in the estimates.
+        self._reuse_setup_samples = False
+
+        # Number of setup samples evaluated on this CPU at each level.
+        self._cpu_setup_sample_sizes = np.zeros(self._num_levels, dtype=int)
+
+        # Time spent evaluating the setup samples of each level on this CPU.
+        self._setup_compute_times = np.zeros(self._num_levels)
+
     def simulate(self, epsilon, initial_sample_sizes=100, target_cost=None,
-                 sample_sizes=None, verbose=False):
+                 sample_sizes=None, verbose=False, reuse_setup_samples=False,
+                 adaptive=False, balance_cpus=False, joint_allocation=False):
         """
         Perform MLMC simulation.
         Computes number of samples per level before running simulations
@@ -81,6 +208,35 @@ class MLMCSimulator:
         :type sample_sizes: ndarray
         :param verbose: Whether to print useful diagnostic information.
         :type verbose: bool
+        :param reuse_setup_samples: Whether to include the samples evaluated
+            when computing costs and variances in the estimates, so that only
+            the samples needed beyond them are drawn and evaluated in the
+            simulation. Levels are then run with at least as many samples as
+            were used in setup. Otherwise, the simulation restarts sampling
+            and relies on the cache to reuse setup outputs of matching
+            samples, which requires data that can be redrawn identically.
+        :type reuse_setup_samples: bool
+        :param adaptive: Whether to run the simulation in rounds. After each
+            round, the variances and costs of each level are estimated again
+            from all samples so far, and only the shortfall from the updated
+            optimal sample sizes is drawn in the next round, until the
+            variance of the estimate is below epsilon squared. Setup samples
+            are always part of the estimates. Requires epsilon, and can not
+            be combined with target_cost or sample_sizes.
+        :type adaptive: bool
+        :param balance_cpus: Whether to only allocate sample sizes that are
+            multiples of the number of CPUs, so that every CPU evaluates the
+            same number of samples of each level.
+        :type balance_cpus: bool
+        :param joint_allocation: Whether to find the sample sizes of least
+            total cost meeting the epsilons of all quantities of interest at
+            once. Otherwise, the sample sizes meeting the epsilon of each
+            quantity of interest are found separately and the largest is
+            taken at each level, which is costly when one of many quantities
+            of interest, such as points of a CDF, has a large variance on a
+            level. A scalar epsilon then bounds the largest error over all
+            quantities of interest. Ignored with target_cost.
+        :type joint_allocation: bool
         :param only_collect_sample_sizes: indicates whether to bypass simulation
             phase and simply return prescribed number of samples for each model.
             Return value is changed to one dimensional ndarray.
@@ -89,8 +245,11 @@ class MLMCSimulator:
             (estimates, sample count per level, variances)
         """
         self._verbose = verbose and self._cpu_rank == 0
+        self._reuse_setup_samples = reuse_setup_samples
+        self._balance_cpus = balance_cpus
+        self._joint_allocation = joint_allocation
 
-        self.__check_simulate_parameters(target_cost)
+        self.__check_simulate_parameters(target_cost, sample_sizes, adaptive)
 
         self._process_target_cost(target_cost)
 
@@ -98,9 +257,247 @@ class MLMCSimulator:
 
         self._setup_simulation(epsilon, initial_sample_sizes, sample_sizes)
 
+        if adaptive:
+            return self._run_adaptive_simulation()
+
         # Run models and return estimate, sample sizes, and variances.
         return self._run_simulation()
 
+    def simulate_async(self, epsilon, initial_sample_sizes=100,
+                       target_cost=None, sample_sizes=None, verbose=False,
+                       max_in_flight=100, reuse_setup_samples=False,
+                       adaptive=False, balance_cpus=False,
+                       joint_allocation=False):
+        """
+        Perform MLMC simulation as with simulate(), but start the evaluations
+        of models inheriting from AsyncModel without waiting for each one to
+        complete, so that many evaluations are in flight at once during both
+        the setup phase and the simulation loop. Other models are evaluated
+        as in simulate().
+
+        :param epsilon: Desired accuracy to be achieved for each quantity of
+            interest.
+        :type epsilon: float, list of floats, or ndarray.
+        :param initial_sample_sizes: Sample sizes used when computing cost
+            and variance for each model in simulation.
+        :type initial_sample_sizes: ndarray, int, list
+        :param target_cost: Target cost to run simulation (optional).
+            If specified, overrides any epsilon value provided.
+        :type target_cost: float or int
+        :param sample_sizes: Number of samples to compute at each level
+        :type sample_sizes: ndarray
+        :param verbose: Whether to print useful diagnostic information.
+        :type verbose: bool
+        :param max_in_flight: Maximum number of evaluations of a model that
+            may be in flight at once.
+        :type max_in_flight: int
+        :param reuse_setup_samples: Whether to include the samples evaluated
+            when computing costs and variances in the estimates.
+        :type reuse_setup_samples: bool
+        :param adaptive: Whether to run the simulation in rounds until the
+            target precision is met.
+        :type adaptive: bool
+        :param balance_cpus: Whether to only allocate sample sizes that are
+            multiples of the number of CPUs.
+        :type balance_cpus: bool
+        :param joint_allocation: Whether to meet the epsilons of all
+            quantities of interest jointly at least total cost.
+        :type joint_allocation: bool
+        :return: Tuple of ndarrays
+            (estimates, sample count per level, variances)
+        """
+        if not isinstance(max_in_flight, int):
+            raise TypeError("max_in_flight must be an integer.")
+
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be a positive integer.")
+
+        self._max_in_flight = max_in_flight
+
+        try:
+            return self.simulate(epsilon, initial_sample_sizes, target_cost,
+                                 sample_sizes, verbose, reuse_setup_samples,
+                                 adaptive, balance_cpus, joint_allocation)
+        finally:
+            self._max_in_flight = None
+
+    def simulate_qmc(self, epsilon, initial_sample_sizes=16,
+                     num_randomizations=16, verbose=False):
+        """
+        Perform multilevel quasi-Monte Carlo simulation. Each level is
+        evaluated on the same number of points of several independent
+        randomizations of a low discrepancy sequence, and the variance of the
+        estimate of each level is computed from the spread of the means of
+        its randomizations. The number of points of the level offering the
+        largest reduction of variance per cost is doubled until the variance
+        of the estimate is below epsilon squared.
+
+        Requires data that can generate randomized points from any position
+        of the sequence, such as QMCInput.
+
+        :param epsilon: Desired accuracy to be achieved for each quantity of
+            interest.
+        :type epsilon: float, list of floats, or ndarray.
+        :param initial_sample_sizes: Number of points per randomization
+            initially evaluated at each level. Powers of two keep the most
+            even spacing of the points.
+        :type initial_sample_sizes: ndarray, int, list
+        :param num_randomizations: Number of randomizations per level.
+        :type num_randomizations: int
+        :param verbose: Whether to print useful diagnostic information.
+        :type verbose: bool
+        :return: Tuple of ndarrays
+            (estimates, sample count per level, variances)
+        """
+        self._verbose = verbose and self._cpu_rank == 0
+
+        if not callable(getattr(self._data, 'get_points', None)):
+            raise TypeError("data must provide a get_points function, " +
+                            "such as QMCInput.")
+
+        if not isinstance(num_randomizations, int):
+            raise TypeError("num_randomizations must be an integer.")
+
+        if num_randomizations < 2:
+            raise ValueError("num_randomizations must be at least 2.")
+
+        self._determine_input_output_size()
+        self._process_epsilon(epsilon)
+
+        num_points = self._verify_sample_sizes(initial_sample_sizes)
+
+        start_time = timeit.default_timer()
+
+        # Sums of output differences of each randomization of each level.
+        output_sums = np.zeros((self._num_levels, num_randomizations,
+                                self._output_size))
+
+        compute_times = np.zeros(self._num_levels)
+        cpu_sample_sizes = np.zeros(self._num_levels, dtype=int)
+
+        for level in range(self._num_levels):
+            self._add_qmc_points(level, 0, num_points[level], output_sums,
+                                 compute_times, cpu_sample_sizes)
+
+        epsilons_squared = np.square(self._epsilons)
+
+        while True:
+
+            means = output_sums / num_points[:, np.newaxis, np.newaxis]
+            level_variances = np.var(means, axis=1, ddof=1) / \
+                num_randomizations
+
+            if np.all(np.sum(level_variances, axis=0) < epsilons_squared):
+                break
+
+            costs = self._compute_costs(compute_times, cpu_sample_sizes)
+
+            # Doubling the points of a level roughly halves its variance at
+            # the cost of the points already evaluated.
+            variance_reduction_per_cost = \
+                np.amax(level_variances / epsilons_squared, axis=1) / \
+                (costs * num_points)
+
+            level = np.argmax(variance_reduction_per_cost)
+
+            if self._verbose:
+                print 'Doubling points of level %s to %s' % \
+                      (level, 2 * num_points[level])
+
+            self._add_qmc_points(level, num_points[level], num_points[level],
+                                 output_sums, compute_times, cpu_sample_sizes)
+
+            num_points[level] *= 2
+
+        self._sample_sizes = num_points * num_randomizations
+        self._estimates = np.sum(np.mean(means, axis=1), axis=0)
+        self._variances = np.sum(level_variances, axis=0)
+
+        run_time = timeit.default_timer() - start_time
+
+        if self._verbose:
+            self._show_summary_data(self._estimates, self._variances,
+                                    run_time)
+
+        return self._estimates, self._sample_sizes, self._variances
+
+    def simulate_continuation(self, epsilons, initial_sample_sizes=100,
+                              verbose=False, joint_allocation=False):
+        """
+        Perform adaptive MLMC simulations for a decreasing sequence of
+        tolerances within one session. The samples, level statistics, and
+        cost estimates of each tolerance are carried forward to the next, so
+        that each tighter tolerance only draws the samples it needs beyond
+        those already evaluated. Levels added by a model factory are kept as
+        well. The setup phase runs once, for the first tolerance.
+
+        :param epsilons: Decreasing sequence of tolerances, each a float or
+            an ndarray with a value for each quantity of interest.
+        :type epsilons: list, tuple, ndarray
+        :param initial_sample_sizes: Sample sizes used when computing cost
+            and variance for each model in setup.
+        :type initial_sample_sizes: ndarray, int, list
+        :param verbose: Whether to print useful diagnostic information.
+        :type verbose: bool
+        :param joint_allocation: Whether to meet the epsilons of all
+            quantities of interest jointly at least total cost.
+        :type joint_allocation: bool
+        :return: list containing, for each tolerance, a tuple of ndarrays
+            (estimates, sample count per level, variances)
+        """
+        self._verbose = verbose and self._cpu_rank == 0
+        self._reuse_setup_samples = True
+        self._balance_cpus = False
+        self._joint_allocation = joint_allocation
+
+        if isinstance(epsilons, (tuple, np.ndarray)) and \
+                np.ndim(epsilons) > 0:
+            epsilons = list(epsilons)
+
+        if not isinstance(epsilons, list) or len(epsilons) == 0:
+            raise TypeError("epsilons must be a non-empty sequence.")
+
+        self._determine_input_output_size()
+
+        # Check the whole schedule before anything is evaluated.
+        schedule = []
+        for epsilon in epsilons:
+
+            self._process_epsilon(epsilon)
+
+            if len(schedule) > 0 and np.any(self._epsilons > schedule[-1]):
+                raise ValueError("epsilons must not increase.")
+
+            schedule.append(self._epsilons)
+
+        self._target_cost = None
+        self._setup_simulation(schedule[0], initial_sample_sizes, None)
+        self._initialize_adaptive_statistics()
+
+        results = []
+
+        for epsilon in schedule:
+
+            self._epsilons = epsilon
+
+            if self._verbose:
+                print 'Tolerance: %s' % np.array2string(self._epsilons)
+
+            results.append(self._refine_adaptive_simulation())
+
+        return results
+
+    def get_convergence_rates(self):
+        """
+        Returns the convergence rates estimated by the last adaptive
+        simulation with at least three levels.
+
+        :return: tuple containing alpha and beta, ndarrays with a rate for
+            each quantity of interest, and gamma, a float; or None if no
+            rates have been estimated.
+        """
+        return self._convergence_rates
+
     def _setup_simulation(self, epsilon, initial_sample_sizes, sample_sizes):
         """
         Performs any necessary manipulation of epsilon and initial_sample_sizes.
@@ -111,10 +508,16 @@ class MLMCSimulator:
         :param initial_sample_sizes: Sample sizes used when computing costs
             and variance for each model in simulation.
         """
+        self._cpu_setup_sample_sizes = np.zeros(self._num_levels, dtype=int)
+
         if sample_sizes is None:
             self._process_epsilon(epsilon)
-            self._initial_sample_sizes = \
-                self._verify_sample_sizes(initial_sample_sizes)
+            # Variances are estimated from the means of at least two sample
+            # groups.
+            self._initial_sample_sizes = np.maximum(
+                self._round_up_to_sample_groups(
+                    self._verify_sample_sizes(initial_sample_sizes)),
+                2 * self._sample_group_size)
 
             costs, variances = self._compute_costs_and_variances()
             self._compute_optimal_sample_sizes(costs, variances)
@@ -123,7 +526,8 @@ class MLMCSimulator:
             self._target_cost = None
             self._caching_enabled = False
             sample_sizes = self._verify_sample_sizes(sample_sizes, False)
-            self._process_sample_sizes(sample_sizes, None)
+            self._process_sample_sizes(
+                self._round_up_to_sample_groups(sample_sizes))
 
     def _compute_costs_and_variances(self):
         """
@@ -143,18 +547,44 @@ class MLMCSimulator:
         # layers evaluated from the same samples.
         compute_times = np.zeros(self._num_levels)
 
+        # Only setup outputs are cached so that the cache stays the size of
+        # the setup phase.
+        self._caching_model_outputs = self._caching_enabled
+
         for level in range(self._num_levels):
 
             input_samples = self._draw_setup_samples(level)
 
             start_time = timeit.default_timer()
+            start_worker_time = self._worker_evaluation_time
+            start_stored_time = self._stored_evaluation_time
+
             self._compute_setup_outputs(input_samples, level)
             compute_times[level] = timeit.default_timer() - start_time
 
+            # When models are evaluated by a pool of workers, the wall time
+            # of the level does not reflect the cost of the evaluations.
+            if isinstance(self._executor, ModelPool):
+                compute_times[level] = \
+                    self._worker_evaluation_time - start_worker_time
+
+            # Outputs loaded from the store count as much as they originally
+            # cost to compute, so costs do not depend on the store contents.
+            compute_times[level] += \
+                self._stored_evaluation_time - start_stored_time
+
+        self._caching_model_outputs = False
+
         # Get outputs across all CPUs before computing variances.
         all_outputs = self._gather_arrays(self._cached_outputs, axis=1)
 
-        variances = np.var(all_outputs, axis=1)
+        # The variance of the means of sample groups is scaled to the
+        # variance per sample giving the same variance of the estimate.
+        group_means = self._average_sample_groups(all_outputs)
+        variances = np.var(group_means, axis=1) * self._sample_group_size
+        # Kept so that adaptive simulations can refine the costs.
+        self._setup_compute_times = compute_times
+
         costs = self._compute_costs(compute_times)
 
         if self._verbose:
@@ -165,7 +595,9 @@ class MLMCSimulator:
     def _initialize_cache(self):
         """
         Sets up the cache for retaining model outputs evaluated in the setup
-        phase for reuse in the simulation phase.
+        phase for reuse in the simulation phase. Output differences of each
+        level are kept for computing variances, while the outputs of each
+        model are kept by sample so that they can be reused by any level.
         """
         # Determine number of samples to be taken on this processor.
         get_cpu_sample_sizes = np.vectorize(self._determine_num_cpu_samples)
@@ -183,6 +615,10 @@ class MLMCSimulator:
                                          max_cpu_sample_size,
                                          self._output_size))
 
+        self._model_output_cache = [dict() for _ in range(self._num_levels)]
+        self._pair_output_cache = [dict() for _ in range(self._num_levels)]
+        self._num_cacheable_samples = 0
+
     def _draw_setup_samples(self, level):
         """
         Draw samples based on initial sample size at specified level.
@@ -196,6 +632,7 @@ class MLMCSimulator:
         # of the data source running out of samples so that we can
         # broadcast into the cache successfully.
         self._cached_inputs[level, :input_samples.shape[0], :] = input_samples
+        self._cpu_setup_sample_sizes[level] = input_samples.shape[0]
 
         return input_samples
 
@@ -206,34 +643,32 @@ class MLMCSimulator:
         :param input_samples: samples to evaluate in model.
         :param level: int level of model
         """
-        num_cpu_samples = self._cpu_initial_sample_sizes[level]
-        lower_level_outputs = np.zeros((num_cpu_samples, self._output_size))
-        for i, sample in enumerate(input_samples):
-
-            self._cached_outputs[level, i] = \
-                self._models[level].evaluate(sample)
+        num_samples = input_samples.shape[0]
 
-            if level > 0:
-                lower_level_outputs[i] = \
-                    self._models[level - 1].evaluate(sample)
+        self._cached_outputs[level, :num_samples] = \
+            self._evaluate_level(input_samples, level)
 
-        self._cached_outputs[level] -= lower_level_outputs
-
-    def _compute_costs(self, compute_times):
+    def _compute_costs(self, compute_times, cpu_sample_sizes=None):
         """
         Set costs for each level, either from precomputed values from each
         model or based on computation times provided by compute_times.
 
         :param compute_times: ndarray of computation times for computing
         model at each layer and preceding layer.
+        :param cpu_sample_sizes: ndarray of number of samples on this CPU
+            over which compute_times were measured. Defaults to the setup
+            sample sizes.
         """
+        if cpu_sample_sizes is None:
+            cpu_sample_sizes = self._cpu_initial_sample_sizes
+
         # If the models have costs predetermined, use them to compute costs
         # between each level.
         if self._models_have_costs():
             costs = self._get_costs_from_models()
         else:
             # Compute costs based on compute time differences between levels.
-            costs = compute_times / self._cpu_initial_sample_sizes \
+            costs = compute_times / np.maximum(cpu_sample_sizes, 1) \
                     * self._num_cpus
 
         costs = self._mean_over_all_cpus(costs)
@@ -264,12 +699,22 @@ class MLMCSimulator:
         Collect cost value from each model.
         :return: ndarray of costs.
         """
-        costs = np.ones(self._num_levels)
+        model_costs = np.ones(self._num_levels)
         for i, model in enumerate(self._models):
-            costs[i] = model.cost
+            model_costs[i] = model.cost
 
         # Costs at level > 0 should be summed with previous level.
-        costs[1:] = costs[1:] + costs[:-1]
+        costs = np.copy(model_costs)
+        costs[1:] = model_costs[1:] + model_costs[:-1]
+
+        # Models that evaluate both levels at once may specify the cost of
+        # doing so.
+        for i, model in enumerate(self._models[1:], 1):
+
+            if hasattr(model, 'evaluate_pair') and \
+                    getattr(model, 'pair_cost', None) is not None:
+
+                costs[i] = model.pair_cost
 
         return costs
 
@@ -283,93 +728,188 @@ class MLMCSimulator:
         if self._verbose:
             print "Computing optimal sample sizes: "
 
-        # Need 2d version of costs in order to vectorize the operations.
-        costs = costs[:, np.newaxis]
-
-        mu = self._compute_mu(costs, variances)
-
-        # Compute sample sizes.
-        sqrt_v_over_c = np.sqrt(variances / costs)
-        sample_sizes = np.amax(np.trunc(mu * sqrt_v_over_c), axis=1)
+        if self._target_cost is None:
+            sample_sizes = self._allocate_sample_sizes(costs, variances)
+        else:
+            sample_sizes = self._allocate_target_cost(costs, variances)
 
-        self._process_sample_sizes(sample_sizes, costs)
+        self._process_sample_sizes(sample_sizes)
 
         if self._verbose:
 
             print np.array2string(self._sample_sizes)
 
-            estimated_runtime = np.dot(self._sample_sizes, np.squeeze(costs))
+            estimated_runtime = np.dot(self._sample_sizes, costs)
 
             self._show_time_estimate(estimated_runtime)
 
-    def _compute_mu(self, costs, variances):
+    def _allocate_sample_sizes(self, costs, variances):
         """
-        Computes the mu value used to compute sample sizes.
+        Finds the integer sample sizes of least cost for which the variance
+        of the estimate of each quantity of interest is below its epsilon
+        squared, and takes the largest over all quantities of interest at
+        each level, or finds sample sizes meeting all of them jointly.
 
-        :param costs: 2d ndarray of costs
-        :param variances: ndarray of variances
-        :return: ndarray of mu value for each QoI.
+        :param costs: 1d ndarray of costs
+        :param variances: 2d ndarray of variances
+        :return: 1d ndarray of sample sizes.
         """
-        sum_sqrt_vc = np.sum(np.sqrt(variances * costs), axis=0)
+        if self._joint_allocation:
+            allocator = self._create_allocator(costs, variances)
+            sample_sizes = \
+                allocator.minimize_joint_cost(np.square(self._epsilons))
 
-        if self._target_cost is None:
-            mu = np.power(self._epsilons, -2) * sum_sqrt_vc
-        else:
-            mu = self._target_cost * float(self._num_cpus) / sum_sqrt_vc
+            self._show_allocation_gap(allocator)
+
+            return sample_sizes
+
+        allocators = [self._create_allocator(costs, variances[:, i])
+                      for i in range(len(self._epsilons))]
+
+        # Rounded up relaxed sample sizes meet each epsilon, so only the
+        # quantities of interest setting the sample size of some level are
+        # worth searching for better integer sample sizes.
+        rounded_sample_sizes = np.array(
+            [allocator.round_up_cost_relaxation(epsilon ** 2)
+             for allocator, epsilon in zip(allocators, self._epsilons)])
+
+        searched = np.zeros(len(self._epsilons), dtype=bool)
+        searched[np.argmax(rounded_sample_sizes, axis=0)] = True
+
+        sample_sizes = np.zeros(self._num_levels, dtype=int)
+        if not np.all(searched):
+            sample_sizes = np.amax(rounded_sample_sizes[~searched], axis=0)
+
+        for i in np.flatnonzero(searched):
 
-        return mu
+            sample_sizes = np.maximum(
+                sample_sizes,
+                allocators[i].minimize_cost(self._epsilons[i] ** 2))
 
-    def _process_sample_sizes(self, sample_sizes, costs):
+            self._show_allocation_gap(allocators[i])
+
+        return sample_sizes
+
+    def _allocate_target_cost(self, costs, variances):
         """
-        Make any necessary adjustments to computed sample sizes, including
-        adjustments for staying under target cost and distributing among
-        processors.
+        Finds the integer sample sizes of least variance whose total cost is
+        within the target cost, with at least one sample on each level. The
+        variances of the estimates of all quantities of interest are summed.
+        If the target cost does not cover a sample of every level, the finest
+        levels are left out.
+
+        :param costs: 1d ndarray of costs
+        :param variances: 2d ndarray of variances
+        :return: 1d ndarray of sample sizes.
         """
-        self._sample_sizes = sample_sizes
+        budget = self._target_cost * float(self._num_cpus)
+        sample_sizes = np.zeros(self._num_levels, dtype=int)
 
-        # Manually tweak sample sizes to get predicted cost closer to target.
-        if self._target_cost is not None:
-            self._fit_samples_sizes_to_target_cost(np.squeeze(costs))
+        multiple = self._get_sample_size_multiple()
+        minimum_sample_size = max(self._get_minimum_sample_size(), 1)
+        minimum_sample_size = -(-minimum_sample_size // multiple) * multiple
 
-        # Set sample sizes to ints.
-        self._sample_sizes = self._sample_sizes.astype(int)
+        num_levels = np.searchsorted(np.cumsum(costs) * minimum_sample_size,
+                                     budget * (1. + 1e-12), side='right')
 
-        # If target cost is less than cost of least expensive model, run it
-        # once so we are at least doing something in the simulation.
-        if np.sum(self._sample_sizes) == 0.:
-            self._sample_sizes[0] = 1
+        # Leave the sample sizes empty so that a single sample is run on the
+        # first level.
+        if num_levels == 0:
+            return sample_sizes
 
-        # Divide sampling evenly across CPUs.
-        split_samples = np.vectorize(self._determine_num_cpu_samples)
-        self._cpu_sample_sizes = split_samples(self._sample_sizes)
+        total_variances = np.sum(variances, axis=1)
+
+        allocator = self._create_allocator(costs[:num_levels],
+                                           total_variances[:num_levels],
+                                           np.ones(num_levels, dtype=int))
+
+        sample_sizes[:num_levels] = allocator.minimize_variance(budget)
 
-    def _fit_samples_sizes_to_target_cost(self, costs):
+        self._show_allocation_gap(allocator)
+
+        return sample_sizes
+
+    def _create_allocator(self, costs, variances, minimum_sample_sizes=None):
         """
-        Adjust sample sizes to be as close to the target cost as possible.
+        Creates a SampleAllocator, restricting sample sizes to multiples of
+        the number of CPUs if requested.
+
+        :param costs: 1d ndarray of costs
+        :param variances: 1d or 2d ndarray of variances
+        :param minimum_sample_sizes: 1d ndarray of smallest sample size of
+            each level, or None.
+        :return: SampleAllocator
         """
-        # Find difference between projected total cost and target.
-        total_cost = np.dot(costs, self._sample_sizes)
-        difference = self._target_cost - total_cost
-        # If the difference is greater than the lowest cost model, adjust
-        # the sample sizes.
-        if abs(difference) > costs[0]:
+        # Measured costs may round to zero for very fast models.
+        costs = np.maximum(costs, np.finfo(float).tiny)
 
-            # Start with highest cost model and add samples in order to fill
-            # the cost gap as much as possible.
-            for i in range(len(costs) - 1, -1, -1):
-                if costs[i] < abs(difference):
+        if minimum_sample_sizes is None:
+            minimum_sample_sizes = np.zeros(costs.size, dtype=int)
 
-                    # Compute number of samples we can fill the gap with at
-                    # current level.
-                    delta = np.trunc(difference / costs[i])
-                    self._sample_sizes[i] += delta
+        minimum_sample_sizes = np.maximum(minimum_sample_sizes,
+                                          self._get_minimum_sample_size())
 
-                    if self._sample_sizes[i] < 0:
-                        self._sample_sizes[i] = 0
+        return SampleAllocator(costs, variances, minimum_sample_sizes,
+                               self._get_sample_size_multiple())
 
-                    # Update difference from target cost.
-                    total_cost = np.sum(costs * self._sample_sizes)
-                    difference = self._target_cost - total_cost
+    def _get_minimum_sample_size(self):
+        """
+        :return: int smallest sample size of each level. Variances of inputs
+            drawing samples in groups are estimated from the spread of the
+            group means, which takes at least two groups.
+        """
+        if self._sample_group_size > 1:
+            return 2 * self._sample_group_size
+
+        return 0
+
+    def _get_sample_size_multiple(self):
+        """
+        :return: int of which every sample size must be a multiple.
+        """
+        if self._balance_cpus:
+            return self._num_cpus * self._sample_group_size
+
+        return self._sample_group_size
+
+    def _round_up_to_sample_groups(self, sample_sizes):
+        """
+        :param sample_sizes: ndarray of sample sizes.
+        :return: ndarray of sample sizes rounded up to whole sample groups.
+        """
+        group_size = self._sample_group_size
+
+        return -(-sample_sizes // group_size) * group_size
+
+    def _show_allocation_gap(self, allocator):
+        """
+        Used to show how far sample sizes may be from optimal when the
+        allocation search was stopped early and verbose is enabled.
+        :param allocator: SampleAllocator that found the sample sizes.
+        """
+        if not self._verbose or allocator.is_optimal or \
+                not allocator.lower_bound > 0.:
+            return
+
+        print 'Sample sizes within %s%% of optimal.' % \
+              (100. * (allocator.objective / allocator.lower_bound - 1.))
+
+    def _process_sample_sizes(self, sample_sizes):
+        """
+        Make any necessary adjustments to computed sample sizes, including
+        distributing among processors.
+        """
+        # Set sample sizes to ints.
+        self._sample_sizes = np.asarray(sample_sizes).astype(int)
+
+        # If target cost is less than cost of least expensive model, run it
+        # once so we are at least doing something in the simulation.
+        if np.sum(self._sample_sizes) == 0.:
+            self._sample_sizes[0] = self._sample_group_size
+
+        # Divide sampling evenly across CPUs.
+        split_samples = np.vectorize(self._determine_num_cpu_samples)
+        self._cpu_sample_sizes = split_samples(self._sample_sizes)
 
     def _run_simulation(self):
         """
@@ -382,8 +922,10 @@ class MLMCSimulator:
             variances: Variance of model outputs at each level.
         """
         # Sampling needs to be restarted from beginning due to sampling
-        # having been performed in setup phase.
-        self._data.reset_sampling()
+        # having been performed in setup phase, unless the setup samples are
+        # part of the simulation, in which case only new samples are drawn.
+        if not self._reuse_setup_samples:
+            self._reset_sampling()
 
         start_time = timeit.default_timer()
         estimates, variances = self._run_simulation_loop()
@@ -394,81 +936,454 @@ class MLMCSimulator:
 
         return estimates, self._sample_sizes, variances
 
+    def _run_adaptive_simulation(self):
+        """
+        Runs the simulation in rounds, starting from the outputs of the setup
+        phase. Each round recomputes the optimal sample sizes from the
+        statistics of all samples so far and evaluates only the additional
+        samples needed, until no level needs more samples. If the models are
+        created by a model factory, finer levels are then added until the
+        estimated bias is small enough.
+
+        :return: tuple containing three ndarrays:
+            estimates: Estimates for each quantity of interest.
+            sample_sizes: The sample sizes used at each level.
+            variances: Variance of the estimates.
+        """
+        self._initialize_adaptive_statistics()
+
+        return self._refine_adaptive_simulation()
+
+    def _initialize_adaptive_statistics(self):
+        """
+        Starts the running statistics, compute times, and sample counts of
+        each level from the outputs of the setup phase.
+        """
+        self._statistics = RunningStatistics(self._num_levels,
+                                             self._output_size)
+
+        for level in range(self._num_levels):
+
+            self._update_sim_loop_values(self._cached_outputs[
+                level, :self._cpu_setup_sample_sizes[level]], level)
+
+        self._level_compute_times = np.copy(self._setup_compute_times)
+        self._level_cpu_sample_sizes = np.copy(self._cpu_setup_sample_sizes)
+
+    def _refine_adaptive_simulation(self):
+        """
+        Adds samples, and levels if the models are created by a model
+        factory, to the running statistics until the current epsilon is met.
+
+        :return: tuple containing three ndarrays:
+            estimates: Estimates for each quantity of interest.
+            sample_sizes: The sample sizes used at each level.
+            variances: Variance of the estimates.
+        """
+        start_time = timeit.default_timer()
+
+        # When levels can be added, half of epsilon squared is left for the
+        # squared bias of the finest level.
+        variance_share = 1.
+        if self._model_factory is not None:
+            variance_share = .5
+
+        while True:
+
+            self._run_adaptive_rounds(variance_share)
+            self._estimate_convergence_rates()
+
+            if self._model_factory is None or self._bias_is_within_target():
+                break
+
+            if self._num_levels == self._max_levels:
+                if self._verbose:
+                    print 'Maximum number of levels reached before the ' \
+                          'estimated bias met the target precision.'
+                break
+
+            self._add_level()
+
+        self._sample_sizes = self._get_adaptive_sample_sizes()
+        self._estimates = self._statistics.get_estimates()
+        self._variances = self._statistics.get_estimator_variances()
+
+        run_time = timeit.default_timer() - start_time
+
+        if self._verbose:
+            self._show_summary_data(self._estimates, self._variances,
+                                    run_time)
+
+        return self._estimates, self._sample_sizes, self._variances
+
+    def _run_adaptive_rounds(self, variance_share):
+        """
+        Draws and evaluates the shortfall from the optimal sample size of
+        each level until no level needs more samples.
+
+        :param variance_share: Fraction of epsilon squared allowed for the
+            variance of the estimate.
+        """
+        while True:
+
+            costs, variances = self._get_adaptive_costs_and_variances()
+            sample_sizes = self._round_up_to_sample_groups(
+                self._compute_adaptive_sample_sizes(costs, variances,
+                                                    variance_share))
+
+            # Levels added by the model factory need at least two samples
+            # for their variance to be estimated.
+            if self._model_factory is not None:
+                sample_sizes[self._num_initial_levels:] = np.maximum(
+                    sample_sizes[self._num_initial_levels:],
+                    2 * self._sample_group_size)
+
+            shortfalls = np.maximum(
+                sample_sizes - self._get_adaptive_sample_sizes(), 0)
+
+            if self._verbose:
+                print 'Additional samples: %s' % np.array2string(shortfalls)
+
+            if not np.any(shortfalls):
+                return
+
+            num_new_samples = 0
+            for level in np.flatnonzero(shortfalls):
+
+                num_previous_samples = self._statistics.sample_sizes[level]
+
+                start_level_time = timeit.default_timer()
+                start_worker_time = self._worker_evaluation_time
+
+                self._level_cpu_sample_sizes[level] += \
+                    self._evaluate_level_in_chunks(level, shortfalls[level])
+
+                # Includes the time spent drawing samples, which is small
+                # compared to model evaluations.
+                self._level_compute_times[level] += \
+                    self._get_evaluation_time(start_level_time,
+                                              start_worker_time)
+
+                num_new_samples += self._statistics.sample_sizes[level] - \
+                    num_previous_samples
+
+            # Stop if the input data has run out of samples.
+            if num_new_samples == 0:
+                return
+
+    def _get_adaptive_sample_sizes(self):
+        """
+        :return: ndarray of number of samples of each level in the running
+            statistics, which hold one mean output per sample group.
+        """
+        return self._statistics.sample_sizes * self._sample_group_size
+
+    def _get_adaptive_costs_and_variances(self):
+        """
+        Estimates the cost and variance of each level from the samples
+        evaluated so far. For levels added by the model factory, values are
+        extrapolated from the level below using the estimated convergence
+        rates while the level has no samples, and its variance is kept from
+        falling far below the extrapolation while it has only a few.
+
+        :return: tuple of ndarrays:
+            1d ndarray of costs
+            2d ndarray of variances
+        """
+        costs = self._compute_costs(self._level_compute_times,
+                                    self._level_cpu_sample_sizes)
+        variances = self._statistics.get_variances() * \
+            self._sample_group_size
+
+        if self._model_factory is None:
+            return costs, variances
+
+        for level in range(self._num_initial_levels, self._num_levels):
+
+            _, beta, gamma = self._convergence_rates
+
+            extrapolated_variances = variances[level - 1] / 2. ** beta
+
+            if self._statistics.sample_sizes[level] == 0:
+                variances[level] = extrapolated_variances
+
+                if not self._models_have_costs():
+                    costs[level] = costs[level - 1] * 2. ** gamma
+            else:
+                variances[level] = np.maximum(variances[level],
+                                              .5 * extrapolated_variances)
+
+        return costs, variances
+
+    def _compute_adaptive_sample_sizes(self, costs, variances,
+                                       variance_share=1.):
+        """
+        Computes the optimal sample size of each level for the current
+        estimates of costs and variances. Sample sizes are rounded up so that
+        the variance of the estimate is below the given share of epsilon
+        squared once every level has reached them.
+
+        :param costs: 1d ndarray of costs
+        :param variances: 2d ndarray of variances
+        :param variance_share: Fraction of epsilon squared allowed for the
+            variance of the estimate.
+        :return: 1d ndarray of sample sizes.
+        """
+        if self._joint_allocation:
+            allocator = self._create_allocator(
+                costs, variances, self._get_adaptive_sample_sizes())
+
+            return allocator.minimize_joint_cost(
+                variance_share * np.square(self._epsilons))
+
+        costs = costs[:, np.newaxis]
+
+        sum_sqrt_vc = np.sum(np.sqrt(variances * costs), axis=0)
+        mu = np.power(self._epsilons, -2) * sum_sqrt_vc / variance_share
+
+        sqrt_v_over_c = np.sqrt(variances / costs)
+
+        return np.amax(np.ceil(mu * sqrt_v_over_c), axis=1).astype(int)
+
+    def _estimate_convergence_rates(self):
+        """
+        Estimates the rates alpha, beta, and gamma at which the magnitude of
+        the mean output difference, the variance, and the cost of each level
+        change from one level to the next, such that E[Y_l] ~ 2^(-alpha l),
+        V_l ~ 2^(-beta l), and C_l ~ 2^(gamma l). The rates are fit by least
+        squares over the levels above level 0, and are bounded below by 0.5
+        so that extrapolations to finer levels remain conservative. Requires
+        at least three levels.
+        """
+        if self._num_levels < 3:
+            return
+
+        levels = np.arange(1, self._num_levels)
+
+        costs = self._compute_costs(self._level_compute_times,
+                                    self._level_cpu_sample_sizes)
+
+        # Avoid taking the log of zero for levels that agree exactly.
+        tiny = np.finfo(float).tiny
+        log_means = np.log2(np.maximum(np.abs(self._statistics.means[1:]),
+                                       tiny))
+        log_variances = np.log2(np.maximum(
+            self._statistics.get_variances()[1:], tiny))
+        log_costs = np.log2(np.maximum(costs[1:], tiny))
+
+        alpha = np.maximum(-np.polyfit(levels, log_means, 1)[0], .5)
+        beta = np.maximum(-np.polyfit(levels, log_variances, 1)[0], .5)
+        gamma = max(np.polyfit(levels, log_costs, 1)[0], .5)
+
+        self._convergence_rates = (alpha, beta, gamma)
+
+        if self._verbose:
+            print 'Convergence rates: alpha: %s, beta: %s, gamma: %s' % \
+                  (np.array2string(alpha), np.array2string(beta), gamma)
+
+    def _bias_is_within_target(self):
+        """
+        Estimates the bias of the finest level from the mean output
+        differences of up to three of the finest levels, extrapolated with
+        the convergence rate alpha, and compares it to the share of epsilon
+        left for the bias.
+
+        :return: bool indicating whether the squared bias is below half of
+            epsilon squared for every quantity of interest.
+        """
+        alpha = self._convergence_rates[0]
+        finest_level = self._num_levels - 1
+
+        extrapolated_means = [np.abs(self._statistics.means[level]) /
+                              2. ** ((finest_level - level) * alpha)
+                              for level in range(max(finest_level - 2, 1),
+                                                 finest_level + 1)]
+
+        bias = np.amax(extrapolated_means, axis=0) / (2. ** alpha - 1.)
+
+        return np.all(np.square(bias) < .5 * np.square(self._epsilons))
+
+    def _add_level(self):
+        """
+        Creates the model of the next finer level with the model factory and
+        extends the per level state of the simulation to include it.
+        """
+        level = self._num_levels
+        model = self._model_factory(level)
+
+        if self._verbose:
+            print 'Adding level %s' % level
+
+        self._models.append(model)
+        self._num_levels += 1
+
+        self._model_output_cache.append(dict())
+        self._pair_output_cache.append(dict())
+        if self._evaluation_store is not None:
+            self._model_keys.append(EvaluationStore.get_model_key(model))
+
+        self._statistics.add_level()
+        self._level_compute_times = np.append(self._level_compute_times, 0.)
+        self._level_cpu_sample_sizes = \
+            np.append(self._level_cpu_sample_sizes, 0)
+
+    def _add_qmc_points(self, level, start, num_points, output_sums,
+                        compute_times, cpu_sample_sizes):
+        """
+        Evaluates consecutive points of each randomization of a level and adds
+        their output differences to the sums of the randomizations. Each CPU
+        only generates and evaluates its own share of the points.
+
+        :param level: int level.
+        :param start: Position in the sequence of the first point.
+        :param num_points: Number of points per randomization.
+        :param output_sums: 3d ndarray of sums of output differences by
+            level and randomization, updated in place.
+        :param compute_times: ndarray of evaluation time of each level on
+            this CPU, updated in place.
+        :param cpu_sample_sizes: ndarray of number of points evaluated on
+            this CPU at each level, updated in place.
+        """
+        num_randomizations = output_sums.shape[1]
+
+        num_cpu_points = self._determine_num_cpu_samples(num_points)
+        cpu_start = start + self._cpu_rank * (num_points // self._num_cpus) + \
+            min(self._cpu_rank, num_points % self._num_cpus)
+
+        # Randomizations are numbered so that no two levels share one.
+        samples = np.vstack([
+            self._data.get_points(level * num_randomizations + randomization,
+                                  cpu_start, num_cpu_points)
+            for randomization in range(num_randomizations)])
+
+        start_time = timeit.default_timer()
+        start_worker_time = self._worker_evaluation_time
+
+        outputs = self._evaluate_level(samples, level)
+
+        compute_times[level] += \
+            self._get_evaluation_time(start_time, start_worker_time)
+        cpu_sample_sizes[level] += samples.shape[0]
+
+        outputs = outputs.reshape(num_randomizations, num_cpu_points,
+                                  self._output_size)
+
+        output_sums[level] += self._sum_over_all_cpus(np.sum(outputs, axis=1))
+
     def _run_simulation_loop(self):
         """
         Main simulation loop where sample sizes determined in setup phase are
-        drawn from the input data and run through the models. Values for
-        computing the estimates and variances are accumulated at each level.
+        drawn from the input data and run through the models. Samples are
+        evaluated in chunks whose output differences are added to running
+        statistics of each level, from which the estimates and variances are
+        computed.
 
         :return: tuple containing two ndarrays:
             estimates: Estimates for each quantity of interest.
             variances: Variance of model outputs at each level.
         """
+        self._statistics = RunningStatistics(self._num_levels,
+                                             self._output_size)
+
         for level in range(self._num_levels):
 
-            if self._sample_sizes[level] == 0:
-                continue
+            num_setup_samples = 0
+            self._cpu_sample_sizes[level] = 0
 
-            samples = self._get_sim_loop_samples(level)
-            output_differences = self._get_sim_loop_outputs(samples, level)
-            self._update_sim_loop_values(output_differences, level)
+            if self._reuse_setup_samples:
+                num_setup_samples = self._sum_over_all_cpus(
+                    self._cpu_setup_sample_sizes[level])
 
-        return self._estimates, self._variances
+            if num_setup_samples > 0:
+                cpu_setup_samples = self._cpu_setup_sample_sizes[level]
 
-    def _get_sim_loop_samples(self, level):
-        """
-        Acquires input samples for designated level.
+                self._update_sim_loop_values(
+                    self._cached_outputs[level, :cpu_setup_samples], level)
+                self._cpu_sample_sizes[level] = cpu_setup_samples
 
-        :param level: int of level for which samples are to be acquired.
-        :return: ndarray of input samples.
-        """
-        samples = self._draw_samples(self._sample_sizes[level])
-        num_samples = samples.shape[0]
+            num_new_samples = self._sample_sizes[level] - num_setup_samples
+            if num_new_samples > 0:
+                self._cpu_sample_sizes[level] += \
+                    self._evaluate_level_in_chunks(level, num_new_samples)
 
-        # Update sample sizes in case we've run short on samples.
-        self._cpu_sample_sizes[level] = num_samples
+            # Update sample sizes in case we've run short on samples.
+            self._sample_sizes[level] = \
+                self._sum_over_all_cpus(self._cpu_sample_sizes[level])
 
-        return samples
+        self._estimates = self._statistics.get_estimates()
+        self._variances = self._statistics.get_estimator_variances()
 
-    def _get_sim_loop_outputs(self, samples, level):
+        return self._estimates, self._variances
+
+    def _evaluate_level_in_chunks(self, level, num_samples):
         """
-        Get the output differences for given level and samples.
+        Draws and evaluates samples of a level in chunks of at most
+        chunk_size samples over all CPUs, adding the output differences of
+        each chunk to the running statistics before drawing the next, so that
+        only one chunk of outputs is held at a time.
 
-        :param samples: ndarray of input samples.
         :param level: int level of model to run.
-
-        :return: ndarray of output differences between samples from
-            designated level and level below (if applicable).
+        :param num_samples: int number of samples over all CPUs.
+        :return: int number of samples evaluated on this CPU.
         """
-        num_samples = samples.shape[0]
+        num_cpu_samples = 0
 
-        if num_samples == 0:
-            return np.zeros((1, self._output_size))
+        for start in range(0, num_samples, self._chunk_size):
 
-        output_differences = np.zeros((num_samples, self._output_size))
+            samples = self._draw_samples(min(self._chunk_size,
+                                             num_samples - start))
 
-        for i, sample in enumerate(samples):
-            output_differences[i] = self._evaluate_sample(sample, level)
+            outputs = np.zeros((0, self._output_size))
+            if samples.shape[0] > 0:
+                outputs = self._evaluate_level(samples, level)
 
-        return output_differences
+            # Called on every CPU, even those without samples, since the
+            # statistics are combined over all CPUs.
+            self._update_sim_loop_values(outputs, level)
+            num_cpu_samples += samples.shape[0]
+
+        return num_cpu_samples
 
     def _update_sim_loop_values(self, outputs, level):
         """
-        Update running totals for estimates and variances based on the output
-        differences at a particular level.
+        Adds output differences computed on this CPU to the running
+        statistics of a level, after averaging each sample group. With
+        multiple CPUs, only the sample size, mean, and sum of squared
+        deviations of each CPU's outputs are exchanged, and they are combined
+        in order of CPU rank.
 
         :param outputs: ndarray of output differences.
         :param level: int of level at which differences were computed.
         """
-        cpu_samples = self._cpu_sample_sizes[level]
+        outputs = self._average_sample_groups(outputs)
 
-        all_output_differences = self._gather_arrays(outputs, axis=0)
+        if self._num_cpus == 1:
+            self._statistics.update(level, outputs)
+            return
+
+        all_summaries = self._comm.allgather(
+            RunningStatistics.summarize(outputs))
 
-        self._sample_sizes[level] = self._sum_over_all_cpus(cpu_samples)
-        num_samples = float(self._sample_sizes[level])
+        for summary in all_summaries:
+            self._statistics.combine(level, *summary)
 
-        self._estimates += np.sum(all_output_differences, axis=0) / num_samples
-        self._variances += np.var(all_output_differences, axis=0) / num_samples
+    def _average_sample_groups(self, outputs):
+        """
+        Averages the outputs of each group of consecutive samples, such as an
+        antithetic pair, so that level statistics account for the
+        correlation of the samples within a group.
+
+        :param outputs: ndarray of outputs with one sample per row along the
+            second to last axis.
+        :return: ndarray with one mean output per sample group.
+        """
+        if self._sample_group_size == 1:
+            return outputs
+
+        shape = outputs.shape[:-2] + \
+            (-1, self._sample_group_size, outputs.shape[-1])
+
+        return np.mean(outputs.reshape(shape), axis=-2)
 
     def _evaluate_sample(self, sample, level):
         """
@@ -480,21 +1395,409 @@ class MLMCSimulator:
         :param level: model level
         :return: result of evaluation
         """
-        sample_indices = np.empty(0)
-        if self._caching_enabled:
-            sample_indices = np.argwhere(sample == self._cached_inputs[level])
+        return self._evaluate_level(sample[np.newaxis, :], level)[0]
+
+    def _get_cache_key(self, sample):
+        """
+        Returns the key identifying a sample in the model output cache.
+        Samples are converted to the layout of the cached inputs so that equal
+        samples have equal keys regardless of how they were drawn.
+
+        :param sample: 1d ndarray or scalar sample.
+        :return: str of sample bytes.
+        """
+        sample = np.ascontiguousarray(sample, dtype=float).reshape(
+            self._input_size)
+
+        # Adding zero turns -0. into 0. so that both compare as equal.
+        return (sample + 0.).tobytes()
+
+    def _evaluate_level(self, samples, level):
+        """
+        Runs a block of samples through the model at the given level. For
+        levels > 0, the outputs of the level below are subtracted. Model
+        outputs already in the cache are reused rather than recomputed.
+        Differences are weighted by the likelihood ratios of the samples if
+        the data provides them.
+
+        :param samples: 2d ndarray of samples.
+        :param level: model level
+        :return: 2d ndarray of output differences.
+        """
+        # Models that can compute the lower level's outputs along with their
+        # own share the work between both levels.
+        if level > 0 and hasattr(self._models[level], 'evaluate_pair'):
+
+            outputs, lower_level_outputs = \
+                self._evaluate_model_pair(level, samples)
+
+            return self._weight_outputs(samples,
+                                        outputs - lower_level_outputs)
+
+        outputs = self._evaluate_model(level, samples)
+
+        # If we are at a level greater than 0, compute outputs for lower
+        # level and subtract them from this level's outputs.
+        if level > 0:
+            outputs -= self._evaluate_model(level - 1, samples)
+
+        return self._weight_outputs(samples, outputs)
+
+    def _weight_outputs(self, samples, outputs):
+        """
+        Multiplies the outputs of each sample by its likelihood ratio when
+        the data draws samples from a biasing density, so that means of the
+        outputs are those of the nominal density. Outputs are left unchanged
+        otherwise.
+
+        :param samples: 2d ndarray of samples.
+        :param outputs: 2d ndarray with one row of outputs per sample.
+        :return: 2d ndarray of weighted outputs.
+        """
+        if not hasattr(self._data, 'get_likelihood_ratios'):
+            return outputs
+
+        likelihood_ratios = self._data.get_likelihood_ratios(samples)
+
+        return outputs * likelihood_ratios[:, np.newaxis]
+
+    def _evaluate_model_pair(self, level, samples):
+        """
+        Evaluates the model at the given level and the model one level below
+        on a block of samples, loading outputs from the cache or the
+        evaluation store where available. Samples for which either output is
+        missing are evaluated with the evaluate_pair function of the model.
+
+        :param level: model level > 0
+        :param samples: 2d ndarray of samples.
+        :return: tuple of 2d ndarrays of outputs of the model at the given
+            level and of the model one level below.
+        """
+        if self._evaluation_store is None and not self._caching_enabled:
+            return self._run_model_pair(level, samples)
+
+        outputs, missing = self._load_outputs(level, samples)
+        lower_level_outputs, lower_level_missing = \
+            self._load_outputs(level, samples, pair=True)
+
+        missing |= lower_level_missing
+
+        if np.any(missing):
+            start_time = timeit.default_timer()
+            start_worker_time = self._worker_evaluation_time
+
+            outputs[missing], lower_level_outputs[missing] = \
+                self._run_model_pair(level, samples[missing])
+
+            evaluation_time = \
+                self._get_evaluation_time(start_time, start_worker_time)
+
+            # Both outputs come from one computation, whose time is divided
+            # between them so that loading both counts the whole time.
+            time_share = self._get_pair_time_share(level)
+
+            self._save_outputs(level, samples[missing], outputs[missing],
+                               time_share * evaluation_time)
+            self._save_outputs(level, samples[missing],
+                               lower_level_outputs[missing],
+                               (1. - time_share) * evaluation_time, pair=True)
+
+        return outputs, lower_level_outputs
+
+    def _get_pair_time_share(self, level):
+        """
+        Returns the fraction of the time of an evaluate_pair call attributed
+        to the output of the model at the given level: its cost over its
+        pair_cost if the model has both, and otherwise the whole time, since
+        the lower level output usually comes almost for free.
+
+        :param level: model level > 0
+        :return: float in [0, 1].
+        """
+        model = self._models[level]
+        cost = getattr(model, 'cost', None)
+        pair_cost = getattr(model, 'pair_cost', None)
+
+        if cost is None or not pair_cost:
+            return 1.
+
+        return min(float(cost) / pair_cost, 1.)
+
+    def _run_model_pair(self, level, samples):
+        """
+        Evaluates the model at the given level and the model one level below
+        on a block of samples with a single call to the evaluate_pair function
+        of the model at the given level for each sample.
 
-        if len(sample_indices) == 1:
-            output = self._cached_outputs[level, sample_indices[0]][0]
+        :param level: model level > 0
+        :param samples: 2d ndarray of samples.
+        :return: tuple of 2d ndarrays of outputs of the model at the given
+            level and of the model one level below.
+        """
+        num_samples = samples.shape[0]
+        outputs = np.zeros((num_samples, self._output_size))
+        lower_level_outputs = np.zeros_like(outputs)
+
+        if num_samples == 0:
+            return outputs, lower_level_outputs
+
+        if isinstance(self._executor, ModelPool):
+            outputs[:], lower_level_outputs[:], evaluation_time = \
+                self._executor.evaluate_pair(level, samples)
+
+            self._worker_evaluation_time += evaluation_time
+
+            return outputs, lower_level_outputs
+
+        evaluate_pair = self._models[level].evaluate_pair
+
+        if self._executor is None:
+            results = [evaluate_pair(sample) for sample in samples]
         else:
-            output = self._models[level].evaluate(sample)
+            futures = [self._executor.submit(evaluate_pair, sample)
+                       for sample in samples]
+            results = [future.result() for future in futures]
+
+        for i, result in enumerate(results):
+            outputs[i], lower_level_outputs[i] = result
+
+        return outputs, lower_level_outputs
+
+    def _evaluate_model(self, model_index, samples):
+        """
+        Evaluates a model on a block of samples, loading outputs from the
+        cache or the evaluation store where available and evaluating only the
+        samples missing from both.
+
+        :param model_index: Index of model to be evaluated.
+        :param samples: 2d ndarray of samples.
+        :return: 2d ndarray of model outputs with one row per sample.
+        """
+        if self._evaluation_store is None and not self._caching_enabled:
+            return self._run_model(model_index, samples)
+
+        outputs, missing = self._load_outputs(model_index, samples)
+
+        if np.any(missing):
+            start_time = timeit.default_timer()
+            start_worker_time = self._worker_evaluation_time
+
+            outputs[missing] = self._run_model(model_index, samples[missing])
+
+            self._save_outputs(model_index, samples[missing], outputs[missing],
+                               self._get_evaluation_time(start_time,
+                                                         start_worker_time))
+
+        return outputs
+
+    def _load_outputs(self, model_index, samples, pair=False):
+        """
+        Loads outputs of a model from the cache and then from the evaluation
+        store.
+
+        :param model_index: Index of model.
+        :param samples: 2d ndarray of samples.
+        :param pair: Whether to load the outputs of the model one level
+            below computed by the evaluate_pair function of the model, which
+            are kept apart from that model's own outputs.
+        :return: tuple containing a 2d ndarray of outputs with one row per
+            sample, and a 1d boolean ndarray marking the samples whose outputs
+            were found in neither.
+        """
+        outputs = np.zeros((samples.shape[0], self._output_size))
+        missing = np.ones(samples.shape[0], dtype=bool)
+
+        model_output_cache = self._get_output_cache(model_index, pair)
+
+        # The cache only holds outputs of samples drawn in the setup phase,
+        # so only samples that may have been drawn then are looked up.
+        if self._caching_enabled and model_output_cache:
+
+            num_cacheable_samples = samples.shape[0]
+            if samples is self._drawn_samples:
+                num_cacheable_samples = self._num_drawn_cacheable_samples
+
+            for i, sample in enumerate(samples[:num_cacheable_samples]):
+
+                cached_output = \
+                    model_output_cache.get(self._get_cache_key(sample))
+
+                if cached_output is not None:
+                    outputs[i] = cached_output
+                    missing[i] = False
 
-            # If we are at a level greater than 0, compute outputs for lower
-            # level and subtract them from this level's outputs.
-            if level > 0:
-                output -= self._models[level-1].evaluate(sample)
+        if self._evaluation_store is None or \
+                self._evaluation_store.is_empty() or not np.any(missing):
+            return outputs, missing
+
+        missing_indices = np.flatnonzero(missing)
+
+        stored_outputs, evaluation_time = \
+            self._evaluation_store.load(self._get_store_key(model_index, pair),
+                                        samples[missing_indices])
+
+        for i, stored_output in zip(missing_indices, stored_outputs):
+
+            if stored_output is not None:
+                outputs[i] = stored_output
+                missing[i] = False
+
+        self._stored_evaluation_time += evaluation_time
+
+        return outputs, missing
+
+    def _save_outputs(self, model_index, samples, outputs, evaluation_time,
+                      pair=False):
+        """
+        Adds newly computed outputs of a model to the cache during the setup
+        phase and to the evaluation store if one was provided.
+
+        :param model_index: Index of model.
+        :param samples: 2d ndarray of samples.
+        :param outputs: 2d ndarray of outputs with one row per sample.
+        :param evaluation_time: Time spent computing the outputs.
+        :param pair: Whether the outputs are those of the model one level
+            below computed by the evaluate_pair function of the model.
+        """
+        if self._caching_model_outputs:
+            model_output_cache = self._get_output_cache(model_index, pair)
+            self._num_cacheable_samples = self._num_drawn_samples
+
+            for sample, output in zip(samples, outputs):
+                model_output_cache[self._get_cache_key(sample)] = \
+                    np.copy(output)
+
+        if self._evaluation_store is not None:
+            self._evaluation_store.save(self._get_store_key(model_index, pair),
+                                        samples, outputs, evaluation_time)
+
+    def _get_output_cache(self, model_index, pair):
+        """
+        :return: dict caching the outputs of a model, or the lower level
+            outputs of its evaluate_pair function if pair is True.
+        """
+        if pair:
+            return self._pair_output_cache[model_index]
+
+        return self._model_output_cache[model_index]
+
+    def _get_store_key(self, model_index, pair):
+        """
+        :return: str identifying the outputs of a model in the evaluation
+            store, or the lower level outputs of its evaluate_pair function
+            if pair is True.
+        """
+        if pair:
+            return self._model_keys[model_index] + '/pair'
+
+        return self._model_keys[model_index]
+
+    def _get_evaluation_time(self, start_time, start_worker_time):
+        """
+        Returns the time spent evaluating models since the given start times,
+        measured on the workers when models are evaluated by a ModelPool.
+        """
+        if isinstance(self._executor, ModelPool):
+            return self._worker_evaluation_time - start_worker_time
+
+        return timeit.default_timer() - start_time
+
+    def _run_model(self, model_index, samples):
+        """
+        Evaluates a model on a block of samples. Models providing an
+        evaluate_batch function receive the samples in blocks of at most
+        batch_size samples; other models are evaluated one sample at a time.
+        If an executor was provided, the evaluations are submitted to it
+        concurrently and the results are collected in sample order.
+
+        :param model_index: Index of model to be evaluated.
+        :param samples: 2d ndarray of samples.
+        :return: 2d ndarray of model outputs with one row per sample.
+        """
+        num_samples = samples.shape[0]
+        outputs = np.zeros((num_samples, self._output_size))
+
+        if num_samples == 0:
+            return outputs
 
-        return output
+        # Worker processes hold their own copies of the models.
+        if isinstance(self._executor, ModelPool):
+            outputs[:], evaluation_time = \
+                self._executor.evaluate(model_index, samples)
+
+            self._worker_evaluation_time += evaluation_time
+
+            return outputs
+
+        model = self._models[model_index]
+
+        if self._max_in_flight is not None and \
+                hasattr(model, 'evaluate_async'):
+
+            return self._evaluate_model_async(model, samples)
+
+        # With an executor and no batch size, submit each sample separately
+        # so that the evaluations can run concurrently.
+        use_batches = hasattr(model, 'evaluate_batch') and \
+            (self._executor is None or self._batch_size is not None)
+
+        if use_batches:
+            block_size = self._batch_size
+            if block_size is None:
+                block_size = max(num_samples, 1)
+
+            evaluate_function = model.evaluate_batch
+            blocks = [samples[start: start + block_size]
+                      for start in range(0, num_samples, block_size)]
+        else:
+            evaluate_function = model.evaluate
+            blocks = [sample for sample in samples]
+
+        if self._executor is None:
+            results = [evaluate_function(block) for block in blocks]
+        else:
+            futures = [self._executor.submit(evaluate_function, block)
+                       for block in blocks]
+            results = [future.result() for future in futures]
+
+        start = 0
+        for result in results:
+
+            num_block_samples = np.size(result) // self._output_size
+            outputs[start: start + num_block_samples] = \
+                np.reshape(result, (num_block_samples, self._output_size))
+
+            start += num_block_samples
+
+        return outputs
+
+    def _evaluate_model_async(self, model, samples):
+        """
+        Evaluates an AsyncModel on a block of samples, keeping up to
+        max_in_flight evaluations running at once. Outputs are collected in
+        sample order.
+
+        :param model: AsyncModel to be evaluated.
+        :param samples: 2d ndarray of samples.
+        :return: 2d ndarray of model outputs with one row per sample.
+        """
+        outputs = np.zeros((samples.shape[0], self._output_size))
+        in_flight = deque()
+
+        for i, sample in enumerate(samples):
+
+            # Wait for the oldest evaluation once the limit is reached.
+            if len(in_flight) == self._max_in_flight:
+                index, handle = in_flight.popleft()
+                outputs[index] = handle.result()
+
+            in_flight.append((i, model.evaluate_async(sample)))
+
+        while in_flight:
+            index, handle = in_flight.popleft()
+            outputs[index] = handle.result()
+
+        return outputs
 
     def _show_summary_data(self, estimates, variances, run_time):
         """
@@ -524,8 +1827,9 @@ class MLMCSimulator:
         Runs first model on a small test sample to determine
         shapes of input and output.
         """
-        self._data.reset_sampling()
-        test_sample = self._draw_samples(self._num_cpus)
+        self._reset_sampling()
+        test_sample = self._draw_samples(self._num_cpus *
+                                         self._sample_group_size)
 
         if test_sample.shape[0] == 0:
             message = "The environment has more CPUs than data samples! " + \
@@ -534,7 +1838,7 @@ class MLMCSimulator:
             raise ValueError(message)
 
         test_sample = test_sample[0]
-        self._data.reset_sampling()
+        self._reset_sampling()
 
         test_output = self._models[0].evaluate(test_sample)
 
@@ -598,6 +1902,9 @@ class MLMCSimulator:
         if not np.all(verified_sample_sizes > 1) and initial_samples:
             raise ValueError("Each initial sample size must be at least 2.")
 
+        if np.any(verified_sample_sizes < 0):
+            raise ValueError("Sample sizes can not be negative.")
+
         return verified_sample_sizes
 
     def _process_target_cost(self, target_cost):
@@ -606,12 +1913,57 @@ class MLMCSimulator:
             self._target_cost = float(target_cost)
 
     @staticmethod
-    def __check_init_parameters(data, models):
+    def __check_init_parameters(data, models, batch_size, executor,
+                                evaluation_store, model_factory, max_levels,
+                                chunk_size):
         """
         Inspect parameters given to init method.
         :param data: Input object provided to init().
         :param models: Model object provided to init().
+        :param batch_size: int or None provided to init().
+        :param executor: Executor or None provided to init().
+        :param evaluation_store: EvaluationStore or None provided to init().
+        :param model_factory: function or None provided to init() as models.
+        :param max_levels: int provided to init().
+        :param chunk_size: int provided to init().
         """
+        if model_factory is not None:
+
+            if isinstance(executor, ModelPool):
+                raise TypeError("A ModelPool can not evaluate models " +
+                                "created by a model factory.")
+
+            if not isinstance(max_levels, int):
+                raise TypeError("max_levels must be an integer.")
+
+            if max_levels < 3:
+                raise ValueError("max_levels must be at least 3.")
+
+        if evaluation_store is not None and \
+                not isinstance(evaluation_store, EvaluationStore):
+
+            raise TypeError("evaluation_store must be an EvaluationStore.")
+
+        if executor is not None and not isinstance(executor, ModelPool) and \
+                not callable(getattr(executor, 'submit', None)):
+
+            raise TypeError("executor must be a ModelPool or provide a " +
+                            "submit function.")
+
+        if batch_size is not None:
+
+            if not isinstance(batch_size, int):
+                raise TypeError("batch_size must be an integer.")
+
+            if batch_size < 1:
+                raise ValueError("batch_size must be a positive integer.")
+
+        if not isinstance(chunk_size, int):
+            raise TypeError("chunk_size must be an integer.")
+
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be a positive integer.")
+
         if not isinstance(data, Input):
             TypeError("data must inherit from Input class.")
 
@@ -639,11 +1991,17 @@ class MLMCSimulator:
                              "dimensions.")
 
     @staticmethod
-    def __check_simulate_parameters(target_cost):
+    def __check_simulate_parameters(target_cost, sample_sizes, adaptive):
         """
         Inspect parameters to simulate method.
         :param target_cost: float or int specifying desired simulation cost.
+        :param sample_sizes: sample sizes provided to simulate().
+        :param adaptive: bool provided to simulate().
         """
+        if adaptive and (target_cost is not None or sample_sizes is not None):
+            raise ValueError("adaptive simulation requires epsilon and can " +
+                             "not be used with target_cost or sample_sizes.")
+
         if target_cost is not None:
 
             if not (isinstance(target_cost, float) or
@@ -654,26 +2012,67 @@ class MLMCSimulator:
             if target_cost <= 0:
                 raise ValueError("maximum cost must be greater than zero.")
 
+    def _reset_sampling(self):
+        """
+        Restarts sampling from the data source, after which the samples drawn
+        in the setup phase are drawn again.
+        """
+        self._data.reset_sampling()
+        self._num_drawn_samples = 0
+
     def _draw_samples(self, num_samples):
         """
         Draw samples from data source.
         :param num_samples: Total number of samples to draw over all CPUs.
         :return: ndarray of samples sliced according to number of CPUs.
         """
-        samples = self._data.draw_samples(num_samples)
+        samples = self._draw_cpu_samples(num_samples)
+
+        # Outputs may be cached for samples drawn before caching stopped.
+        # The samples of a CPU are not a contiguous range of the samples
+        # drawn over all CPUs, so with several CPUs a block overlapping that
+        # range is looked up entirely.
+        num_cacheable_samples = \
+            self._num_cacheable_samples - self._num_drawn_samples
+
+        if num_cacheable_samples > 0 and self._num_cpus > 1:
+            num_cacheable_samples = samples.shape[0]
+
+        self._drawn_samples = samples
+        self._num_drawn_cacheable_samples = max(num_cacheable_samples, 0)
+        self._num_drawn_samples += num_samples
+
+        return samples
+
+    def _draw_cpu_samples(self, num_samples):
+        """
+        :param num_samples: Total number of samples to draw over all CPUs.
+        :return: ndarray of samples sliced according to number of CPUs.
+        """
         if self._num_cpus == 1:
-            return samples
+            return self._data.draw_samples(num_samples)
 
-        sample_size = samples.shape[0]
+        # Data sources able to generate only the share of this CPU avoid
+        # generating all samples on every CPU.
+        if hasattr(self._data, 'draw_cpu_samples'):
+            return self._data.draw_cpu_samples(num_samples, self._cpu_rank,
+                                               self._num_cpus)
+
+        samples = self._data.draw_samples(num_samples)
+
+        # Samples are divided among CPUs in whole sample groups.
+        group_size = self._sample_group_size
+        num_groups = -(-samples.shape[0] // group_size)
 
         # Determine subsample sizes for all CPUs.
-        subsample_size = sample_size // self._num_cpus
-        remainder = sample_size - subsample_size * self._num_cpus
+        subsample_size = num_groups // self._num_cpus
+        remainder = num_groups - subsample_size * self._num_cpus
         subsample_sizes = np.ones(self._num_cpus + 1).astype(int)*subsample_size
 
         # Adjust for sampling that does not divide evenly among CPUs.
         subsample_sizes[:remainder + 1] += 1
         subsample_sizes[0] = 0
+        subsample_sizes *= group_size
 
         # Determine starting index of subsample.
         subsample_index = int(np.sum(subsample_sizes[:self._cpu_rank + 1]))
@@ -750,19 +2149,20 @@ class MLMCSimulator:
 
     def _determine_num_cpu_samples(self, total_num_samples):
         """Determines number of samples to be run on current cpu based on
-            total number of samples to be run.
+            total number of samples to be run. Samples are divided in whole
+            sample groups.
             :param total_num_samples: Total samples to be taken.
             :return: Samples to be taken by this cpu.
         """
-        num_cpu_samples = total_num_samples // self._num_cpus
+        num_groups = -(-total_num_samples // self._sample_group_size)
+        num_cpu_groups = num_groups // self._num_cpus
 
-        num_residual_samples = total_num_samples - \
-            num_cpu_samples * self._num_cpus
+        num_residual_groups = num_groups - num_cpu_groups * self._num_cpus
 
-        if self._cpu_rank < num_residual_samples:
-            num_cpu_samples += 1
+        if self._cpu_rank < num_residual_groups:
+            num_cpu_groups += 1
 
-        return num_cpu_samples
+        return num_cpu_groups * self._sample_group_size
 
     @staticmethod
     def _show_time_estimate(seconds):
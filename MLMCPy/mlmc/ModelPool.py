@@ -0,0 +1,196 @@
+import multiprocessing
+import numpy as np
+import timeit
+
+# Models held by the current worker process. Set once when the worker starts.
+_worker_models = None
+
+
+def _initialize_worker(models, initializer, initargs):
+    """
+    Runs once in each worker process when it is started. Builds the worker's
+    models and runs the user provided initializer hook.
+    """
+    global _worker_models
+
+    if callable(models):
+        models = models()
+
+    _worker_models = models
+
+    if initializer is not None:
+        initializer(_worker_models, *initargs)
+
+
+def _evaluate_chunk(task):
+    """
+    Evaluates one chunk of samples on a worker process.
+
+    :param task: tuple containing the model index, a 2d ndarray of samples,
+        and whether to evaluate the samples with the model's evaluate_pair
+        function, in which case the outputs of both models are concatenated.
+    :return: tuple containing a 2d ndarray of outputs and the time in seconds
+        spent evaluating the model.
+    """
+    model_index, samples, evaluate_pairs = task
+    model = _worker_models[model_index]
+
+    start_time = timeit.default_timer()
+
+    if evaluate_pairs:
+        outputs = [np.hstack([np.ravel(output) for output in
+                              model.evaluate_pair(sample)])
+                   for sample in samples]
+    elif hasattr(model, 'evaluate_batch'):
+        outputs = model.evaluate_batch(samples)
+    else:
+        outputs = [model.evaluate(sample) for sample in samples]
+
+    evaluation_time = timeit.default_timer() - start_time
+
+    outputs = np.reshape(outputs, (samples.shape[0], -1))
+
+    return outputs, evaluation_time
+
+
+class ModelPool(object):
+    """
+    Evaluates models on a pool of long lived worker processes. The models are
+    sent to each worker once when the pool is started, after which only
+    chunks of samples and their outputs are exchanged. Can be passed to
+    MLMCSimulator as its executor as an alternative to MPI on a single node.
+    """
+    def __init__(self, models, num_workers=None, chunk_size=None,
+                 initializer=None, initargs=()):
+        """
+        :param models: Models to be made available on the workers, in the same
+            order as the models given to MLMCSimulator. Alternatively, a
+            function returning such a list, which is then called once on each
+            worker so that expensive model construction does not need to be
+            repeated or pickled.
+        :type models: list(Model) or function
+        :param num_workers: Number of worker processes. Defaults to the
+            number of CPUs on this machine.
+        :type num_workers: int
+        :param chunk_size: Number of samples sent to a worker per task. By
+            default, each block of samples is split into four chunks per
+            worker.
+        :type chunk_size: int
+        :param initializer: Function called on each worker after its models
+            have been created, with the list of models as its first argument
+            followed by initargs.
+        :type initializer: function
+        :param initargs: Additional arguments passed to the initializer.
+        :type initargs: tuple
+        """
+        self.__check_init_parameters(models, num_workers, chunk_size,
+                                     initializer)
+
+        if num_workers is None:
+            num_workers = multiprocessing.cpu_count()
+
+        self._num_workers = num_workers
+        self._chunk_size = chunk_size
+
+        self._pool = multiprocessing.Pool(processes=num_workers,
+                                          initializer=_initialize_worker,
+                                          initargs=(models, initializer,
+                                                    initargs))
+
+    def evaluate(self, model_index, samples):
+        """
+        Evaluates a model on the workers.
+
+        :param model_index: Index of the model in the list of models.
+        :type model_index: int
+        :param samples: 2d ndarray with one sample per row.
+        :type samples: ndarray
+        :return: tuple containing a 2d ndarray with one row of outputs per
+            sample and the total time in seconds the workers spent evaluating
+            the model.
+        """
+        return self._map_chunks(model_index, samples, False)
+
+    def evaluate_pair(self, model_index, samples):
+        """
+        Evaluates a model and the model below it on the workers using the
+        evaluate_pair function of the model.
+
+        :param model_index: Index of the model in the list of models.
+        :type model_index: int
+        :param samples: 2d ndarray with one sample per row.
+        :type samples: ndarray
+        :return: tuple containing 2d ndarrays of outputs of the model and of
+            the model below it, and the total time in seconds the workers
+            spent evaluating the models.
+        """
+        outputs, evaluation_time = \
+            self._map_chunks(model_index, samples, True)
+
+        output_size = outputs.shape[1] // 2
+
+        return outputs[:, :output_size], outputs[:, output_size:], \
+            evaluation_time
+
+    def _map_chunks(self, model_index, samples, evaluate_pairs):
+        """
+        Splits samples into chunks and evaluates them on the workers.
+        """
+        num_samples = samples.shape[0]
+
+        chunk_size = self._chunk_size
+        if chunk_size is None:
+            num_chunks = 4 * self._num_workers
+            chunk_size = max(int(np.ceil(num_samples / float(num_chunks))), 1)
+
+        tasks = [(model_index, samples[start: start + chunk_size],
+                  evaluate_pairs)
+                 for start in range(0, num_samples, chunk_size)]
+
+        # Results are returned in the same order as the tasks.
+        results = self._pool.map(_evaluate_chunk, tasks)
+
+        outputs = np.vstack([result[0] for result in results])
+        evaluation_time = sum(result[1] for result in results)
+
+        return outputs, evaluation_time
+
+    def close(self):
+        """
+        Shuts down the worker processes.
+        """
+        self._pool.close()
+        self._pool.join()
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+
+        self.close()
+
+    @staticmethod
+    def __check_init_parameters(models, num_workers, chunk_size, initializer):
+
+        if not isinstance(models, list) and not callable(models):
+            raise TypeError("models must be a list of models or a function.")
+
+        if num_workers is not None:
+
+            if not isinstance(num_workers, int):
+                raise TypeError("num_workers must be an integer.")
+
+            if num_workers < 1:
+                raise ValueError("num_workers must be a positive integer.")
+
+        if chunk_size is not None:
+
+            if not isinstance(chunk_size, int):
+                raise TypeError("chunk_size must be an integer.")
+
+            if chunk_size < 1:
+                raise ValueError("chunk_size must be a positive integer.")
+
+        if initializer is not None and not callable(initializer):
+            raise TypeError("initializer must be a function.")
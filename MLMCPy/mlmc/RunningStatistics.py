@@ -0,0 +1,124 @@
+import numpy as np
+
+
+class RunningStatistics(object):
+    """
+    Accumulates the sample size, mean, and variance of the output differences
+    of each level as blocks of outputs arrive, so that statistics can be
+    updated without keeping earlier outputs. Blocks are combined with the
+    pairwise update of Chan et al., which remains accurate when the means are
+    large compared to the variances.
+    """
+    def __init__(self, num_levels, output_size):
+        """
+        :param num_levels: Number of levels.
+        :type num_levels: int
+        :param output_size: Number of quantities of interest.
+        :type output_size: int
+        """
+        self.sample_sizes = np.zeros(num_levels, dtype=int)
+        self.means = np.zeros((num_levels, output_size))
+
+        # Sums of squared deviations from the mean.
+        self._squared_deviations = np.zeros((num_levels, output_size))
+
+    def update(self, level, outputs):
+        """
+        Adds a block of output differences to the statistics of a level.
+
+        :param level: Level of the outputs.
+        :type level: int
+        :param outputs: 2d ndarray with one row of outputs per sample.
+        :type outputs: ndarray
+        """
+        self.combine(level, *self.summarize(outputs))
+
+    def combine(self, level, sample_size, mean, squared_deviations):
+        """
+        Adds a block of output differences, given by its sample size, mean,
+        and sum of squared deviations from its mean, to the statistics of a
+        level. Lets blocks summarized elsewhere, such as on other CPUs, be
+        added without their outputs.
+
+        :param level: Level of the outputs.
+        :type level: int
+        :param sample_size: Number of samples in the block.
+        :type sample_size: int
+        :param mean: 1d ndarray of the mean of the block.
+        :type mean: ndarray
+        :param squared_deviations: 1d ndarray of the sum of squared
+            deviations of the block from its mean.
+        :type squared_deviations: ndarray
+        """
+        if sample_size == 0:
+            return
+
+        previous_size = self.sample_sizes[level]
+        total_size = previous_size + sample_size
+
+        # The first block is copied so that it is not changed by rounding.
+        if previous_size == 0:
+            self.means[level] = mean
+            self._squared_deviations[level] = squared_deviations
+
+        else:
+            delta = mean - self.means[level]
+
+            self.means[level] += delta * sample_size / float(total_size)
+            self._squared_deviations[level] += squared_deviations + \
+                np.square(delta) * previous_size * sample_size / \
+                float(total_size)
+
+        self.sample_sizes[level] = total_size
+
+    @staticmethod
+    def summarize(outputs):
+        """
+        :param outputs: 2d ndarray with one row of outputs per sample.
+        :return: tuple of the sample size, mean, and sum of squared
+            deviations from the mean of a block of outputs, as taken by
+            combine().
+        """
+        num_samples = outputs.shape[0]
+        if num_samples == 0:
+            return 0, np.zeros(outputs.shape[1]), np.zeros(outputs.shape[1])
+
+        mean = np.mean(outputs, axis=0)
+
+        return num_samples, mean, np.sum(np.square(outputs - mean), axis=0)
+
+    def get_variances(self):
+        """
+        :return: 2d ndarray of the variance of the output differences of each
+            level, or zero for levels without samples.
+        """
+        sample_sizes = np.maximum(self.sample_sizes, 1)[:, np.newaxis]
+
+        return self._squared_deviations / sample_sizes
+
+    def get_estimates(self):
+        """
+        :return: 1d ndarray of the estimate of each quantity of interest,
+            the sum of the means of all levels.
+        """
+        return np.sum(self.means, axis=0)
+
+    def get_estimator_variances(self):
+        """
+        :return: 1d ndarray of the variance of the estimate of each quantity
+            of interest, the sum of the level variances divided by the level
+            sample sizes.
+        """
+        sample_sizes = np.maximum(self.sample_sizes, 1)[:, np.newaxis]
+
+        return np.sum(self.get_variances() / sample_sizes, axis=0)
+
+    def add_level(self):
+        """
+        Adds an empty level above the existing levels.
+        """
+        self.sample_sizes = np.append(self.sample_sizes, 0)
+        self.means = np.vstack([self.means, np.zeros(self.means.shape[1])])
+        self._squared_deviations = \
+            np.vstack([self._squared_deviations,
+                       np.zeros(self._squared_deviations.shape[1])])
@@ -0,0 +1,657 @@
+import math
+
+import numpy as np
+from scipy.optimize import minimize, nnls
+
+
+class SampleAllocator(object):
+    """
+    Finds integer sample sizes for the levels of a multilevel estimator whose
+    variance is the sum over levels of V_l / N_l and whose cost is the sum of
+    C_l * N_l. Either the cost is minimized for a target variance, or the
+    variance is minimized for a budget, subject to minimum sample sizes and
+    optionally to sample sizes that are multiples of a given number. With
+    several quantities of interest, the cost can be minimized jointly for a
+    target variance of each one.
+
+    Solutions are found by branch and bound over the levels, where each node
+    is bounded by the continuous relaxation of the levels not yet fixed. Since
+    the relaxed optimum is convex in the sample size of any one level, the
+    candidate sizes of a level are explored outwards from its relaxed value
+    until the bound exceeds the best solution found. If the search ends
+    because max_nodes is reached, the best solution found is returned, and
+    lower_bound bounds the optimum from below.
+
+    The search is skipped when the rounded continuous solution is already
+    within relative_gap of the relaxed optimum, which is the case for the
+    large sample sizes where searching is most expensive.
+    """
+    def __init__(self, costs, variances, minimum_sample_sizes=None,
+                 sample_size_multiple=1, max_nodes=10000, relative_gap=1e-3):
+        """
+        :param costs: Cost of a sample of each level.
+        :type costs: ndarray
+        :param variances: Variance of the output differences of each level,
+            or a 2d ndarray with the variances of each quantity of interest
+            in columns, as used by minimize_joint_cost.
+        :type variances: ndarray
+        :param minimum_sample_sizes: Smallest sample size allowed at each
+            level. Defaults to zero.
+        :type minimum_sample_sizes: ndarray
+        :param sample_size_multiple: Number of which every sample size must
+            be a multiple, such as the number of CPUs.
+        :type sample_size_multiple: int
+        :param max_nodes: Maximum number of nodes searched.
+        :type max_nodes: int
+        :param relative_gap: Largest gap between the objective of the
+            rounded continuous solution and the relaxed optimum, relative to
+            the latter, for which the rounded solution is returned without a
+            search. Zero to always search.
+        :type relative_gap: float
+        """
+        costs = np.asarray(costs, dtype=float).ravel()
+        variances = np.asarray(variances, dtype=float)
+
+        if variances.ndim == 1:
+            variances = variances[:, np.newaxis]
+
+        if minimum_sample_sizes is None:
+            minimum_sample_sizes = np.zeros(costs.size, dtype=int)
+
+        minimum_sample_sizes = np.asarray(minimum_sample_sizes).ravel()
+
+        self.__check_parameters(costs, variances, minimum_sample_sizes,
+                                sample_size_multiple, max_nodes, relative_gap)
+
+        self._multiple = sample_size_multiple
+        self._max_nodes = max_nodes
+        self._relative_gap = float(relative_gap)
+
+        # Sample sizes are found in units of sample_size_multiple samples.
+        self._unit_costs = [float(cost) * sample_size_multiple
+                            for cost in costs]
+        self._variance_matrix = variances / float(sample_size_multiple)
+        self._unit_variances = [float(variance) for variance in
+                                self._variance_matrix[:, 0]]
+        self._minimum_units = [int(math.ceil(float(size) /
+                                             sample_size_multiple))
+                               for size in minimum_sample_sizes]
+
+        self._levels = range(costs.size)
+
+        # Levels are fixed from the most to the least expensive, so that the
+        # level with the largest sample size is solved in closed form.
+        self._order = sorted(self._levels,
+                             key=lambda level: -self._unit_costs[level])
+
+        # Cost or variance of the returned sample sizes.
+        self.objective = None
+
+        # Bound from below on the optimal cost or variance.
+        self.lower_bound = None
+
+        # Whether the returned sample sizes are known to be optimal.
+        self.is_optimal = False
+
+        self._minimize_cost = True
+        self._best_objective = np.inf
+        self._best_units = None
+        self._num_nodes = 0
+
+        # Slack allowed on the constraint for rounding errors.
+        self._tolerance = 0.
+
+    def minimize_cost(self, target_variance):
+        """
+        Finds the sample sizes of least cost for which the variance of the
+        estimate is at most target_variance.
+
+        :param target_variance: Largest variance of the estimate allowed.
+        :type target_variance: float
+        :return: 1d ndarray of sample sizes.
+        """
+        relaxed_value, initial_units = self._round_cost_relaxation(
+            target_variance)
+
+        return self._solve(float(target_variance), relaxed_value,
+                           initial_units)
+
+    def round_up_cost_relaxation(self, target_variance):
+        """
+        Rounds up the sample sizes of the continuous relaxation of
+        minimize_cost, without a search. These meet target_variance at a
+        cost close to the optimum for large sample sizes.
+
+        :param target_variance: Largest variance of the estimate allowed.
+        :type target_variance: float
+        :return: 1d ndarray of sample sizes.
+        """
+        _, units = self._round_cost_relaxation(target_variance)
+
+        return np.array(units, dtype=int) * self._multiple
+
+    def _round_cost_relaxation(self, target_variance):
+        """
+        Prepares minimizing cost for target_variance and rounds up the
+        relaxed solution.
+
+        :return: tuple of the relaxed optimal cost and a list of sample
+            sizes in units.
+        """
+        self.__check_single_output()
+
+        if target_variance <= 0.:
+            raise ValueError("target_variance must be greater than zero.")
+
+        self._minimize_cost = True
+        self._tolerance = 1e-12 * target_variance
+
+        relaxed_value, relaxed_units = \
+            self._relax(self._levels, float(target_variance))
+
+        # Rounding the relaxed solution up keeps the variance on target.
+        return relaxed_value, [int(math.ceil(units))
+                               for units in relaxed_units]
+
+    def minimize_variance(self, budget):
+        """
+        Finds the sample sizes of least variance of the estimate whose total
+        cost is at most budget.
+
+        :param budget: Largest total cost allowed.
+        :type budget: float
+        :return: 1d ndarray of sample sizes.
+        """
+        self.__check_single_output()
+
+        minimum_cost = sum(cost * units for cost, units in
+                           zip(self._unit_costs, self._minimum_units))
+
+        if minimum_cost > budget * (1. + 1e-12):
+            raise ValueError("budget does not cover the minimum sample " +
+                             "sizes.")
+
+        self._minimize_cost = False
+        self._tolerance = 1e-12 * budget
+
+        relaxed_value, relaxed_units = self._relax(self._levels, float(budget))
+
+        # Rounding the relaxed solution down keeps the cost within budget,
+        # after which leftover budget goes to the best variance reductions.
+        initial_units = [max(int(math.floor(units)), minimum)
+                         for units, minimum in
+                         zip(relaxed_units, self._minimum_units)]
+
+        self._fill_budget(initial_units, float(budget))
+
+        return self._solve(float(budget), relaxed_value, initial_units)
+
+    def minimize_joint_cost(self, target_variances):
+        """
+        Finds sample sizes of low cost for which the variance of the estimate
+        of every quantity of interest is at most its target variance, for
+        variances given for several quantities of interest. The continuous
+        problem is solved by sequential quadratic programming, and its
+        solution rounded up. Levels are then reduced from the most expensive
+        while every target is met. The dual of the continuous problem gives
+        lower_bound.
+
+        :param target_variances: Largest variance of the estimate allowed
+            for each quantity of interest.
+        :type target_variances: ndarray
+        :return: 1d ndarray of sample sizes.
+        """
+        target_variances = np.asarray(target_variances, dtype=float).ravel()
+
+        if target_variances.size != self._variance_matrix.shape[1]:
+            raise ValueError("target_variances must have one value per " +
+                             "quantity of interest.")
+
+        if np.any(target_variances <= 0.):
+            raise ValueError("target_variances must be greater than zero.")
+
+        self._minimize_cost = True
+
+        # Variances relative to the targets, which are then all one.
+        ratios = self._variance_matrix / target_variances
+        costs = np.array(self._unit_costs)
+        minimums = np.array(self._minimum_units, dtype=float)
+
+        relaxed_units = self._relax_joint(ratios, costs, minimums)
+
+        units = np.maximum(np.ceil(relaxed_units), minimums).astype(int)
+
+        for level in self._order:
+
+            # Find the fewest units of the level meeting every target.
+            low = self._minimum_units[level]
+            high = units[level]
+
+            while low < high:
+                units[level] = (low + high) // 2
+
+                if self._meets_targets(ratios, units):
+                    high = units[level]
+                else:
+                    low = units[level] + 1
+
+            units[level] = high
+
+        self.objective = np.dot(costs, units)
+        self.lower_bound = self._get_joint_dual_bound(ratios, costs, minimums,
+                                                      relaxed_units)
+        self.is_optimal = self.objective <= self.lower_bound * (1. + 1e-12)
+
+        return units * self._multiple
+
+    def _relax_joint(self, ratios, costs, minimums):
+        """
+        Solves the continuous relaxation of minimize_joint_cost. In terms of
+        the inverse sample sizes, the targets are linear constraints, so the
+        problem is solved for them, scaled by the inverses of a feasible
+        starting point.
+
+        :param ratios: 2d ndarray of variances relative to their targets.
+        :param costs: 1d ndarray of costs of each level.
+        :param minimums: 1d ndarray of minimum units of each level.
+        :return: 1d ndarray of relaxed units of each level.
+        """
+        # The largest of the optimal units for each quantity of interest
+        # alone meets every target.
+        sqrt_ratios_over_costs = np.sqrt(ratios / costs[:, np.newaxis])
+        start = np.maximum(np.amax(sqrt_ratios_over_costs *
+                                   np.sum(np.sqrt(ratios *
+                                                  costs[:, np.newaxis]),
+                                          axis=0), axis=1),
+                           minimums)
+
+        # Levels without variance are left at their minimum.
+        free = np.any(ratios > 0., axis=1)
+        relaxed_units = np.copy(start)
+
+        if not np.any(free):
+            return relaxed_units
+
+        scaled_costs = costs[free] * start[free] / np.dot(costs[free],
+                                                          start[free])
+        constraint_matrix = (ratios[free] / start[free, np.newaxis]).T
+        upper_bounds = [None if minimum == 0. else level_start / minimum
+                        for level_start, minimum in
+                        zip(start[free], minimums[free])]
+
+        constraints = [{'type': 'ineq',
+                        'fun': lambda x: 1. - np.dot(constraint_matrix, x),
+                        'jac': lambda x: -constraint_matrix}]
+
+        result = minimize(lambda x: np.sum(scaled_costs / x),
+                          np.ones(np.count_nonzero(free)),
+                          jac=lambda x: -scaled_costs / np.square(x),
+                          bounds=[(1e-6, upper_bound)
+                                  for upper_bound in upper_bounds],
+                          constraints=constraints, method='SLSQP',
+                          options={'maxiter': 500})
+
+        # Fall back to the starting point if no improvement was found.
+        if np.all(np.isfinite(result.x)) and \
+                np.all(np.dot(constraint_matrix, result.x) <= 1. + 1e-9):
+
+            relaxed_units[free] = np.maximum(start[free] / result.x,
+                                             minimums[free])
+
+        return relaxed_units
+
+    @staticmethod
+    def _meets_targets(ratios, units):
+        """
+        :return: bool indicating whether the given units meet every target.
+        """
+        with np.errstate(divide='ignore', invalid='ignore'):
+            variances = np.where(ratios > 0.,
+                                 ratios / units[:, np.newaxis].astype(float),
+                                 0.)
+
+        return np.all(np.sum(variances, axis=0) <= 1. + 1e-9)
+
+    @staticmethod
+    def _get_joint_dual_bound(ratios, costs, minimums, relaxed_units):
+        """
+        Bounds the optimal cost of minimize_joint_cost from below with the
+        Lagrangian dual of its continuous relaxation. Multipliers of the
+        targets are estimated from the optimality conditions of the relaxed
+        solution by nonnegative least squares, and any nonnegative
+        multipliers give a valid bound.
+
+        :param ratios: 2d ndarray of variances relative to their targets.
+        :param costs: 1d ndarray of costs of each level.
+        :param minimums: 1d ndarray of minimum units of each level.
+        :param relaxed_units: 1d ndarray of relaxed units of each level.
+        :return: float lower bound.
+        """
+        free = np.any(ratios > 0., axis=1) & (relaxed_units > minimums)
+
+        multipliers = np.zeros(ratios.shape[1])
+        if np.any(free):
+            multipliers = nnls(ratios[free],
+                               costs[free] * np.square(relaxed_units[free]))[0]
+
+        # The Lagrangian is minimized over units at least the minimums for
+        # each level separately.
+        weights = np.dot(ratios, multipliers)
+        units = np.maximum(np.sqrt(weights / costs), minimums)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            level_values = costs * units + \
+                np.where(weights > 0., weights / units, 0.)
+
+        return np.sum(level_values) - np.sum(multipliers)
+
+    def _solve(self, resource, relaxed_value, initial_units):
+        """
+        Runs the branch and bound search starting from a feasible solution.
+
+        :param resource: Target variance or budget.
+        :param relaxed_value: Optimum of the continuous relaxation.
+        :param initial_units: Feasible sample sizes in units.
+        :return: 1d ndarray of sample sizes.
+        """
+        self._best_units = list(initial_units)
+        self._best_objective = self._get_objective(initial_units)
+        self._num_nodes = 0
+
+        if self._best_objective <= \
+                relaxed_value * (1. + self._relative_gap):
+
+            self.objective = self._best_objective
+            self.lower_bound = relaxed_value
+            self.is_optimal = \
+                self._best_objective <= relaxed_value * (1. + 1e-12)
+
+            return np.array(self._best_units, dtype=int) * self._multiple
+
+        self._branch(0, [0] * len(initial_units), 0., resource)
+
+        self.objective = self._best_objective
+        self.is_optimal = self._num_nodes < self._max_nodes
+
+        if self.is_optimal:
+            self.lower_bound = self._best_objective
+        else:
+            self.lower_bound = relaxed_value
+
+        return np.array(self._best_units, dtype=int) * self._multiple
+
+    def _branch(self, position, units, value, resource):
+        """
+        Fixes the sample size of the level at the given position of the
+        search order and searches the levels after it.
+
+        :param position: Position of the level in the search order.
+        :param units: list of sample sizes in units fixed so far.
+        :param value: Cost or variance of the levels fixed so far.
+        :param resource: Variance or budget left for the remaining levels.
+        """
+        level = self._order[position]
+        remaining_levels = self._order[position + 1:]
+
+        if not remaining_levels:
+            level_units = self._solve_last_level(level, resource)
+            if level_units is None:
+                return
+
+            total = value + self._get_level_value(level, level_units)
+            if total < self._best_objective:
+                units[level] = level_units
+                self._best_objective = total
+                self._best_units = list(units)
+
+            return
+
+        _, relaxed_units = self._relax(self._order[position:], resource)
+
+        maximum_units = np.inf
+        if not self._minimize_cost:
+            maximum_units = int(math.floor(
+                (resource + self._tolerance -
+                 sum(self._unit_costs[other] * self._minimum_units[other]
+                     for other in remaining_levels)) /
+                self._unit_costs[level]))
+
+        start = max(int(math.floor(relaxed_units[0])),
+                    self._minimum_units[level])
+
+        # Candidates are explored outwards from the relaxed value until their
+        # bounds exceed the best solution found in each direction.
+        for direction, level_units in [(-1, start), (1, start + 1)]:
+
+            while self._minimum_units[level] <= level_units <= maximum_units:
+
+                if self._num_nodes >= self._max_nodes:
+                    return
+
+                self._num_nodes += 1
+
+                level_value = self._get_level_value(level, level_units)
+                remaining_resource = \
+                    resource - self._get_level_usage(level, level_units)
+
+                bound = value + level_value + \
+                    self._relax(remaining_levels, remaining_resource)[0]
+
+                if bound >= self._best_objective * (1. - 1e-12):
+                    break
+
+                units[level] = level_units
+                self._branch(position + 1, units, value + level_value,
+                             remaining_resource)
+
+                level_units += direction
+
+    def _solve_last_level(self, level, resource):
+        """
+        Returns the best sample size in units of the last level to be fixed,
+        or None if no sample size satisfies the constraint.
+        """
+        minimum = self._minimum_units[level]
+        variance = self._unit_variances[level]
+
+        if resource < -self._tolerance:
+            return None
+
+        if variance == 0.:
+            level_units = minimum
+        elif self._minimize_cost:
+            if resource <= 0.:
+                return None
+
+            level_units = max(minimum, int(math.ceil(variance / resource)))
+        else:
+            level_units = int(math.floor(
+                (resource + self._tolerance) / self._unit_costs[level]))
+
+        if self._get_level_usage(level, level_units) > \
+                resource + self._tolerance:
+            return None
+
+        return level_units
+
+    def _relax(self, levels, resource):
+        """
+        Solves the continuous relaxation over the given levels. The relaxed
+        sample size of each level is its minimum or t * sqrt(V_l / C_l),
+        whichever is larger, with t chosen so that the constraint holds.
+
+        :param levels: list of levels.
+        :param resource: Target variance or budget for the levels.
+        :return: tuple of the optimal cost or variance, inf if there is no
+            solution, and a list of sample sizes in units of the levels in
+            the given order.
+        """
+        clamped = set(level for level in levels
+                      if self._unit_variances[level] == 0.)
+
+        scale = 0.
+        while True:
+
+            free_levels = [level for level in levels if level not in clamped]
+            left = resource - sum(self._get_level_usage(
+                level, self._minimum_units[level]) for level in clamped)
+
+            if not free_levels:
+                break
+
+            if left <= 0.:
+                return np.inf, [self._minimum_units[level]
+                                for level in levels]
+
+            sum_sqrt_vc = sum(math.sqrt(self._unit_variances[level] *
+                                        self._unit_costs[level])
+                              for level in free_levels)
+
+            if self._minimize_cost:
+                scale = sum_sqrt_vc / left
+            else:
+                scale = left / sum_sqrt_vc
+
+            newly_clamped = [level for level in free_levels
+                             if scale * self._get_sqrt_v_over_c(level) <
+                             self._minimum_units[level]]
+
+            if not newly_clamped:
+                break
+
+            clamped.update(newly_clamped)
+
+        if left < -self._tolerance:
+            return np.inf, [self._minimum_units[level] for level in levels]
+
+        relaxed_units = [float(self._minimum_units[level]) if level in clamped
+                         else scale * self._get_sqrt_v_over_c(level)
+                         for level in levels]
+
+        value = sum(self._get_level_value(level, level_units)
+                    for level, level_units in zip(levels, relaxed_units))
+
+        return value, relaxed_units
+
+    def _fill_budget(self, units, budget):
+        """
+        Adds units to the levels giving the largest reduction of variance per
+        cost while the budget allows.
+
+        :param units: list of sample sizes in units, updated in place.
+        :param budget: Largest total cost allowed.
+        """
+        left = budget - sum(cost * level_units for cost, level_units in
+                            zip(self._unit_costs, units))
+
+        while True:
+
+            best_level = None
+            best_reduction = 0.
+
+            for level, cost in enumerate(self._unit_costs):
+
+                if cost > left * (1. + 1e-12):
+                    continue
+
+                reduction = (self._get_level_value(level, units[level]) -
+                             self._get_level_value(level, units[level] + 1)) \
+                    / cost
+
+                if reduction > best_reduction:
+                    best_level = level
+                    best_reduction = reduction
+
+            if best_level is None:
+                return
+
+            units[best_level] += 1
+            left -= self._unit_costs[best_level]
+
+    def _get_objective(self, units):
+        """
+        :return: Cost or variance of the given sample sizes in units.
+        """
+        return sum(self._get_level_value(level, level_units)
+                   for level, level_units in enumerate(units))
+
+    def _get_level_value(self, level, level_units):
+        """
+        :return: Contribution of a level to the cost or variance minimized.
+        """
+        if self._minimize_cost:
+            return self._unit_costs[level] * level_units
+
+        return self._get_level_variance(level, level_units)
+
+    def _get_level_usage(self, level, level_units):
+        """
+        :return: Contribution of a level to the variance or cost constrained.
+        """
+        if self._minimize_cost:
+            return self._get_level_variance(level, level_units)
+
+        return self._unit_costs[level] * level_units
+
+    def _get_level_variance(self, level, level_units):
+        """
+        :return: Contribution of a level to the variance of the estimate.
+        """
+        variance = self._unit_variances[level]
+
+        if variance == 0.:
+            return 0.
+
+        if level_units <= 0:
+            return np.inf
+
+        return variance / level_units
+
+    def _get_sqrt_v_over_c(self, level):
+
+        return math.sqrt(self._unit_variances[level] / self._unit_costs[level])
+
+    def __check_single_output(self):
+        """
+        Ensures that variances were given for a single quantity of interest.
+        """
+        if self._variance_matrix.shape[1] != 1:
+            raise ValueError("variances of several quantities of interest " +
+                             "require minimize_joint_cost.")
+
+    @staticmethod
+    def __check_parameters(costs, variances, minimum_sample_sizes,
+                           sample_size_multiple, max_nodes, relative_gap):
+        """
+        Inspect parameters given to init method.
+        """
+        if costs.size == 0:
+            raise ValueError("costs must not be empty.")
+
+        if variances.ndim != 2 or variances.shape[0] != costs.size or \
+                minimum_sample_sizes.size != costs.size:
+
+            raise ValueError("costs, variances, and minimum_sample_sizes " +
+                             "must have one value per level.")
+
+        if np.any(costs <= 0.):
+            raise ValueError("costs must be greater than zero.")
+
+        if np.any(variances < 0.):
+            raise ValueError("variances must not be negative.")
+
+        if np.any(minimum_sample_sizes < 0):
+            raise ValueError("minimum_sample_sizes must not be negative.")
+
+        if not isinstance(sample_size_multiple, int) or \
+                not isinstance(max_nodes, int):
+
+            raise TypeError("sample_size_multiple and max_nodes must be " +
+                            "integers.")
+
+        if sample_size_multiple < 1 or max_nodes < 1:
+            raise ValueError("sample_size_multiple and max_nodes must be " +
+                             "positive.")
+
+        if relative_gap < 0.:
+            raise ValueError("relative_gap must not be negative.")
@@ -1 +1,6 @@
 from MLMCSimulator import MLMCSimulator
+from ModelPool import ModelPool
+from EvaluationStore import EvaluationStore
+from MIMCSimulator import MIMCSimulator
+from MFMCSimulator import MFMCSimulator
+from MLBLUESimulator import MLBLUESimulator
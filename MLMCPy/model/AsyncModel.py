@@ -0,0 +1,35 @@
+import abc
+
+from Model import Model
+
+
+class AsyncModel(Model):
+    """
+    Abstract base class for models whose evaluations can be started without
+    waiting for them to complete, for example models that hand samples to
+    solver processes or remote services. MLMCSimulator.simulate_async keeps
+    many such evaluations in flight at once.
+
+    Implementations provide evaluate_async(), which starts the evaluation of
+    a sample and returns a handle whose result() function waits for and
+    returns the output, in the same way as a concurrent.futures.Future.
+    """
+    @abc.abstractmethod
+    def evaluate_async(self, sample):
+        """
+        Starts the evaluation of a sample and returns without waiting for it.
+
+        :param sample: one dimensional ndarray
+        :return: Handle providing a result() function that returns the output
+            of the evaluation.
+        """
+        raise NotImplementedError
+
+    def evaluate(self, sample):
+        """
+        Evaluates a sample and waits for the output.
+
+        :param sample: one dimensional ndarray
+        :return: ndarray of outputs.
+        """
+        return self.evaluate_async(sample).result()
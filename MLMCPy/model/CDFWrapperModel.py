@@ -6,9 +6,16 @@ from Model import Model
 class CDFWrapperModel(Model):
     """
     Generates CDF indicators from an inner model that will be used by
-    MLMCSimulator to generate a CDF from the inner model outputs.
+    MLMCSimulator to generate a CDF from the inner model outputs. In
+    exceedance mode, the indicators are those of outputs above each grid
+    point, so that small probabilities of the upper tail are estimated
+    directly rather than as one minus a CDF value close to one, which is
+    needed for importance sampling of the upper tail with an
+    ImportanceSamplingInput.
     """
-    def __init__(self, model, grid, smoothing=None):
+    runtime_attributes = ('_inner_model_outputs',)
+
+    def __init__(self, model, grid, smoothing=None, exceedance=False):
         """
         :param model: An instance of a class inheriting from Model that
             implements the evaluate function.
@@ -16,11 +23,14 @@ class CDFWrapperModel(Model):
             be used in building a CDF.
         :param smoothing: Whether to implement smoothing in order to improve
             the CDF result. TODO: Improve this description.
+        :param exceedance: Whether the indicators are those of outputs above
+            each grid point rather than at or below it.
         """
-        self.__check_init_parameters(model, grid, smoothing)
+        self.__check_init_parameters(model, grid, smoothing, exceedance)
 
         self._model = model
         self._grid = grid
+        self._exceedance = exceedance
         self._inner_model_outputs = list()
 
         if hasattr(self._model, 'cost'):
@@ -39,12 +49,37 @@ class CDFWrapperModel(Model):
         # Compute the indicators.
         indicators = np.zeros(self._grid.size)
         for x, y in enumerate(self._grid):
-            indicators[x] = np.count_nonzero(output <= y)
+            if self._exceedance:
+                indicators[x] = np.count_nonzero(output > y)
+            else:
+                indicators[x] = np.count_nonzero(output <= y)
 
         return indicators
 
+    def evaluate_batch(self, samples):
+        """
+        Evaluates the internal model on a block of samples and computes the
+            indicators for each of them.
+        :param samples: 2d ndarray with one sample per row.
+        :return: 2d ndarray of indicators with one row per sample.
+        """
+        outputs = self._model.evaluate_batch(samples)
+        outputs = np.reshape(outputs, (samples.shape[0], -1))
+
+        # Count outputs at or below each grid point for every sample, or
+        # above it in exceedance mode. Both are compared directly so that
+        # NaN outputs are counted in neither, as in evaluate().
+        if self._exceedance:
+            counted = outputs[:, :, np.newaxis] > self._grid
+        else:
+            counted = outputs[:, :, np.newaxis] <= self._grid
+
+        indicators = np.count_nonzero(counted, axis=1)
+
+        return indicators.astype(float)
+
     @staticmethod
-    def __check_init_parameters(model, grid, smoothing):
+    def __check_init_parameters(model, grid, smoothing, exceedance):
 
         if not isinstance(model, Model):
             raise TypeError("Model must inherit from class Model.")
@@ -60,3 +95,6 @@ class CDFWrapperModel(Model):
 
         if smoothing is not None and not isinstance(smoothing, bool):
             raise TypeError("Smoothing must be boolean.")
+
+        if not isinstance(exceedance, bool):
+            raise TypeError("Exceedance must be boolean.")
@@ -0,0 +1,256 @@
+import hashlib
+import threading
+import numpy as np
+from collections import OrderedDict
+
+from Model import Model
+
+
+class CachingModel(Model):
+    """
+    Remembers the outputs of an inner model so that samples which are
+    evaluated again, for example on several levels, in both the setup and
+    simulation phases, or over repeated simulations, are not recomputed.
+    The least recently used outputs are discarded once the cache is full.
+
+    If the inner model provides evaluate_pair, so does the wrapper, caching
+    both outputs of each pair, and a pair_cost of the inner model is kept.
+
+    The cache may be used from several threads at once, as when evaluations
+    are submitted to an executor. The inner model is evaluated outside the
+    lock guarding the cache, so it must be safe to call from threads itself.
+    """
+    runtime_attributes = ('_cache', '_cache_bytes', '_lock', 'hits',
+                          'misses')
+
+    def __init__(self, model, max_entries=None, max_bytes=None):
+        """
+        :param model: An instance of a class inheriting from Model that
+            implements the evaluate function.
+        :param max_entries: Maximum number of outputs to keep. Unlimited if
+            None.
+        :type max_entries: int
+        :param max_bytes: Maximum total size in bytes of the outputs to keep.
+            Unlimited if None.
+        :type max_bytes: int
+        """
+        self.__check_init_parameters(model, max_entries, max_bytes)
+
+        self._model = model
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+
+        self._cache = OrderedDict()
+        self._cache_bytes = 0
+
+        # Guards the cache, its size and the counters.
+        self._lock = threading.Lock()
+
+        # Number of evaluations answered from / missing from the cache.
+        self.hits = 0
+        self.misses = 0
+
+        if hasattr(self._model, 'cost'):
+            self.cost = model.cost
+
+        if hasattr(self._model, 'pair_cost'):
+            self.pair_cost = model.pair_cost
+
+    def evaluate(self, sample):
+        """
+        Returns the cached output for the sample if available, otherwise
+        evaluates the inner model and caches its output.
+        :param sample: ndarray of 0 or 1 dimensions to be passed to inner model.
+        :return: ndarray of outputs.
+        """
+        key = self._get_key(sample)
+
+        with self._lock:
+            output = self._lookup(key)
+
+        if output is None:
+            output = np.array(self._model.evaluate(sample))
+
+            with self._lock:
+                self._store(key, output)
+
+        return np.copy(output)
+
+    def evaluate_batch(self, samples):
+        """
+        Returns outputs for a block of samples, passing only the samples
+        missing from the cache to the inner model's evaluate_batch function.
+        :param samples: 2d ndarray with one sample per row.
+        :return: 2d ndarray with one row of outputs per sample.
+        """
+        keys = [self._get_key(sample) for sample in samples]
+
+        # Evaluate each distinct missing sample once.
+        outputs = []
+        missing_indices = OrderedDict()
+
+        with self._lock:
+            for i, key in enumerate(keys):
+
+                if key in missing_indices:
+                    missing_indices[key].append(i)
+                    outputs.append(None)
+                    continue
+
+                outputs.append(self._lookup(key, count=False))
+                if outputs[i] is None:
+                    missing_indices[key] = [i]
+
+            self.misses += len(missing_indices)
+            self.hits += len(keys) - len(missing_indices)
+
+        if missing_indices:
+            first_indices = [indices[0] for indices in
+                             missing_indices.values()]
+
+            missing_outputs = \
+                self._model.evaluate_batch(samples[first_indices])
+            missing_outputs = np.reshape(missing_outputs,
+                                         (len(first_indices), -1))
+
+            with self._lock:
+                for key, output in zip(missing_indices, missing_outputs):
+                    self._store(key, np.copy(output))
+
+            for key, output in zip(missing_indices, missing_outputs):
+                for i in missing_indices[key]:
+                    outputs[i] = output
+
+        return np.array([np.ravel(output) for output in outputs])
+
+    @property
+    def evaluate_pair(self):
+        """
+        Function returning the cached outputs of the inner model's
+        evaluate_pair function for a sample, evaluating the pair if it is
+        not cached. Only available if the inner model provides
+        evaluate_pair, so that MLMCSimulator evaluates pairs exactly when it
+        would for the inner model.
+        """
+        if not hasattr(self._model, 'evaluate_pair'):
+            raise AttributeError("The inner model does not provide "
+                                 "evaluate_pair.")
+
+        return self._evaluate_cached_pair
+
+    def _evaluate_cached_pair(self, sample):
+        """
+        :param sample: ndarray of 0 or 1 dimensions to be passed to inner model.
+        :return: tuple of ndarrays of the outputs of the inner model and of
+            the model one level below.
+        """
+        # Pairs are kept apart from the outputs of evaluate().
+        key = 'pair' + self._get_key(sample)
+
+        with self._lock:
+            outputs = self._lookup(key)
+
+        if outputs is None:
+            output, lower_level_output = self._model.evaluate_pair(sample)
+            outputs = np.array([np.ravel(output),
+                                np.ravel(lower_level_output)])
+
+            with self._lock:
+                self._store(key, outputs)
+
+        return np.copy(outputs[0]), np.copy(outputs[1])
+
+    def clear(self):
+        """
+        Removes all cached outputs and resets the hit and miss counters.
+        """
+        with self._lock:
+            self._cache.clear()
+            self._cache_bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+
+        with self._lock:
+            return len(self._cache)
+
+    @staticmethod
+    def _get_key(sample):
+        """
+        Computes a hash of the values and shape of a sample.
+        """
+        sample = np.ascontiguousarray(sample, dtype=float)
+
+        key = hashlib.sha1(sample.tobytes())
+        key.update(str(sample.shape).encode())
+
+        return key.digest()
+
+    def _lookup(self, key, count=True):
+        """
+        Returns the cached output for key, or None if not cached. Marks the
+        output as most recently used. Must be called holding the lock.
+
+        :param count: Whether to count the lookup as a hit or miss.
+        """
+        output = self._cache.pop(key, None)
+
+        if output is not None:
+            self._cache[key] = output
+
+        if count:
+            if output is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        return output
+
+    def _store(self, key, output):
+        """
+        Adds an output to the cache and discards the least recently used
+        outputs until the cache is within its limits. Must be called holding
+        the lock.
+        """
+        # Another thread may have stored the same sample meanwhile.
+        replaced_output = self._cache.pop(key, None)
+        if replaced_output is not None:
+            self._cache_bytes -= replaced_output.nbytes
+
+        self._cache[key] = output
+        self._cache_bytes += output.nbytes
+
+        while self._cache and self._is_over_limit():
+            _, discarded_output = self._cache.popitem(last=False)
+            self._cache_bytes -= discarded_output.nbytes
+
+    def _is_over_limit(self):
+
+        if self._max_entries is not None and \
+                len(self._cache) > self._max_entries:
+            return True
+
+        if self._max_bytes is not None and \
+                self._cache_bytes > self._max_bytes:
+            return True
+
+        return False
+
+    @staticmethod
+    def __check_init_parameters(model, max_entries, max_bytes):
+
+        if not isinstance(model, Model):
+            raise TypeError("Model must inherit from class Model.")
+
+        for name, limit in [('max_entries', max_entries),
+                            ('max_bytes', max_bytes)]:
+
+            if limit is None:
+                continue
+
+            if not isinstance(limit, int):
+                raise TypeError("%s must be an integer." % name)
+
+            if limit < 1:
+                raise ValueError("%s must be a positive integer." % name)
@@ -43,6 +43,22 @@ class CovarianceWrapperModel(Model):
 
         return np.hstack((output, products))
 
+    def evaluate_batch(self, samples):
+        """
+        Evaluates the internal model on a block of samples and computes
+        products of the outputs of each sample.
+        :param samples: 2d ndarray with one sample per row.
+        :return: 2d ndarray of outputs and products with one row per sample.
+        """
+        outputs = self._model.evaluate_batch(samples)
+        outputs = np.reshape(outputs, (samples.shape[0], -1))
+
+        # Same ordering as evaluate(): out_i * out_j for all j >= i.
+        rows, columns = np.triu_indices(outputs.shape[1])
+        products = outputs[:, rows] * outputs[:, columns]
+
+        return np.hstack((outputs, products))
+
     @staticmethod
     def post_process_covariance(expected_values):
         original_output_size = \
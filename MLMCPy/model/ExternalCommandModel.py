@@ -0,0 +1,259 @@
+import atexit
+import numpy as np
+import shlex
+import subprocess
+import threading
+import weakref
+from collections import deque
+
+from AsyncModel import AsyncModel
+
+# Solver processes of each open model, keyed by a weak reference to the
+# model whose callback closes them once the model is garbage collected.
+_open_workers = {}
+
+
+class ExternalCommandModel(AsyncModel):
+    """
+    Evaluates samples with an external solver executable. A pool of solver
+    processes is started once and kept running, so the solver only needs to
+    be loaded a single time per process.
+
+    The solver communicates through a line protocol: for each sample it
+    reads one line from its standard input containing the sample values
+    separated by whitespace, and writes one line to its standard output
+    containing the output values separated by whitespace. Requests are
+    answered in the order they are received. Output lines must be flushed
+    immediately.
+
+    Samples may be evaluated from several threads at once, such as when
+    MLMCSimulator is given a thread pool executor.
+
+    The solver processes are stopped by close(), on leaving a with block, when
+    the model is garbage collected, or at the latest when the interpreter
+    exits.
+    """
+    runtime_attributes = ('_workers', '_next_worker', '_next_worker_lock',
+                          '_reference')
+
+    def __init__(self, command, num_workers=1, cost=None, cwd=None,
+                 **command_args):
+        """
+        :param command: Command starting the solver, either as a string or as
+            a list of arguments. Fields in braces are filled in from
+            command_args, e.g. "solver --time-step {time_step}".
+        :type command: str or list(str)
+        :param num_workers: Number of solver processes to run.
+        :type num_workers: int
+        :param cost: The average cost of computing a sample output.
+        :type cost: float
+        :param cwd: Working directory of the solver processes.
+        :type cwd: str
+        :param command_args: Values used to fill in the command template.
+        """
+        self.__check_init_parameters(command, num_workers)
+
+        if isinstance(command, str):
+            command = shlex.split(command.format(**command_args))
+        else:
+            command = [argument.format(**command_args)
+                       for argument in command]
+
+        self._command = command
+        self.cost = cost
+
+        self._workers = []
+        self._reference = weakref.ref(self, _close_workers)
+        _open_workers[self._reference] = self._workers
+
+        self._workers.extend(_SolverWorker(command, cwd)
+                             for _ in range(num_workers))
+        self._next_worker = 0
+        self._next_worker_lock = threading.Lock()
+
+    def evaluate_async(self, sample):
+        """
+        Sends a sample to the next solver process without waiting for its
+        output.
+
+        :param sample: Scalar or one dimensional ndarray.
+        :return: Handle whose result() function returns a 1d ndarray of
+            outputs.
+        """
+        with self._next_worker_lock:
+            worker = self._workers[self._next_worker]
+            self._next_worker = (self._next_worker + 1) % len(self._workers)
+
+        return worker.send(sample)
+
+    def evaluate_batch(self, samples):
+        """
+        Evaluates a block of samples, keeping every solver process busy.
+
+        :param samples: 2d ndarray with one sample per row.
+        :return: 2d ndarray with one row of outputs per sample.
+        """
+        # Keep a couple of requests queued per process so that no process
+        # waits on this one between samples.
+        max_in_flight = 2 * len(self._workers)
+
+        outputs = []
+        in_flight = deque()
+        for sample in samples:
+
+            if len(in_flight) == max_in_flight:
+                outputs.append(in_flight.popleft().result())
+
+            in_flight.append(self.evaluate_async(sample))
+
+        while in_flight:
+            outputs.append(in_flight.popleft().result())
+
+        return np.array(outputs).reshape(len(outputs), -1)
+
+    def close(self):
+        """
+        Closes the input of each solver process and waits for it to exit.
+        """
+        _close_workers(self._reference)
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+
+        self.close()
+
+    @staticmethod
+    def __check_init_parameters(command, num_workers):
+
+        if not isinstance(command, (str, list)):
+            raise TypeError("command must be a string or list of strings.")
+
+        if len(command) == 0:
+            raise ValueError("command must not be empty.")
+
+        if not isinstance(num_workers, int):
+            raise TypeError("num_workers must be an integer.")
+
+        if num_workers < 1:
+            raise ValueError("num_workers must be a positive integer.")
+
+
+def _close_workers(reference):
+    """
+    Closes the solver processes of a model, given the weak reference to it.
+    """
+    workers = _open_workers.pop(reference, [])
+
+    for worker in workers:
+        worker.close()
+
+
+@atexit.register
+def _close_all_workers():
+    """
+    Closes the solver processes of every model still open.
+    """
+    for reference in list(_open_workers):
+        _close_workers(reference)
+
+
+class _SolverHandle(object):
+    """
+    Handle to an output that a solver process has been asked to compute.
+    """
+    def __init__(self, worker):
+
+        self._worker = worker
+        self._output = None
+        self.done = False
+
+    def set_output(self, output):
+
+        self._output = output
+        self.done = True
+
+    def result(self):
+        """
+        Waits for and returns the output.
+        """
+        self._worker.wait(self)
+
+        return self._output
+
+
+class _SolverWorker(object):
+    """
+    A running solver process and the handles awaiting its outputs.
+    """
+    def __init__(self, command, cwd):
+
+        self._process = subprocess.Popen(command,
+                                         stdin=subprocess.PIPE,
+                                         stdout=subprocess.PIPE,
+                                         cwd=cwd,
+                                         universal_newlines=True)
+        self._pending = deque()
+
+        # Keep the pending handles in the order their samples were written,
+        # and let only one thread at a time read outputs.
+        self._send_lock = threading.Lock()
+        self._receive_lock = threading.Lock()
+
+    def send(self, sample):
+        """
+        Writes a sample to the solver's input.
+        """
+        values = np.atleast_1d(np.asarray(sample, dtype=float)).ravel()
+        line = ' '.join(repr(value) for value in values.tolist())
+
+        handle = _SolverHandle(self)
+
+        with self._send_lock:
+            self._process.stdin.write(line + '\n')
+            self._process.stdin.flush()
+
+            self._pending.append(handle)
+
+        return handle
+
+    def wait(self, handle):
+        """
+        Receives outputs until the given handle has its output. Outputs
+        received for other handles are passed to them, so threads waiting on
+        those handles find them done once they get the lock.
+        """
+        with self._receive_lock:
+            while not handle.done:
+                self._receive()
+
+    def _receive(self):
+        """
+        Reads the next output line from the solver and passes it to the
+        oldest pending handle.
+        """
+        line = self._process.stdout.readline()
+
+        if line == '':
+            raise RuntimeError("Solver process exited with return code %s "
+                               "before producing an output."
+                               % self._process.poll())
+
+        try:
+            output = np.array([float(value) for value in line.split()])
+        except ValueError:
+            raise ValueError("Could not parse solver output: %s"
+                             % line.strip())
+
+        if output.size == 0:
+            raise ValueError("Solver produced an empty output line.")
+
+        self._pending.popleft().set_output(output)
+
+    def close(self):
+
+        if self._process.poll() is None:
+            self._process.stdin.close()
+            self._process.wait()
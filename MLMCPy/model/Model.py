@@ -1,4 +1,5 @@
 import abc
+import numpy as np
 
 
 class Model(object):
@@ -8,7 +9,35 @@ class Model(object):
 
     :param inputs: one dimensional ndarray
     :return: two dimensional ndarray
+
+    A model at level l > 0 of a hierarchy may also provide a function
+    evaluate_pair(sample) returning a tuple with its own output and the output
+    of the model at level l - 1 for the same sample. MLMCSimulator uses it in
+    place of evaluating both models separately, so that models sharing most
+    of their computation with the level below only perform it once. The cost
+    of such a combined evaluation can be given with a pair_cost attribute.
+
+    Models holding state that changes as they are evaluated, such as caches
+    or counters, should name the attributes holding it in
+    runtime_attributes, so that EvaluationStore identifies them by their
+    settings alone.
     """
+    runtime_attributes = ()
+
     @abc.abstractmethod
     def evaluate(self, inputs):
         raise NotImplementedError
+
+    def evaluate_batch(self, samples):
+        """
+        Evaluates a block of samples at once. MLMCSimulator uses this function
+        in place of evaluate() when it is available, so models that can be
+        vectorized should override it to avoid per sample overhead. The
+        default implementation simply calls evaluate() on each sample.
+
+        :param samples: 2d ndarray with one sample per row.
+        :return: 2d ndarray with one row of outputs per sample.
+        """
+        outputs = [np.ravel(self.evaluate(sample)) for sample in samples]
+
+        return np.array(outputs).reshape(len(outputs), -1)
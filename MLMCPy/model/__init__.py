@@ -1,4 +1,7 @@
 from CovarianceWrapperModel import CovarianceWrapperModel
 from Model import Model
+from AsyncModel import AsyncModel
+from CachingModel import CachingModel
+from ExternalCommandModel import ExternalCommandModel
 from ModelFromData import ModelFromData
 from CDFWrapperModel import CDFWrapperModel
@@ -0,0 +1,79 @@
+import numpy as np
+import timeit
+
+from spring_mass_model import BatchSpringMassModel
+from MLMCPy.input import RandomInput
+from MLMCPy.mlmc import MLMCSimulator
+
+'''
+This script repeats the spring-mass example of run_mlmc_from_model.py with
+BatchSpringMassModel, which integrates the system for a whole block of
+stiffness values at once with a vectorized fixed step Runge-Kutta scheme.
+MLMCSimulator passes blocks of samples to the model's evaluate_batch()
+function, so both the Monte Carlo reference and the MLMC simulation avoid
+solving the system one sample at a time.
+'''
+
+
+# Step 1 - Define random variable for spring stiffness:
+# Need to provide a sampleable function to create RandomInput instance in MLMCPy
+def beta_distribution(shift, scale, alpha, beta, size):
+
+    return shift + scale*np.random.beta(alpha, beta, size)
+
+
+np.random.seed(1)
+stiffness_distribution = RandomInput(distribution_function=beta_distribution,
+                                     shift=1.0, scale=2.5, alpha=3., beta=2.,
+                                     random_seed=1)
+
+# Step 2: Run standard Monte Carlo to generate a reference solution and target
+# precision. All samples are integrated together in a single call.
+num_samples = 5000
+model = BatchSpringMassModel(mass=1.5, time_step=0.01)
+input_samples = stiffness_distribution.draw_samples(num_samples)
+
+start_mc = timeit.default_timer()
+
+output_samples_mc = model.evaluate_batch(input_samples)[:, 0]
+
+mc_total_cost = timeit.default_timer() - start_mc
+
+mean_mc = np.mean(output_samples_mc)
+precision_mc = (np.var(output_samples_mc) / float(num_samples))
+print "Target precision: ", precision_mc
+
+# Step 3 - Initialize spring-mass models for MLMC. Here using three levels
+# with MLMC defined by different time steps of the integration scheme.
+model_level1 = BatchSpringMassModel(mass=1.5, time_step=1.0)
+model_level2 = BatchSpringMassModel(mass=1.5, time_step=0.1)
+model_level3 = BatchSpringMassModel(mass=1.5, time_step=0.01)
+
+models = [model_level1, model_level2, model_level3]
+
+# Step 4 - Initialize MLMC & predict max displacement to specified precision
+mlmc_simulator = MLMCSimulator(stiffness_distribution, models)
+
+start_mlmc = timeit.default_timer()
+
+[estimates, sample_sizes, variances] = \
+    mlmc_simulator.simulate(epsilon=np.sqrt(precision_mc),
+                            initial_sample_sizes=100,
+                            verbose=True)
+
+mlmc_total_cost = timeit.default_timer() - start_mlmc
+
+#Step 5 - summarize results:
+
+print
+print 'MLMC estimate: %s' % estimates[0]
+print 'MLMC precision: %s' % variances[0]
+print 'MLMC total cost: %s' % mlmc_total_cost
+
+print
+print "MC # samples: %s" % num_samples
+print "MC estimate: %s" % mean_mc
+print "MC precision: %s" % precision_mc
+print "MC total cost: %s" % mc_total_cost
+print
+print "MC samples per second: %s" % (num_samples / mc_total_cost)
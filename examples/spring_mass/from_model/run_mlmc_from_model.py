@@ -2,6 +2,7 @@ import numpy as np
 import timeit
 
 from spring_mass_model import SpringMassModel
+from spring_mass_model import NestedSpringMassModel
 from MLMCPy.input import RandomInput
 from MLMCPy.mlmc import MLMCSimulator
 
@@ -47,10 +48,14 @@ precision_mc = (np.var(output_samples_mc) / float(num_samples))
 print "Target precision: ", precision_mc
 
 # Step 3 - Initialize spring-mass models for MLMC. Here using three levels 
-# with MLMC defined by different time steps
+# with MLMC defined by different time steps. The time grid of each finer model
+# contains the grid of the level below, so each level difference is computed
+# from a single simulation.
 model_level1 = SpringMassModel(mass=1.5, time_step=1.0)
-model_level2 = SpringMassModel(mass=1.5, time_step=0.1)
-model_level3 = SpringMassModel(mass=1.5, time_step=0.01)
+model_level2 = NestedSpringMassModel(mass=1.5, time_step=0.1,
+                                     coarse_time_step=1.0)
+model_level3 = NestedSpringMassModel(mass=1.5, time_step=0.01,
+                                     coarse_time_step=0.1)
 
 models = [model_level1, model_level2, model_level3]
 
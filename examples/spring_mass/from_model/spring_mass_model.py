@@ -63,3 +63,93 @@ class SpringMassModel(Model):
 
         # return the two state derivatives
         return [xd, xdd]
+
+
+class NestedSpringMassModel(SpringMassModel):
+    """
+    Spring mass model whose time grid contains the time grid of the model one
+    level below it (the coarse time step must be a multiple of the time step).
+    Both levels are then evaluated from a single solve by evaluate_pair(),
+    which MLMCSimulator uses automatically for the level differences.
+    """
+
+    def __init__(self, mass=1.5, gravity=9.8, state0=None, time_step=None,
+                 coarse_time_step=None, cost=None, pair_cost=None):
+
+        SpringMassModel.__init__(self, mass, gravity, state0, time_step, cost)
+
+        stride = coarse_time_step / time_step
+        if not np.isclose(stride, round(stride)):
+            raise ValueError("coarse_time_step must be a multiple of "
+                             "time_step.")
+
+        # Every stride-th point of the time grid is a coarse grid point.
+        self._stride = int(round(stride))
+        self.pair_cost = pair_cost
+
+    def evaluate_pair(self, inputs):
+        """
+        Returns the max displacement over the fine and over the coarse time
+        grid from one simulation.
+        """
+        stiffness = inputs[0]
+        state = self.simulate(stiffness)
+
+        fine_output = np.array([max(state[:, 0])])
+        coarse_output = np.array([max(state[::self._stride, 0])])
+
+        return fine_output, coarse_output
+
+
+class BatchSpringMassModel(SpringMassModel):
+    """
+    Spring mass model integrated with a fixed step fourth order Runge-Kutta
+    scheme on its time grid, so the time step determines the accuracy of the
+    model. evaluate_batch() advances the states of all samples together as
+    one array of shape (num_samples, 2), which makes evaluating large blocks
+    of samples much cheaper than solving for each stiffness separately.
+    """
+
+    def evaluate(self, inputs):
+        """
+        Returns the max displacement over the course of the simulation.
+        """
+        return self.evaluate_batch(np.reshape(inputs, (1, -1)))[0]
+
+    def evaluate_batch(self, samples):
+        """
+        Returns the max displacement for each stiffness value in the first
+        column of samples as an array of shape (num_samples, 1).
+        """
+        stiffness = np.asarray(samples, dtype=float)[:, 0]
+
+        state = np.tile(np.asarray(self._state0, dtype=float),
+                        (stiffness.size, 1))
+        max_displacement = np.copy(state[:, 0])
+
+        for time_step in np.diff(self._t):
+
+            k1 = self._batch_derivatives(state, stiffness)
+            k2 = self._batch_derivatives(state + .5 * time_step * k1,
+                                         stiffness)
+            k3 = self._batch_derivatives(state + .5 * time_step * k2,
+                                         stiffness)
+            k4 = self._batch_derivatives(state + time_step * k3, stiffness)
+
+            state = state + time_step / 6. * (k1 + 2. * k2 + 2. * k3 + k4)
+
+            np.maximum(max_displacement, state[:, 0], out=max_displacement)
+
+        return max_displacement[:, np.newaxis]
+
+    def _batch_derivatives(self, state, stiffness):
+        """
+        Return velocities/accelerations for an array of states with one row
+        per stiffness value.
+        """
+        derivatives = np.empty_like(state)
+        derivatives[:, 0] = state[:, 1]
+        derivatives[:, 1] = ((-stiffness * state[:, 0]) / self._mass +
+                             self._gravity)
+
+        return derivatives
@@ -0,0 +1,100 @@
+import os
+import sys
+import pytest
+import numpy as np
+
+# Needed when running mpiexec. Be sure to run from tests directory.
+if 'PYTHONPATH' not in os.environ:
+
+    base_path = os.path.abspath('..')
+
+    sys.path.insert(0, base_path)
+
+from MLMCPy.input import AntitheticInput
+from MLMCPy.input import InputFromData
+from MLMCPy.input import RandomInput
+
+my_path = os.path.dirname(os.path.abspath(__file__))
+data_path = my_path + "/../testing_data"
+
+
+@pytest.fixture
+def antithetic_data_input():
+    """
+    Creates an AntitheticInput drawing from a file containing two
+    dimensional data, reflected about zero.
+    """
+    data = InputFromData(os.path.join(data_path, "2D_test_data.csv"),
+                         shuffle_data=False)
+
+    return AntitheticInput(data, lambda x: -x)
+
+
+@pytest.mark.parametrize('num_samples', [1, 2, 5, 6])
+def test_samples_followed_by_reflection(antithetic_data_input, num_samples):
+    """
+    Ensures that each sample drawn from the wrapped input is followed by its
+    reflection.
+    """
+    samples = antithetic_data_input.draw_samples(num_samples)
+
+    assert samples.shape == (num_samples, 5)
+    assert np.array_equal(samples[1::2], -samples[:num_samples // 2 * 2:2])
+
+    antithetic_data_input.reset_sampling()
+    data = InputFromData(os.path.join(data_path, "2D_test_data.csv"),
+                         shuffle_data=False)
+
+    assert np.array_equal(samples[::2],
+                          data.draw_samples((num_samples + 1) // 2))
+
+
+def test_reset_sampling(antithetic_data_input):
+    """
+    Ensures that resetting sampling restarts the wrapped input.
+    """
+    samples = antithetic_data_input.draw_samples(4)
+    antithetic_data_input.reset_sampling()
+
+    assert np.array_equal(samples, antithetic_data_input.draw_samples(4))
+
+
+def test_pairs_halve_variance_of_linear_function():
+    """
+    Ensures that the means of antithetic pairs of a uniform distribution
+    vary less than the means of pairs of independent samples.
+    """
+    np.random.seed(1)
+
+    independent_input = RandomInput(np.random.uniform)
+    antithetic_input = AntitheticInput(RandomInput(np.random.uniform),
+                                       lambda x: 1. - x)
+
+    assert antithetic_input.sample_group_size == 2
+
+    def pair_means(samples):
+        return np.mean(samples.reshape(-1, 2), axis=1)
+
+    independent_variance = \
+        np.var(pair_means(independent_input.draw_samples(1000) ** 2))
+    antithetic_variance = \
+        np.var(pair_means(antithetic_input.draw_samples(1000) ** 2))
+
+    assert antithetic_variance < .5 * independent_variance
+
+
+def test_init_fails_on_bad_parameters(antithetic_data_input):
+    """
+    Ensures that parameters are validated.
+    """
+    with pytest.raises(TypeError):
+        AntitheticInput(np.zeros(5), lambda x: -x)
+
+    with pytest.raises(TypeError):
+        AntitheticInput(RandomInput(np.random.uniform), 1.)
+
+    with pytest.raises(TypeError):
+        antithetic_data_input.draw_samples(2.)
+
+    with pytest.raises(ValueError):
+        antithetic_data_input.draw_samples(0)
@@ -0,0 +1,125 @@
+import os
+import sys
+import pytest
+import numpy as np
+import scipy.stats
+
+# Needed when running mpiexec. Be sure to run from tests directory.
+if 'PYTHONPATH' not in os.environ:
+
+    base_path = os.path.abspath('..')
+
+    sys.path.insert(0, base_path)
+
+from MLMCPy.input import ImportanceSamplingInput
+from MLMCPy.input import RandomInput
+from MLMCPy.model import Model
+
+
+class SumModel(Model):
+    """
+    Returns the sum of the values of a sample.
+    """
+    def evaluate(self, sample):
+        return np.array([np.sum(sample)])
+
+
+@pytest.fixture
+def shifted_normal_input():
+    """
+    Creates an ImportanceSamplingInput drawing two dimensional samples from
+    a standard normal distribution shifted by two in each dimension.
+    """
+    np.random.seed(1)
+
+    data = RandomInput(lambda size: np.random.normal(2., 1., (size, 2)))
+
+    return ImportanceSamplingInput(data, scipy.stats.norm(),
+                                   scipy.stats.norm(2.))
+
+
+def test_likelihood_ratios_of_shifted_normal(shifted_normal_input):
+    """
+    Ensures that likelihood ratios are the nominal density over the biasing
+    density, with densities of independent dimensions multiplied.
+    """
+    samples = shifted_normal_input.draw_samples(10)
+
+    expected_ratios = np.exp(4. - 2. * np.sum(samples, axis=1))
+
+    assert samples.shape == (10, 2)
+    assert np.allclose(shifted_normal_input.get_likelihood_ratios(samples),
+                       expected_ratios)
+
+    density = lambda x: np.exp(-np.sum(x ** 2, axis=1) / 2.) / (2. * np.pi)
+    custom_input = ImportanceSamplingInput(shifted_normal_input, density,
+                                           scipy.stats.norm(2.))
+
+    assert np.allclose(custom_input.get_likelihood_ratios(samples),
+                       expected_ratios)
+
+
+def test_weighted_tail_probability(shifted_normal_input):
+    """
+    Ensures that weighted indicators of a tail event estimate its probability
+    under the nominal density more accurately than nominal samples do.
+    """
+    threshold = 5.
+    expected_probability = scipy.stats.norm.sf(threshold / np.sqrt(2.))
+
+    samples = shifted_normal_input.draw_samples(10000)
+    weighted_indicators = (np.sum(samples, axis=1) > threshold) * \
+        shifted_normal_input.get_likelihood_ratios(samples)
+
+    assert np.isclose(np.mean(weighted_indicators), expected_probability,
+                      rtol=.05)
+
+
+@pytest.mark.parametrize('exceedance', [True, False])
+def test_cross_entropy_moves_samples_into_event(exceedance):
+    """
+    Ensures that the tuned biasing density puts a large share of its samples
+    in a rare event, and that its likelihood ratios make the estimate of the
+    probability of the event accurate.
+    """
+    np.random.seed(1)
+
+    direction = 1. if exceedance else -1.
+    threshold = direction * 3.5 * np.sqrt(2.)
+    expected_probability = scipy.stats.norm.sf(3.5)
+
+    data = RandomInput(lambda size: np.random.normal(size=(size, 2)))
+
+    tuned_input = ImportanceSamplingInput.from_cross_entropy(
+        data, scipy.stats.norm(), SumModel(), threshold, exceedance)
+
+    samples = tuned_input.draw_samples(10000)
+    in_event = direction * np.sum(samples, axis=1) > direction * threshold
+
+    assert np.mean(in_event) > .3
+    assert np.isclose(np.mean(in_event *
+                              tuned_input.get_likelihood_ratios(samples)),
+                      expected_probability, rtol=.05)
+
+
+def test_init_fails_on_bad_parameters(shifted_normal_input):
+    """
+    Ensures that parameters are validated.
+    """
+    with pytest.raises(TypeError):
+        ImportanceSamplingInput(np.zeros(5), scipy.stats.norm(),
+                                scipy.stats.norm(2.))
+
+    with pytest.raises(TypeError):
+        ImportanceSamplingInput(shifted_normal_input, 1.,
+                                scipy.stats.norm(2.))
+
+    with pytest.raises(TypeError):
+        ImportanceSamplingInput.from_cross_entropy(
+            shifted_normal_input, scipy.stats.norm(), SumModel(), 1.,
+            num_samples=100.)
+
+    with pytest.raises(ValueError):
+        ImportanceSamplingInput.from_cross_entropy(
+            shifted_normal_input, scipy.stats.norm(), SumModel(), 1.,
+            elite_fraction=1.)
@@ -0,0 +1,95 @@
+import os
+import sys
+import pytest
+import numpy as np
+
+# Needed when running mpiexec. Be sure to run from tests directory.
+if 'PYTHONPATH' not in os.environ:
+
+    base_path = os.path.abspath('..')
+
+    sys.path.insert(0, base_path)
+
+from MLMCPy.input import LatinHypercubeInput
+
+
+@pytest.mark.parametrize('num_dimensions', [1, 4])
+def test_each_block_is_latin_hypercube(num_dimensions):
+    """
+    Ensures that every block has exactly one sample in each interval of each
+    dimension.
+    """
+    lhs_input = LatinHypercubeInput(num_dimensions, 10, random_seed=1)
+
+    assert lhs_input.sample_group_size == 10
+
+    samples = lhs_input.draw_samples(30)
+
+    assert samples.shape == (30, num_dimensions)
+
+    for block in samples.reshape(3, 10, num_dimensions):
+
+        intervals = np.sort(np.floor(block * 10).astype(int), axis=0)
+
+        assert np.array_equal(intervals,
+                              np.tile(np.arange(10)[:, np.newaxis],
+                                      num_dimensions))
+
+
+def test_blocks_extend_consistently():
+    """
+    Ensures that drawing blocks in several steps gives the same samples as
+    drawing them at once, and that CPU shares are whole blocks.
+    """
+    lhs_input = LatinHypercubeInput(3, 5, random_seed=1)
+
+    samples = lhs_input.draw_samples(25)
+
+    lhs_input.reset_sampling()
+    extended_samples = np.vstack([lhs_input.draw_samples(10),
+                                  lhs_input.draw_samples(15)])
+
+    assert np.array_equal(samples, extended_samples)
+
+    lhs_input.reset_sampling()
+    shares = [lhs_input.draw_cpu_samples(25, 0, 2)]
+    lhs_input.reset_sampling()
+    shares.append(lhs_input.draw_cpu_samples(25, 1, 2))
+
+    assert [share.shape[0] for share in shares] == [15, 10]
+    assert np.array_equal(np.vstack(shares), samples)
+
+
+def test_block_means_vary_less_than_monte_carlo():
+    """
+    Ensures that means of an additive function over blocks vary much less
+    than means over as many independent samples.
+    """
+    np.random.seed(1)
+
+    lhs_input = LatinHypercubeInput(5, 20, random_seed=1)
+    function = lambda x: np.sum(np.exp(x), axis=1)
+
+    block_means = np.mean(function(lhs_input.draw_samples(
+        20 * 200)).reshape(200, 20), axis=1)
+    random_means = np.mean(function(np.random.uniform(
+        size=(20 * 200, 5))).reshape(200, 20), axis=1)
+
+    assert np.var(block_means) < .1 * np.var(random_means)
+
+
+def test_init_fails_on_bad_parameters():
+    """
+    Ensures that parameters are validated.
+    """
+    with pytest.raises(TypeError):
+        LatinHypercubeInput(2., 3)
+
+    with pytest.raises(TypeError):
+        LatinHypercubeInput(2, 3.)
+
+    with pytest.raises(ValueError):
+        LatinHypercubeInput(2, 0)
+
+    with pytest.raises(TypeError):
+        LatinHypercubeInput(2, 3, 1.)
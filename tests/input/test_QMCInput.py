@@ -0,0 +1,166 @@
+import os
+import sys
+import pytest
+import numpy as np
+import scipy.stats
+
+# Needed when running mpiexec. Be sure to run from tests directory.
+if 'PYTHONPATH' not in os.environ:
+
+    base_path = os.path.abspath('..')
+
+    sys.path.insert(0, base_path)
+
+from MLMCPy.input import QMCInput
+
+
+@pytest.mark.parametrize('num_dimensions', [1, 3, 21])
+def test_draw_samples_shape_and_range(num_dimensions):
+    """
+    Ensures that samples have the requested shape and lie in (0, 1).
+    """
+    qmc_input = QMCInput(num_dimensions, random_seed=1)
+
+    samples = qmc_input.draw_samples(100)
+
+    assert samples.shape == (100, num_dimensions)
+    assert np.all(samples > 0.)
+    assert np.all(samples < 1.)
+
+
+def test_unrandomized_direction_numbers():
+    """
+    Ensures that the direction numbers generate the first points of the Sobol
+    sequence.
+    """
+    qmc_input = QMCInput(3)
+    direction_numbers = qmc_input._direction_numbers / 2. ** 32
+
+    assert np.array_equal(direction_numbers[:, :3],
+                          [[.5, .25, .125], [.5, .75, .625],
+                           [.5, .75, .375]])
+
+
+def test_randomized_points_are_stratified():
+    """
+    Ensures that randomized points keep the stratification of the Sobol
+    sequence: each of 16 equal intervals of a coordinate, and each of 16
+    squares of the first two coordinates, holds exactly one of the first
+    16 points.
+    """
+    points = QMCInput(3, random_seed=1).get_points(5, 0, 16)
+
+    for dimension in range(3):
+        intervals = np.floor(points[:, dimension] * 16)
+        assert len(np.unique(intervals)) == 16
+
+    squares = set((int(x * 4), int(y * 4)) for x, y in points[:, :2])
+    assert len(squares) == 16
+
+
+def test_points_extend_consistently():
+    """
+    Ensures that points can be generated in pieces from any position.
+    """
+    qmc_input = QMCInput(2, random_seed=1)
+
+    points = qmc_input.get_points(3, 0, 20)
+    pieces = np.vstack([qmc_input.get_points(3, 0, 7),
+                        qmc_input.get_points(3, 7, 13)])
+
+    assert np.array_equal(points, pieces)
+
+    first_draw = qmc_input.draw_samples(5)
+    second_draw = qmc_input.draw_samples(5)
+    assert np.array_equal(np.vstack([first_draw, second_draw]),
+                          qmc_input.get_points(0, 0, 10))
+
+    qmc_input.reset_sampling()
+    assert np.array_equal(qmc_input.draw_samples(5), first_draw)
+
+
+def test_randomizations_are_reproducible_and_independent():
+    """
+    Ensures that randomizations depend on the seed and number only.
+    """
+    points = QMCInput(2, random_seed=1).get_points(0, 0, 8)
+
+    assert np.array_equal(points, QMCInput(2, random_seed=1).get_points(0, 0, 8))
+    assert not np.allclose(points, QMCInput(2, random_seed=2).get_points(0, 0, 8))
+    assert not np.allclose(points, QMCInput(2, random_seed=1).get_points(1, 0, 8))
+
+
+@pytest.mark.parametrize('num_cpus', [2, 3, 7])
+def test_cpu_shares_partition_samples(num_cpus):
+    """
+    Ensures that the shares of all CPUs form the samples drawn on one CPU.
+    """
+    qmc_input = QMCInput(2, random_seed=1)
+    all_samples = qmc_input.draw_samples(20)
+
+    shares = []
+    for cpu_rank in range(num_cpus):
+        qmc_input.reset_sampling()
+        shares.append(qmc_input.draw_cpu_samples(20, cpu_rank, num_cpus))
+
+    assert np.array_equal(np.vstack(shares), all_samples)
+
+
+def test_distributions_applied():
+    """
+    Ensures that points are mapped through scipy distributions and
+    functions.
+    """
+    qmc_input = QMCInput(2, distributions=[scipy.stats.norm(loc=5.),
+                                           lambda u: 2. * u],
+                         random_seed=1)
+
+    samples = qmc_input.draw_samples(4096)
+
+    assert np.isclose(np.mean(samples[:, 0]), 5., atol=1e-3)
+    assert np.isclose(np.std(samples[:, 0]), 1., atol=1e-2)
+    assert np.all(samples[:, 1] < 2.)
+
+
+def test_error_smaller_than_monte_carlo():
+    """
+    Ensures that the mean of a smooth function over randomized points is more
+    accurate than over the same number of random points.
+    """
+    np.random.seed(1)
+
+    qmc_input = QMCInput(2, random_seed=1)
+
+    qmc_errors = [np.mean(np.prod(qmc_input.get_points(r, 0, 1024), axis=1))
+                  - .25 for r in range(10)]
+    mc_errors = [np.mean(np.prod(np.random.rand(1024, 2), axis=1)) - .25
+                 for _ in range(10)]
+
+    assert np.sqrt(np.mean(np.square(qmc_errors))) < \
+        .1 * np.sqrt(np.mean(np.square(mc_errors)))
+
+
+def test_init_fails_on_bad_parameters():
+    """
+    Ensures that an exception is raised for invalid parameters.
+    """
+    with pytest.raises(TypeError):
+        QMCInput(2.)
+
+    with pytest.raises(ValueError):
+        QMCInput(0)
+
+    with pytest.raises(ValueError):
+        QMCInput(22)
+
+    with pytest.raises(ValueError):
+        QMCInput(3, distributions=[scipy.stats.norm(), scipy.stats.norm()])
+
+    with pytest.raises(TypeError):
+        QMCInput(2, distributions=[1., 2.])
+
+    with pytest.raises(TypeError):
+        QMCInput(2).draw_samples(1.5)
+
+    with pytest.raises(ValueError):
+        QMCInput(2).draw_samples(0)
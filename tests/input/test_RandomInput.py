@@ -156,3 +156,28 @@ def test_distribution_exception_if_size_parameter_not_accepted():
 
     with pytest.raises(TypeError):
         invalid_input.draw_samples(10)
+
+
+def test_antithetic_samples():
+    """
+    Ensures that each sample is followed by its antithetic sample when an
+    antithetic function is provided, and that samples are grouped in pairs.
+    """
+    np.random.seed(1)
+
+    antithetic_input = RandomInput(np.random.normal, loc=1.,
+                                   antithetic_function=lambda x: 2. - x)
+
+    assert antithetic_input.sample_group_size == 2
+
+    for num_samples in range(1, 10):
+
+        samples = antithetic_input.draw_samples(num_samples)
+
+        assert samples.shape == (num_samples, 1)
+        assert np.allclose(samples[1::2], 2. - samples[:num_samples // 2 * 2:2])
+
+    assert RandomInput(np.random.normal).sample_group_size == 1
+
+    with pytest.raises(TypeError):
+        RandomInput(np.random.normal, antithetic_function=1.)
@@ -0,0 +1,162 @@
+import os
+import sys
+import pytest
+import numpy as np
+import scipy.stats
+
+# Needed when running mpiexec. Be sure to run from tests directory.
+if 'PYTHONPATH' not in os.environ:
+
+    base_path = os.path.abspath('..')
+
+    sys.path.insert(0, base_path)
+
+from MLMCPy.input import StratifiedInput
+
+
+@pytest.mark.parametrize('num_strata', [4, [2, 3, 5]])
+def test_each_block_has_one_sample_per_stratum(num_strata):
+    """
+    Ensures that every block has exactly one sample in each stratum.
+    """
+    stratified_input = StratifiedInput(3, num_strata, random_seed=1)
+    strata_counts = np.broadcast_to(num_strata, 3)
+    block_size = np.prod(strata_counts)
+
+    assert stratified_input.sample_group_size == block_size
+
+    samples = stratified_input.draw_samples(2 * block_size)
+
+    assert samples.shape == (2 * block_size, 3)
+    assert np.all(samples > 0.)
+    assert np.all(samples < 1.)
+
+    for block in [samples[:block_size], samples[block_size:]]:
+
+        strata = np.floor(block * strata_counts).astype(int)
+        stratum_indices = np.ravel_multi_index(strata.T, strata_counts)
+
+        assert np.array_equal(np.sort(stratum_indices), np.arange(block_size))
+
+
+def test_blocks_extend_consistently():
+    """
+    Ensures that drawing blocks in several steps gives the same samples as
+    drawing them at once, that blocks differ, and that resetting restarts
+    the blocks.
+    """
+    stratified_input = StratifiedInput(2, 3, random_seed=1)
+
+    samples = stratified_input.draw_samples(27)
+
+    stratified_input.reset_sampling()
+    extended_samples = np.vstack([stratified_input.draw_samples(9),
+                                  stratified_input.draw_samples(18)])
+
+    assert np.array_equal(samples, extended_samples)
+    assert not np.array_equal(samples[:9], samples[9:18])
+    assert np.array_equal(stratified_input.get_block(2), samples[18:])
+
+
+def test_partial_blocks():
+    """
+    Ensures that a number of samples that is not a multiple of the block
+    size ends with a partial block, and that the next draw starts with a new
+    block.
+    """
+    stratified_input = StratifiedInput(1, 4, random_seed=1)
+
+    assert stratified_input.draw_samples(6).shape == (6, 1)
+    assert np.array_equal(stratified_input.draw_samples(4),
+                          stratified_input.get_block(2))
+
+
+@pytest.mark.parametrize('num_cpus', [1, 2, 3, 5])
+def test_cpu_shares_partition_blocks(num_cpus):
+    """
+    Ensures that the shares of all CPUs are whole blocks, together make up
+    the samples drawn on a single CPU, and only differ by one block.
+    """
+    stratified_input = StratifiedInput(2, 2, random_seed=1)
+    expected_samples = stratified_input.draw_samples(28)
+
+    shares = []
+    for cpu_rank in range(num_cpus):
+
+        stratified_input.reset_sampling()
+        shares.append(stratified_input.draw_cpu_samples(28, cpu_rank,
+                                                        num_cpus))
+
+    share_sizes = [share.shape[0] for share in shares]
+
+    assert np.array_equal(np.vstack(shares), expected_samples)
+    assert np.all(np.array(share_sizes) % 4 == 0)
+    assert max(share_sizes) - min(share_sizes) <= 4
+
+
+def test_distributions_applied():
+    """
+    Ensures that samples are mapped through the inverse cumulative
+    distribution function of each dimension.
+    """
+    uniform_input = StratifiedInput(2, 5, random_seed=1)
+    normal_input = StratifiedInput(2, 5, [scipy.stats.norm(),
+                                          lambda u: 2. * u],
+                                   random_seed=1)
+
+    uniform_samples = uniform_input.draw_samples(50)
+    normal_samples = normal_input.draw_samples(50)
+
+    assert np.allclose(normal_samples[:, 0],
+                       scipy.stats.norm.ppf(uniform_samples[:, 0]))
+    assert np.allclose(normal_samples[:, 1], 2. * uniform_samples[:, 1])
+
+
+def test_block_means_vary_less_than_monte_carlo():
+    """
+    Ensures that means of a smooth function over blocks vary much less than
+    means over as many independent samples.
+    """
+    np.random.seed(1)
+
+    stratified_input = StratifiedInput(2, 5, random_seed=1)
+    function = lambda x: np.exp(np.sum(x, axis=1))
+
+    block_means = np.mean(function(stratified_input.draw_samples(
+        25 * 200)).reshape(200, 25), axis=1)
+    random_means = np.mean(function(np.random.uniform(
+        size=(25 * 200, 2))).reshape(200, 25), axis=1)
+
+    assert np.var(block_means) < .1 * np.var(random_means)
+
+
+def test_init_fails_on_bad_parameters():
+    """
+    Ensures that parameters are validated.
+    """
+    with pytest.raises(TypeError):
+        StratifiedInput(2., 3)
+
+    with pytest.raises(ValueError):
+        StratifiedInput(0, 3)
+
+    with pytest.raises(ValueError):
+        StratifiedInput(2, [2, 3, 4])
+
+    with pytest.raises(TypeError):
+        StratifiedInput(2, 3.)
+
+    with pytest.raises(ValueError):
+        StratifiedInput(2, [3, 0])
+
+    with pytest.raises(ValueError):
+        StratifiedInput(2, 3, [scipy.stats.norm()] * 3)
+
+    with pytest.raises(TypeError):
+        StratifiedInput(2, 3, 1.)
+
+    with pytest.raises(TypeError):
+        StratifiedInput(2, 3).draw_samples(1.)
+
+    with pytest.raises(ValueError):
+        StratifiedInput(2, 3).draw_samples(0)
@@ -0,0 +1,306 @@
+import pytest
+import numpy as np
+import os
+import sys
+
+# Needed when running mpiexec. Be sure to run from tests directory.
+if 'PYTHONPATH' not in os.environ:
+
+    base_path = os.path.abspath('..')
+
+    sys.path.insert(0, base_path)
+
+from MLMCPy.mlmc import MLMCSimulator
+from MLMCPy.mlmc import EvaluationStore
+from MLMCPy.input import RandomInput
+from MLMCPy.model import Model
+from MLMCPy.model import CachingModel
+from MLMCPy.model import CDFWrapperModel
+
+from tests.testing_scripts.spring_mass import SpringMassModel
+from tests.testing_scripts.spring_mass import NestedSpringMassModel
+
+
+def create_beta_distribution_input():
+    """
+    Creates a RandomInput object that produces samples from a
+    beta distribution.
+    """
+    np.random.seed(1)
+
+    def beta_distribution(shift, scale, alpha, beta, size):
+        return shift + scale * np.random.beta(alpha, beta, size)
+
+    return RandomInput(distribution_function=beta_distribution,
+                       shift=1.0, scale=2.5, alpha=3., beta=2.)
+
+
+class CountingModel(Model):
+    """
+    Wraps a model and counts the number of samples it evaluates.
+    """
+    def __init__(self, model, cache_key):
+        self._model = model
+        self.cost = model.cost
+        self.cache_key = cache_key
+        self.num_evaluations = 0
+
+    def evaluate(self, sample):
+        self.num_evaluations += 1
+        return self._model.evaluate(sample)
+
+
+def create_counting_models():
+
+    return [CountingModel(SpringMassModel(mass=1.5, time_step=1.0, cost=1.0),
+                          'spring_mass_1.0'),
+            CountingModel(SpringMassModel(mass=1.5, time_step=0.1, cost=10.0),
+                          'spring_mass_0.1')]
+
+
+@pytest.fixture
+def store_path(tmpdir):
+    return str(tmpdir.join('evaluations.sqlite'))
+
+
+def test_init_fails_on_bad_parameters(tmpdir, store_path):
+    """
+    Ensures that an exception is raised for invalid parameters.
+    """
+    with pytest.raises(TypeError):
+        EvaluationStore(1)
+
+    with pytest.raises(IOError):
+        EvaluationStore(str(tmpdir.join('missing', 'evaluations.sqlite')))
+
+    with pytest.raises(TypeError):
+        EvaluationStore(store_path, max_bytes=1.5)
+
+    with pytest.raises(ValueError):
+        EvaluationStore(store_path, max_bytes=0)
+
+
+def test_save_and_load(store_path):
+    """
+    Ensures that saved outputs are loaded for the same model and samples, and
+    that other models and samples are reported as missing.
+    """
+    store = EvaluationStore(store_path)
+
+    assert store.is_empty()
+
+    samples = np.arange(6.).reshape(3, 2)
+    outputs = samples * 2.
+
+    store.save('model', samples[:2], outputs[:2], evaluation_time=4.)
+
+    assert not store.is_empty()
+
+    loaded_outputs, evaluation_time = store.load('model', samples)
+
+    assert np.array_equal(loaded_outputs[0], outputs[0])
+    assert np.array_equal(loaded_outputs[1], outputs[1])
+    assert loaded_outputs[2] is None
+    assert evaluation_time == pytest.approx(4.)
+
+    loaded_outputs, evaluation_time = store.load('other_model', samples)
+
+    assert loaded_outputs == [None, None, None]
+    assert evaluation_time == 0.
+
+
+def test_outputs_persist_across_instances(store_path):
+    """
+    Ensures that outputs can be loaded after reopening the file.
+    """
+    samples = np.random.rand(5, 1)
+
+    store = EvaluationStore(store_path)
+    store.save('model', samples, samples + 1.)
+    store.close()
+
+    store = EvaluationStore(store_path)
+    loaded_outputs, _ = store.load('model', samples)
+
+    assert len(store) == 5
+    assert np.array_equal(np.vstack(loaded_outputs), samples + 1.)
+
+
+def test_least_recently_used_outputs_discarded(store_path):
+    """
+    Ensures that the least recently used outputs are discarded when the
+    stored outputs exceed max_bytes.
+    """
+    # Each output of two floats takes 16 bytes.
+    store = EvaluationStore(store_path, max_bytes=48)
+
+    samples = np.arange(4.).reshape(4, 1)
+    outputs = np.hstack([samples, samples])
+
+    store.save('model', samples[:3], outputs[:3])
+
+    # Use the first output so that the second is the least recently used.
+    store.load('model', samples[:1])
+    store.save('model', samples[3:], outputs[3:])
+
+    loaded_outputs, _ = store.load('model', samples)
+
+    assert len(store) == 3
+    assert store.get_size() == 48
+    assert loaded_outputs[1] is None
+    for i in [0, 2, 3]:
+        assert np.array_equal(loaded_outputs[i], outputs[i])
+
+
+def test_model_key_from_settings():
+    """
+    Ensures that models configured identically share a key and that models
+    configured differently do not, and that cache_key takes precedence.
+    """
+    model = SpringMassModel(mass=1.5, time_step=0.1)
+    same_model = SpringMassModel(mass=1.5, time_step=0.1)
+    other_model = SpringMassModel(mass=1.5, time_step=0.01)
+
+    assert EvaluationStore.get_model_key(model) == \
+        EvaluationStore.get_model_key(same_model)
+
+    assert EvaluationStore.get_model_key(model) != \
+        EvaluationStore.get_model_key(other_model)
+
+    model.cache_key = 'spring_mass'
+    assert EvaluationStore.get_model_key(model) == 'spring_mass'
+
+
+def test_model_key_ignores_runtime_state():
+    """
+    Ensures that the keys of models holding caches or collected outputs do
+    not change once the models have been evaluated.
+    """
+    samples = np.array([[1.], [2.], [1.]])
+
+    caching_model = CachingModel(SpringMassModel(mass=1.5, time_step=0.1))
+    cdf_model = CDFWrapperModel(SpringMassModel(mass=1.5, time_step=0.1),
+                                np.linspace(8., 16., 5))
+
+    for model in [caching_model, cdf_model]:
+
+        key = EvaluationStore.get_model_key(model)
+        model.evaluate_batch(samples)
+
+        assert EvaluationStore.get_model_key(model) == key
+
+    assert EvaluationStore.get_model_key(caching_model) != \
+        EvaluationStore.get_model_key(
+            CachingModel(SpringMassModel(mass=1.5, time_step=0.01)))
+
+
+def test_size_kept_when_outputs_replaced(store_path):
+    """
+    Ensures that the size used to discard outputs follows replaced outputs
+    and is restored when the file is opened again.
+    """
+    store = EvaluationStore(store_path, max_bytes=48)
+
+    samples = np.arange(3.).reshape(3, 1)
+
+    store.save('model', samples, np.ones((3, 2)))
+    store.save('model', samples[:1], np.ones((1, 1)))
+
+    assert store._size == store.get_size() == 40
+
+    # Fits now that the first output is smaller.
+    store.save('model', np.array([[3.]]), np.ones((1, 1)))
+
+    assert len(store) == 4
+    assert store._size == store.get_size() == 48
+
+    store.close()
+
+    assert EvaluationStore(store_path)._size == 48
+
+
+def test_simulator_rejects_bad_store():
+    """
+    Ensures that the simulator only accepts an EvaluationStore.
+    """
+    with pytest.raises(TypeError):
+        MLMCSimulator(data=create_beta_distribution_input(),
+                      models=create_counting_models(),
+                      evaluation_store='evaluations.sqlite')
+
+
+def test_repeated_simulation_reuses_stored_outputs(store_path):
+    """
+    Ensures that rerunning an identical simulation with the same store does
+    not evaluate the models again and produces the same results.
+    """
+    results = []
+    num_evaluations = []
+
+    for _ in range(2):
+
+        store = EvaluationStore(store_path)
+        models = create_counting_models()
+
+        sim = MLMCSimulator(data=create_beta_distribution_input(),
+                            models=models, evaluation_store=store)
+
+        for model in models:
+            model.num_evaluations = 0
+
+        results.append(sim.simulate(epsilon=.5, initial_sample_sizes=20))
+
+        # Exclude the evaluation used to determine the output size.
+        num_evaluations.append([models[0].num_evaluations - 1,
+                                models[1].num_evaluations])
+
+        store.close()
+
+    assert num_evaluations[0][0] > 0
+    assert num_evaluations[1] == [0, 0]
+
+    for first, second in zip(results[0], results[1]):
+        assert np.array_equal(first, second)
+
+
+def test_evaluate_pair_outputs_stored(store_path):
+    """
+    Ensures that both outputs of evaluate_pair are stored and reused, that
+    the lower level outputs are kept apart from the outputs of the model one
+    level below, and that the time of the pair is divided between them.
+    """
+    models = [SpringMassModel(mass=1.5, time_step=1.0, cost=1.0),
+              NestedSpringMassModel(mass=1.5, time_step=0.1,
+                                    coarse_time_step=1.0, cost=10.0,
+                                    pair_cost=12.5)]
+
+    store = EvaluationStore(store_path)
+    sim = MLMCSimulator(data=create_beta_distribution_input(), models=models,
+                        evaluation_store=store)
+    sim._determine_input_output_size()
+
+    samples = sim._data.draw_samples(10)
+    differences = sim._evaluate_level(samples, 1)
+
+    # Both levels' outputs were stored by a single pair evaluation.
+    assert len(store) == 20
+
+    fine_outputs, fine_time = store.load(sim._model_keys[1], samples)
+    pair_outputs, pair_time = store.load(sim._model_keys[1] + '/pair',
+                                         samples)
+
+    assert np.isclose(fine_time, .8 * (fine_time + pair_time))
+    assert np.allclose(np.array(fine_outputs) - np.array(pair_outputs),
+                       differences)
+
+    # The coarse model is evaluated itself rather than taking the outputs
+    # of the pair.
+    coarse_outputs = sim._evaluate_model(0, samples)
+    expected_outputs = np.array([models[0].evaluate(sample)
+                                 for sample in samples])
+
+    assert np.allclose(coarse_outputs, expected_outputs)
+    assert len(store) == 30
+
+    assert np.allclose(sim._evaluate_level(samples, 1), differences)
+    assert len(store) == 30
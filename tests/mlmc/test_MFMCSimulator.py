@@ -0,0 +1,248 @@
+import pytest
+import numpy as np
+import os
+import sys
+
+# Needed when running mpiexec. Be sure to run from tests directory.
+if 'PYTHONPATH' not in os.environ:
+
+    base_path = os.path.abspath('..')
+
+    sys.path.insert(0, base_path)
+
+from MLMCPy.mlmc import MFMCSimulator
+from MLMCPy.mlmc import MLMCSimulator
+from MLMCPy.input import RandomInput
+from MLMCPy.model import Model
+
+from tests.testing_scripts.spring_mass import SpringMassModel
+
+
+class NoiseModel(Model):
+    """
+    Model whose output is unrelated to its input.
+    """
+    def __init__(self, cost=10.):
+        self.cost = cost
+        self.num_evaluations = 0
+
+    def evaluate(self, sample):
+        self.num_evaluations += 1
+        return np.random.rand(1)
+
+
+class ScaledSumModel(Model):
+    """
+    Model returning the sum of the sample plus a perturbation of given size,
+    so that its correlation with the exact sum can be controlled.
+    """
+    def __init__(self, perturbation, cost):
+        self.perturbation = perturbation
+        self.cost = cost
+
+    def evaluate(self, sample):
+        return np.array([np.sum(sample) +
+                         self.perturbation * np.sin(20. * np.sum(sample))])
+
+
+@pytest.fixture
+def beta_distribution_input():
+    """
+    Creates a RandomInput object that produces samples from a
+    beta distribution.
+    """
+    np.random.seed(1)
+
+    def beta_distribution(shift, scale, alpha, beta, size):
+        return shift + scale * np.random.beta(alpha, beta, size)
+
+    return RandomInput(distribution_function=beta_distribution,
+                       shift=1.0, scale=2.5, alpha=3., beta=2.)
+
+
+@pytest.fixture
+def surrogate_models():
+    """
+    Creates a list of models with the exact sum as high fidelity model.
+    """
+    return [ScaledSumModel(.1, 1.), ScaledSumModel(.02, 10.),
+            ScaledSumModel(0., 1000.)]
+
+
+def test_init_fails_on_bad_parameters(beta_distribution_input,
+                                      surrogate_models):
+    """
+    Ensures that an exception is raised for invalid parameters.
+    """
+    with pytest.raises(TypeError):
+        MFMCSimulator(beta_distribution_input, ScaledSumModel)
+
+    sim = MFMCSimulator(beta_distribution_input, surrogate_models)
+
+    with pytest.raises(TypeError):
+        sim.simulate(.1, initial_sample_sizes=10.)
+
+    with pytest.raises(ValueError):
+        sim.simulate(.1, initial_sample_sizes=1)
+
+    with pytest.raises(ValueError):
+        sim.simulate(.1, target_cost=-1.)
+
+
+def test_simulate_estimate_and_variance(beta_distribution_input,
+                                        surrogate_models):
+    """
+    Ensures that the estimate approximates the mean of the high fidelity model
+    and that the target variance is reached.
+    """
+    sim = MFMCSimulator(beta_distribution_input, surrogate_models)
+
+    epsilon = .01
+    estimate, sample_sizes, variances = sim.simulate(epsilon)
+
+    # The beta distribution has a mean of 2.5.
+    assert variances[0] < epsilon ** 2
+    assert np.isclose(estimate[0], 2.5, atol=3 * epsilon)
+
+    # Sample sizes increase from the high fidelity model to the cheapest.
+    assert sample_sizes[2] <= sample_sizes[1] <= sample_sizes[0]
+    assert sample_sizes[2] > 0
+
+
+def test_cost_lower_than_monte_carlo(beta_distribution_input,
+                                     surrogate_models):
+    """
+    Ensures that strongly correlated cheap models reduce the cost of reaching
+    a target variance compared to sampling the high fidelity model alone.
+    """
+    epsilon = .01
+
+    sim = MFMCSimulator(beta_distribution_input, surrogate_models)
+    sample_sizes = sim.simulate(epsilon)[1]
+    mfmc_cost = np.dot([1., 10., 1000.], sample_sizes)
+
+    sim = MLMCSimulator(beta_distribution_input, surrogate_models[-1:])
+    mc_cost = 1000. * sim.simulate(epsilon)[1][0]
+
+    assert mfmc_cost < .2 * mc_cost
+
+
+def test_uncorrelated_model_not_selected(beta_distribution_input):
+    """
+    Ensures that models which do not reduce the cost are left out.
+    """
+    noise_model = NoiseModel()
+    models = [ScaledSumModel(.05, 1.), noise_model, ScaledSumModel(0., 100.)]
+
+    sim = MFMCSimulator(beta_distribution_input, models)
+
+    estimate, sample_sizes, variances = sim.simulate(.02)
+
+    assert sample_sizes[1] == 0
+    assert np.all(sim.get_weights()[1] == 0.)
+    assert np.isclose(sim.get_weights()[2, 0], 1.)
+    assert sample_sizes[0] > sample_sizes[2]
+
+
+def test_weights_are_optimal_control_variate_weights(beta_distribution_input):
+    """
+    Ensures that the weight of a model that equals the high fidelity model up
+    to a scale is the inverse of that scale.
+    """
+    class DoubledModel(Model):
+        cost = 1.
+
+        def evaluate(self, sample):
+            return np.array([2. * np.sum(sample) +
+                             .01 * np.sin(20. * np.sum(sample))])
+
+    sim = MFMCSimulator(beta_distribution_input,
+                        [DoubledModel(), ScaledSumModel(0., 100.)])
+
+    sim.simulate(.02)
+
+    assert np.isclose(sim.get_weights()[0, 0], .5, atol=.01)
+
+
+def test_target_cost(beta_distribution_input, surrogate_models):
+    """
+    Ensures that the sample sizes are fit to the target cost.
+    """
+    sim = MFMCSimulator(beta_distribution_input, surrogate_models)
+
+    target_cost = 20000.
+    estimate, sample_sizes, variances = \
+        sim.simulate(.01, target_cost=target_cost)
+
+    cost = np.dot([1., 10., 1000.], sample_sizes)
+
+    assert cost <= target_cost
+    assert cost > .9 * target_cost
+
+
+def test_target_cost_is_per_cpu(beta_distribution_input, surrogate_models):
+    """
+    Ensures that the target cost is multiplied by the number of CPUs, as in
+    MLMCSimulator.
+    """
+    sim = MFMCSimulator(beta_distribution_input, surrogate_models)
+    sim._target_cost = 20000.
+
+    costs = np.array([1000., 10., 1.])
+    sample_sizes = np.array([10, 100, 1000])
+
+    single_cpu_sample_sizes = \
+        sim._fit_mfmc_sample_sizes_to_target_cost(costs, sample_sizes)
+
+    sim._num_cpus = 4
+    multiple_cpu_sample_sizes = \
+        sim._fit_mfmc_sample_sizes_to_target_cost(costs, sample_sizes)
+
+    assert np.dot(costs, single_cpu_sample_sizes) <= 20000.
+    assert np.dot(costs, multiple_cpu_sample_sizes) <= 80000.
+    assert np.all(multiple_cpu_sample_sizes >= 4 * single_cpu_sample_sizes)
+
+
+def test_init_fails_on_grouped_samples(surrogate_models):
+    """
+    Ensures that inputs drawing samples in groups are rejected, since their
+    samples are not independent.
+    """
+    antithetic_input = RandomInput(np.random.uniform, random_seed=1,
+                                   antithetic_function=lambda x: 1. - x)
+
+    with pytest.raises(TypeError):
+        MFMCSimulator(antithetic_input, surrogate_models)
+
+
+def test_pilot_evaluates_each_model_once_per_sample(beta_distribution_input):
+    """
+    Ensures that every model is evaluated on the pilot samples, including
+    models that are not selected.
+    """
+    noise_model = NoiseModel()
+    models = [ScaledSumModel(.05, 1.), noise_model, ScaledSumModel(0., 100.)]
+
+    sim = MFMCSimulator(beta_distribution_input, models)
+    noise_model.num_evaluations = 0
+
+    sample_sizes = sim.simulate(.1, initial_sample_sizes=50)[1]
+
+    assert sample_sizes[1] == 0
+    assert noise_model.num_evaluations == 50
+
+
+def test_spring_mass_models(beta_distribution_input):
+    """
+    Ensures that spring mass models of varying time steps produce an estimate
+    close to the expected value.
+    """
+    models = [SpringMassModel(mass=1.5, time_step=1.0, cost=1.0),
+              SpringMassModel(mass=1.5, time_step=0.01, cost=100.0)]
+
+    sim = MFMCSimulator(beta_distribution_input, models)
+
+    estimate, sample_sizes, variances = sim.simulate(.1)
+
+    assert variances[0] < .1 ** 2
+    assert np.isclose(estimate[0], 12.3186216602, atol=.3)
@@ -0,0 +1,172 @@
+import pytest
+import numpy as np
+import os
+import sys
+
+# Needed when running mpiexec. Be sure to run from tests directory.
+if 'PYTHONPATH' not in os.environ:
+
+    base_path = os.path.abspath('..')
+
+    sys.path.insert(0, base_path)
+
+from MLMCPy.mlmc import MIMCSimulator
+from MLMCPy.input import RandomInput
+from MLMCPy.model import Model
+
+
+class TwoParameterModel(Model):
+    """
+    Model with two independent discretization parameters. Its output
+    converges to the sample value with an error of 2^-i + 2^-j times the
+    sample value, at a cost of 2^(i + j).
+    """
+    def __init__(self, index):
+        self.index = index
+        self.cost = 2. ** sum(index)
+        self.num_evaluations = 0
+
+    def evaluate(self, sample):
+        self.num_evaluations += 1
+        i, j = self.index
+        return np.array([np.sum(sample) * (1. + 2. ** -i + 2. ** -j)])
+
+
+@pytest.fixture
+def beta_distribution_input():
+    """
+    Creates a RandomInput object that produces samples from a
+    beta distribution.
+    """
+    np.random.seed(1)
+
+    def beta_distribution(shift, scale, alpha, beta, size):
+        return shift + scale * np.random.beta(alpha, beta, size)
+
+    return RandomInput(distribution_function=beta_distribution,
+                       shift=1.0, scale=2.5, alpha=3., beta=2.)
+
+
+def test_total_degree_index_set():
+    """
+    Ensures that the total degree index set contains exactly the indices whose
+    entries sum to at most the maximum degree.
+    """
+    index_set = MIMCSimulator.get_total_degree_index_set(2, 2)
+
+    assert sorted(index_set) == [(0, 0), (0, 1), (0, 2), (1, 0), (1, 1),
+                                 (2, 0)]
+
+    assert len(MIMCSimulator.get_total_degree_index_set(3, 1)) == 4
+
+    with pytest.raises(TypeError):
+        MIMCSimulator.get_total_degree_index_set(2, 1.5)
+
+    with pytest.raises(ValueError):
+        MIMCSimulator.get_total_degree_index_set(0, 2)
+
+
+def test_init_fails_on_bad_parameters(beta_distribution_input):
+    """
+    Ensures that an exception is raised for invalid models and index sets.
+    """
+    with pytest.raises(TypeError):
+        MIMCSimulator(beta_distribution_input, [TwoParameterModel((0, 0))])
+
+    # An index set is needed to know which models to create.
+    with pytest.raises(ValueError):
+        MIMCSimulator(beta_distribution_input, TwoParameterModel)
+
+    # (0, 1) is missing below (1, 1).
+    with pytest.raises(ValueError):
+        MIMCSimulator(beta_distribution_input, TwoParameterModel,
+                      index_set=[(0, 0), (1, 0), (1, 1)])
+
+    with pytest.raises(ValueError):
+        MIMCSimulator(beta_distribution_input, TwoParameterModel,
+                      index_set=[(0, 0), (0, 0, 1)])
+
+    with pytest.raises(ValueError):
+        MIMCSimulator(beta_distribution_input,
+                      {(0, 0): TwoParameterModel((0, 0))},
+                      index_set=[(0, 0), (1, 0)])
+
+
+def test_mixed_differences_telescope(beta_distribution_input):
+    """
+    Ensures that the mixed differences over a full tensor index set sum to the
+    output of the finest model for each sample.
+    """
+    index_set = [(i, j) for i in range(3) for j in range(2)]
+    models = dict((index, TwoParameterModel(index)) for index in index_set)
+
+    sim = MIMCSimulator(beta_distribution_input, models)
+    sim._determine_input_output_size()
+
+    samples = sim._data.draw_samples(5)
+
+    total = np.zeros((5, 1))
+    for level in range(len(index_set)):
+        total += sim._evaluate_level(samples, level)
+
+    expected = np.array([models[(2, 1)].evaluate(sample)
+                         for sample in samples])
+
+    assert np.allclose(total, expected)
+
+
+def test_costs_of_mixed_differences(beta_distribution_input):
+    """
+    Ensures that the cost of each index includes every model of its mixed
+    difference.
+    """
+    sim = MIMCSimulator(beta_distribution_input, TwoParameterModel,
+                        index_set=[(0, 0), (1, 0), (0, 1), (1, 1)])
+
+    assert sim.get_index_set() == [(0, 0), (0, 1), (1, 0), (1, 1)]
+    assert np.array_equal(sim._get_costs_from_models(), [1., 3., 3., 9.])
+
+
+def test_model_outputs_shared_between_indices(beta_distribution_input):
+    """
+    Ensures that each model is evaluated once per setup sample even though
+    it appears in the mixed differences of several indices.
+    """
+    index_set = MIMCSimulator.get_total_degree_index_set(2, 1)
+    models = dict((index, TwoParameterModel(index)) for index in index_set)
+
+    sim = MIMCSimulator(beta_distribution_input, models)
+
+    for model in models.values():
+        model.num_evaluations = 0
+
+    sim._determine_input_output_size()
+    sim._setup_simulation(1., 10, None)
+
+    # Each index draws its own setup samples; model (0, 0) is evaluated for
+    # all three indices, the others for their own index only. One further
+    # evaluation determines the output size.
+    assert models[(0, 0)].num_evaluations == 31
+    assert models[(1, 0)].num_evaluations == 10
+    assert models[(0, 1)].num_evaluations == 10
+
+
+def test_simulate_estimate(beta_distribution_input):
+    """
+    Ensures that a simulation over a total degree index set approximates the
+    expected value, up to the bias of the finest indices.
+    """
+    index_set = MIMCSimulator.get_total_degree_index_set(2, 6)
+
+    sim = MIMCSimulator(beta_distribution_input, TwoParameterModel,
+                        index_set=index_set)
+
+    estimate, sample_sizes, variances = \
+        sim.simulate(.02, initial_sample_sizes=20, adaptive=True)
+
+    # The beta distribution has a mean of 2.5. The sum of mixed differences
+    # over the total degree set equals the expected value up to
+    # 2.5 * (2^-6 + 2^-6) = .078.
+    assert len(sample_sizes) == len(index_set)
+    assert variances[0] < .02 ** 2
+    assert np.isclose(estimate[0], 2.5, atol=.15)
@@ -0,0 +1,218 @@
+import pytest
+import numpy as np
+import os
+import sys
+
+# Needed when running mpiexec. Be sure to run from tests directory.
+if 'PYTHONPATH' not in os.environ:
+
+    base_path = os.path.abspath('..')
+
+    sys.path.insert(0, base_path)
+
+from MLMCPy.mlmc import MLBLUESimulator
+from MLMCPy.mlmc import MFMCSimulator
+from MLMCPy.input import RandomInput
+from MLMCPy.model import Model
+
+
+class PerturbedSumModel(Model):
+    """
+    Model returning the sum of the sample plus a perturbation of given size.
+    """
+    def __init__(self, perturbation, cost, frequency=20.):
+        self.perturbation = perturbation
+        self.cost = cost
+        self.frequency = frequency
+
+    def evaluate(self, sample):
+        return np.array([np.sum(sample) + self.perturbation *
+                         np.sin(self.frequency * np.sum(sample))])
+
+
+@pytest.fixture
+def beta_distribution_input():
+    """
+    Creates a RandomInput object that produces samples from a
+    beta distribution.
+    """
+    np.random.seed(1)
+
+    def beta_distribution(shift, scale, alpha, beta, size):
+        return shift + scale * np.random.beta(alpha, beta, size)
+
+    return RandomInput(distribution_function=beta_distribution,
+                       shift=1.0, scale=2.5, alpha=3., beta=2.)
+
+
+@pytest.fixture
+def model_zoo():
+    """
+    Creates cheap models with unrelated errors and an exact high fidelity
+    model, which do not form a hierarchy.
+    """
+    return [PerturbedSumModel(.1, 1., 20.), PerturbedSumModel(.1, 2., 7.),
+            PerturbedSumModel(.02, 10., 13.), PerturbedSumModel(0., 1000.)]
+
+
+def test_init_fails_on_bad_groups(beta_distribution_input, model_zoo):
+    """
+    Ensures that an exception is raised for invalid groups.
+    """
+    with pytest.raises(TypeError):
+        MLBLUESimulator(beta_distribution_input, model_zoo, groups=(3,))
+
+    with pytest.raises(ValueError):
+        MLBLUESimulator(beta_distribution_input, model_zoo, groups=[(0, 4)])
+
+    with pytest.raises(ValueError):
+        MLBLUESimulator(beta_distribution_input, model_zoo,
+                        groups=[(3, 3)])
+
+    # The high fidelity model must be sampled.
+    with pytest.raises(ValueError):
+        MLBLUESimulator(beta_distribution_input, model_zoo,
+                        groups=[(0, 1), (2,)])
+
+
+def test_default_groups_are_all_subsets(beta_distribution_input, model_zoo):
+    """
+    Ensures that all non-empty subsets of models are groups by default.
+    """
+    sim = MLBLUESimulator(beta_distribution_input, model_zoo)
+
+    assert len(sim.get_group_sample_sizes()) == 15
+
+
+def test_simulate_estimate_and_variance(beta_distribution_input, model_zoo):
+    """
+    Ensures that the estimate approximates the mean of the high fidelity model
+    and that the target variance is reached.
+    """
+    sim = MLBLUESimulator(beta_distribution_input, model_zoo)
+
+    epsilon = .01
+    estimate, sample_sizes, variances = sim.simulate(epsilon)
+
+    # The beta distribution has a mean of 2.5.
+    assert variances[0] < epsilon ** 2
+    assert np.isclose(estimate[0], 2.5, atol=3 * epsilon)
+
+    group_sample_sizes = sim.get_group_sample_sizes()
+    assert sample_sizes[3] == sum(size for group, size in
+                                  group_sample_sizes.items() if 3 in group)
+
+
+def test_weights_are_unbiased(beta_distribution_input, model_zoo):
+    """
+    Ensures that the weights of the high fidelity means sum to one and those
+    of every other model sum to zero, so that the estimate is unbiased.
+    """
+    sim = MLBLUESimulator(beta_distribution_input, model_zoo)
+    sim.simulate(.01)
+
+    weight_sums = np.zeros(4)
+    for group, weights in sim.get_weights().items():
+        weight_sums[list(group)] += weights[:, 0]
+
+    assert np.allclose(weight_sums, [0., 0., 0., 1.])
+
+
+def test_high_fidelity_group_only_is_monte_carlo(beta_distribution_input,
+                                                 model_zoo):
+    """
+    Ensures that a single group of the high fidelity model gives the Monte
+    Carlo sample size.
+    """
+    sim = MLBLUESimulator(beta_distribution_input, model_zoo, groups=[(3,)])
+
+    epsilon = .05
+    estimate, sample_sizes, variances = \
+        sim.simulate(epsilon, initial_sample_sizes=200)
+
+    pilot_variance = sim._covariances[0, 3, 3]
+
+    assert np.array_equal(sample_sizes[:3], [0, 0, 0])
+    assert sample_sizes[3] == np.ceil(pilot_variance / epsilon ** 2)
+    assert np.isclose(variances[0], pilot_variance / sample_sizes[3])
+
+
+def test_target_cost_is_per_cpu(beta_distribution_input, model_zoo):
+    """
+    Ensures that the target cost is multiplied by the number of CPUs, as in
+    MLMCSimulator, and that inputs drawing samples in groups are rejected.
+    """
+    target_cost = 50000.
+
+    sim = MLBLUESimulator(beta_distribution_input, model_zoo)
+    sim.simulate(.01, initial_sample_sizes=100, target_cost=target_cost)
+
+    np.random.seed(2)
+    pilot_outputs = np.sum(np.random.rand(1, 100, 1), axis=0) + \
+        .1 * np.random.rand(4, 100, 1)
+    costs = np.array([1., 2., 10., 1000.])
+
+    group_costs = np.array([np.sum(costs[list(group)])
+                            for group in sim._groups])
+
+    sim._compute_allocation(costs, pilot_outputs)
+    single_cpu_cost = np.dot(group_costs, sim._group_sample_sizes)
+
+    sim._num_cpus = 4
+    sim._compute_allocation(costs, pilot_outputs)
+    multiple_cpu_cost = np.dot(group_costs, sim._group_sample_sizes)
+
+    assert single_cpu_cost <= target_cost
+    assert 3.5 * target_cost < multiple_cpu_cost <= 4 * target_cost
+
+    antithetic_input = RandomInput(np.random.uniform, random_seed=1,
+                                   antithetic_function=lambda x: 1. - x)
+
+    with pytest.raises(TypeError):
+        MLBLUESimulator(antithetic_input, model_zoo)
+
+
+def test_variance_not_above_mfmc(beta_distribution_input, model_zoo):
+    """
+    Ensures that at the same cost the allocation does not give a larger
+    variance than MFMC, which uses a subset of the possible estimators.
+    """
+    target_cost = 50000.
+
+    sim = MFMCSimulator(beta_distribution_input, model_zoo)
+    mfmc_variance = sim.simulate(.01, initial_sample_sizes=500,
+                                 target_cost=target_cost)[2]
+
+    beta_distribution_input.reset_sampling()
+    np.random.seed(1)
+
+    sim = MLBLUESimulator(beta_distribution_input, model_zoo)
+    estimate, sample_sizes, variances = \
+        sim.simulate(.01, initial_sample_sizes=500, target_cost=target_cost)
+
+    assert np.dot([1., 2., 10., 1000.], sample_sizes) <= target_cost
+    assert variances[0] < 1.05 * mfmc_variance[0]
+
+
+def test_multiple_quantities_of_interest(beta_distribution_input):
+    """
+    Ensures that every quantity of interest reaches its target variance.
+    """
+    class TwoOutputModel(Model):
+
+        def __init__(self, perturbation, cost):
+            self.perturbation = perturbation
+            self.cost = cost
+
+        def evaluate(self, sample):
+            total = np.sum(sample)
+            return np.array([total, total ** 2]) + \
+                self.perturbation * np.sin(20. * total)
+
+    sim = MLBLUESimulator(beta_distribution_input,
+                          [TwoOutputModel(.05, 1.), TwoOutputModel(0., 100.)])
+
+    epsilons = np.array([.01, .1])
+    estimate, sample_sizes, variances = sim.simulate(epsilons)
+
+    assert np.all(variances < epsilons ** 2)
@@ -1,5 +1,6 @@
 import pytest
 import numpy as np
+import scipy.stats
 import timeit
 import imp
 import os
@@ -14,11 +15,22 @@ if 'PYTHONPATH' not in os.environ:
     sys.path.insert(0, base_path)
 
 from MLMCPy.mlmc import MLMCSimulator
+from MLMCPy.model import Model
 from MLMCPy.model import ModelFromData
+from MLMCPy.model import CDFWrapperModel
 from MLMCPy.input import RandomInput
 from MLMCPy.input import InputFromData
+from MLMCPy.input import QMCInput
+from MLMCPy.input import AntitheticInput
+from MLMCPy.input import ImportanceSamplingInput
+from MLMCPy.input import LatinHypercubeInput
+from MLMCPy.input import StratifiedInput
 
 from tests.testing_scripts.spring_mass import SpringMassModel
+from tests.testing_scripts.spring_mass import NestedSpringMassModel
+from tests.testing_scripts.spring_mass import BatchSpringMassModel
+from tests.testing_scripts import ExecutorForTesting
+from tests.testing_scripts import AsyncModelForTesting
 
 # Create list of paths for each data file.
 # Used to parametrize tests.
@@ -275,6 +287,65 @@ def test_optimal_sample_sizes_expected_outputs(num_qoi, variances, epsilons,
     assert np.all(np.isclose(sample_sizes, expected_sample_size, atol=1))
 
 
+def test_joint_allocation_meets_every_epsilon(data_input, models_from_data):
+    """
+    Ensures that joint sample sizes meet the epsilon goal of every quantity of
+    interest at no more cost than the default sample sizes, which satisfy
+    each quantity of interest separately.
+    """
+    costs = np.array([1., 4., 16.])
+    variances = np.array([[4., .5], [1., 1.], [.01, .5]])
+    epsilons = np.array([.05, .05])
+
+    sample_sizes = {}
+    for joint_allocation in [False, True]:
+
+        test_mlmc = MLMCSimulator(models=models_from_data, data=data_input)
+        test_mlmc._epsilons = epsilons
+        test_mlmc._joint_allocation = joint_allocation
+
+        test_mlmc._compute_optimal_sample_sizes(costs, variances)
+        sample_sizes[joint_allocation] = test_mlmc._sample_sizes
+
+    estimator_variances = np.sum(variances / sample_sizes[True][:, np.newaxis],
+                                 axis=0)
+
+    assert np.all(estimator_variances <= np.square(epsilons) * (1 + 1e-9))
+    assert np.dot(costs, sample_sizes[True]) < \
+        np.dot(costs, sample_sizes[False])
+
+
+def test_allocation_for_many_outputs_is_fast(data_input):
+    """
+    Ensures that separate sample sizes for many quantities of interest on
+    many levels, as for a fine CDF grid, are found quickly and meet every
+    epsilon goal.
+    """
+    np.random.seed(1)
+
+    num_levels = 6
+    num_outputs = 1000
+
+    costs = 4. ** np.arange(num_levels)
+    variances = np.random.uniform(.5, 2., (num_levels, num_outputs)) * \
+        (2. ** (-1.5 * np.arange(num_levels)))[:, np.newaxis]
+    epsilons = np.random.uniform(.001, .01, num_outputs)
+
+    test_mlmc = MLMCSimulator(models=[SumModel(cost) for cost in costs],
+                              data=data_input)
+    test_mlmc._epsilons = epsilons
+
+    start_time = timeit.default_timer()
+    test_mlmc._compute_optimal_sample_sizes(costs, variances)
+    run_time = timeit.default_timer() - start_time
+
+    estimator_variances = \
+        np.sum(variances / test_mlmc._sample_sizes[:, np.newaxis], axis=0)
+
+    assert run_time < 5.
+    assert np.all(estimator_variances <= np.square(epsilons) * (1 + 1e-9))
+
+
 def test_costs_and_initial_variances_spring_models(beta_distribution_input,
                                                    spring_models):
     """
@@ -653,11 +724,11 @@ def test_hard_coded_test_2_level(data_input, models_from_data):
     sim_costs, sim_variances = sim._compute_costs_and_variances()
 
     # Results from hard coded testing with same parameters.
-    hard_coded_variances = np.array([[7.659619446414387],
-                                     [0.07288894751770203]])
+    hard_coded_variances = np.array([[7.65452792028112],
+                                     [0.07407238636684689]])
 
-    hard_coded_sample_sizes = np.array([9, 0])
-    hard_coded_estimate = np.array([11.639166038233583])
+    hard_coded_sample_sizes = np.array([9, 1])
+    hard_coded_estimate = np.array([11.782234335145864])
 
     assert np.all(np.isclose(sim_variances, hard_coded_variances))
     assert np.all(np.isclose(sim_estimate, hard_coded_estimate))
@@ -676,12 +747,12 @@ def test_hard_coded_test_3_level(data_input, models_from_data):
     sim_costs, sim_variances = sim._compute_costs_and_variances()
 
     # Results from hard coded testing with same parameters.
-    hard_coded_variances = np.array([[7.659619446414387],
-                                     [0.07288894751770203],
-                                     [7.363159154583542e-06]])
+    hard_coded_variances = np.array([[7.931500775888307],
+                                     [0.07433907059039102],
+                                     [7.468472582531798e-06]])
 
-    hard_coded_sample_sizes = np.array([9, 0, 0])
-    hard_coded_estimate = np.array([11.639166038233583])
+    hard_coded_sample_sizes = np.array([9, 1, 1])
+    hard_coded_estimate = np.array([11.782235464664378])
 
     assert np.all(np.isclose(sim_variances, hard_coded_variances))
     assert np.all(np.isclose(sim_estimate, hard_coded_estimate))
@@ -782,6 +853,29 @@ def test_fixed_cost(beta_distribution_input, spring_models, target_cost):
     assert compute_time < target_cost * 1.2
 
 
+@pytest.mark.parametrize('target_cost', [150, 500, 2000])
+def test_target_cost_fills_budget(beta_distribution_input, spring_models,
+                                  target_cost):
+    """
+    Ensures that sample sizes computed for a target cost take a sample of
+    every level and leave less than the cost of a coarsest level sample of
+    the target unused.
+    """
+    sim = MLMCSimulator(models=spring_models, data=beta_distribution_input)
+
+    sim._initial_sample_sizes = np.array([100, 100, 100])
+    sim._target_cost = float(target_cost)
+
+    sim._determine_input_output_size()
+    costs, variances = sim._compute_costs_and_variances()
+    sim._compute_optimal_sample_sizes(costs, variances)
+
+    expected_cost = np.dot(costs, sim._sample_sizes)
+
+    assert np.all(sim._sample_sizes > 0)
+    assert target_cost - costs[0] < expected_cost <= target_cost
+
+
 @pytest.mark.parametrize('num_cpus', [1, 2, 3, 4, 7, 12])
 def test_multi_cpu_sample_splitting(data_input, models_from_data, num_cpus):
     """
@@ -810,6 +904,44 @@ def test_multi_cpu_sample_splitting(data_input, models_from_data, num_cpus):
     assert np.max(sample_sizes) - np.min(sample_sizes) <= 1
 
 
+@pytest.mark.parametrize('num_cpus', [1, 2, 3, 7])
+def test_multi_cpu_sample_group_splitting(data_input, models_from_data,
+                                          num_cpus):
+    """
+    Ensures that samples are divided among CPUs in whole sample groups, both
+    when determining the number of samples of each CPU and when drawing
+    them.
+    """
+    total_samples = 22
+
+    sample_sizes = np.zeros(num_cpus)
+    drawn_samples = []
+
+    sim = MLMCSimulator(models=models_from_data, data=data_input)
+    sim._sample_group_size = 2
+
+    for cpu_rank in range(num_cpus):
+
+        sim._num_cpus = num_cpus
+        sim._cpu_rank = cpu_rank
+
+        sample_sizes[cpu_rank] = sim._determine_num_cpu_samples(total_samples)
+
+        data_input.reset_sampling()
+        drawn_samples.append(sim._draw_samples(total_samples))
+
+    assert np.sum(sample_sizes) == total_samples
+    assert np.all(sample_sizes % 2 == 0)
+    assert np.max(sample_sizes) - np.min(sample_sizes) <= 2
+
+    assert np.array_equal([samples.shape[0] for samples in drawn_samples],
+                          sample_sizes)
+
+    data_input.reset_sampling()
+    assert np.array_equal(np.vstack(drawn_samples),
+                          data_input.draw_samples(total_samples))
+
+
 def test_gather_arrays(data_input, models_from_data, comm):
     """
     Tests simulator's _gather_arrays() to ensure that it produces expected
@@ -1028,3 +1160,994 @@ def test_simulate_with_scalar_sample_sizes(data_input, models_from_data):
     assert np.array_equal(sample_count, np.array([5,5,5]))
 
 
+
+
+class BatchCountingModel(Model):
+    """
+    Wraps a model and records the number of calls made to evaluate() and
+    evaluate_batch() as well as the size of each batch.
+    """
+    def __init__(self, model):
+        self._model = model
+        self.cost = model.cost
+        self.num_evaluate_calls = 0
+        self.batch_sizes = []
+
+    def evaluate(self, sample):
+        self.num_evaluate_calls += 1
+        return self._model.evaluate(sample)
+
+    def evaluate_batch(self, samples):
+        self.batch_sizes.append(samples.shape[0])
+        return np.array([self._model.evaluate(sample) for sample in samples])
+
+
+class LegacyModel(object):
+    """
+    Model that only provides an evaluate() function.
+    """
+    def __init__(self, model):
+        self._model = model
+        self.cost = model.cost
+
+    def evaluate(self, sample):
+        return self._model.evaluate(sample)
+
+
+def test_simulate_uses_evaluate_batch(data_input, models_from_data):
+    """
+    Ensures that the simulator evaluates models providing evaluate_batch()
+    on blocks of samples rather than one sample at a time.
+    """
+    models = [BatchCountingModel(model) for model in models_from_data]
+
+    sim = MLMCSimulator(models=models, data=data_input)
+    sim.simulate(epsilon=.5, initial_sample_sizes=50)
+
+    # evaluate() is only used on single test samples when checking outputs.
+    assert models[0].num_evaluate_calls <= 2
+    assert models[1].num_evaluate_calls <= 1
+
+    assert 50 in models[0].batch_sizes
+    assert 50 in models[2].batch_sizes
+
+
+@pytest.mark.parametrize('batch_size', [None, 1, 7, 1000])
+def test_batch_evaluation_matches_legacy_models(data_input, models_from_data,
+                                                batch_size):
+    """
+    Ensures that batched evaluation produces the same results as per sample
+    evaluation of models that do not provide evaluate_batch().
+    """
+    legacy_models = [LegacyModel(model) for model in models_from_data]
+
+    legacy_sim = MLMCSimulator(models=legacy_models, data=data_input)
+    legacy_estimates, legacy_sample_sizes, legacy_variances = \
+        legacy_sim.simulate(epsilon=.1, initial_sample_sizes=50)
+
+    models = [BatchCountingModel(model) for model in models_from_data]
+
+    sim = MLMCSimulator(models=models, data=data_input, batch_size=batch_size)
+    estimates, sample_sizes, variances = \
+        sim.simulate(epsilon=.1, initial_sample_sizes=50)
+
+    if batch_size is not None:
+        assert np.max(models[0].batch_sizes) <= batch_size
+
+    assert np.array_equal(legacy_sample_sizes, sample_sizes)
+    assert np.all(np.isclose(legacy_estimates, estimates))
+    assert np.all(np.isclose(legacy_variances, variances))
+
+
+@pytest.mark.parametrize('batch_size', [0, -5, 2.5, 'ten'])
+def test_init_fails_on_bad_batch_size(data_input, models_from_data,
+                                      batch_size):
+    """
+    Ensures that invalid batch sizes are rejected.
+    """
+    with pytest.raises((TypeError, ValueError)):
+        MLMCSimulator(models=models_from_data, data=data_input,
+                      batch_size=batch_size)
+
+
+@pytest.mark.parametrize('reuse_setup_samples', [False, True])
+@pytest.mark.parametrize('chunk_size', [1, 7, 64])
+def test_chunked_simulation_matches_single_chunk(data_input, models_from_data,
+                                                 chunk_size,
+                                                 reuse_setup_samples):
+    """
+    Ensures that evaluating levels in chunks, including chunks that do not
+    divide the sample sizes, gives the estimates and variances of
+    evaluating each level at once, and that no more than a chunk of samples
+    is evaluated at a time.
+    """
+    results = []
+    for level_chunk_size in [chunk_size, 10000]:
+
+        models = [BatchCountingModel(model) for model in models_from_data]
+
+        np.random.seed(1)
+        sim = MLMCSimulator(models=models, data=data_input,
+                            chunk_size=level_chunk_size)
+        results.append(sim.simulate(.05, 20,
+                                    reuse_setup_samples=reuse_setup_samples))
+
+    assert np.max(results[0][1]) > 64
+    assert np.max(models[0].batch_sizes) > 64
+
+    estimates, sample_sizes, variances = results[0]
+    single_estimates, single_sample_sizes, single_variances = results[1]
+
+    assert np.array_equal(sample_sizes, single_sample_sizes)
+    assert np.allclose(estimates, single_estimates, rtol=1e-12)
+    assert np.allclose(variances, single_variances, rtol=1e-12)
+
+
+def test_chunks_hold_whole_sample_groups(data_input, models_from_data):
+    """
+    Ensures that chunks are rounded up to whole sample groups and that the
+    models are never given more than a chunk of samples.
+    """
+    data = AntitheticInput(data_input, lambda samples: samples)
+    models = [BatchCountingModel(model) for model in models_from_data]
+
+    sim = MLMCSimulator(models=models, data=data, chunk_size=5)
+    assert sim._chunk_size == 6
+
+    sim.simulate(.1, sample_sizes=[100, 40, 12])
+
+    for model in models:
+        assert np.max(model.batch_sizes) <= 6
+
+    assert np.sum(models[2].batch_sizes) >= 12
+
+
+@pytest.mark.parametrize('chunk_size', [0, -5, 2.5, None])
+def test_init_fails_on_bad_chunk_size(data_input, models_from_data,
+                                      chunk_size):
+    """
+    Ensures that invalid chunk sizes are rejected.
+    """
+    with pytest.raises((TypeError, ValueError)):
+        MLMCSimulator(models=models_from_data, data=data_input,
+                      chunk_size=chunk_size)
+
+
+@pytest.mark.parametrize('batch_size', [None, 3])
+def test_executor_results_match_serial_evaluation(data_input, models_from_data,
+                                                  batch_size):
+    """
+    Ensures that submitting model evaluations to an executor produces the same
+    results as serial evaluation even when tasks complete out of order.
+    """
+    serial_sim = MLMCSimulator(models=models_from_data, data=data_input)
+    serial_estimates, serial_sample_sizes, serial_variances = \
+        serial_sim.simulate(epsilon=.1, initial_sample_sizes=50)
+
+    executor = ExecutorForTesting()
+
+    sim = MLMCSimulator(models=models_from_data, data=data_input,
+                        batch_size=batch_size, executor=executor)
+    estimates, sample_sizes, variances = \
+        sim.simulate(epsilon=.1, initial_sample_sizes=50)
+
+    assert executor.num_submitted > 0
+
+    assert np.array_equal(serial_sample_sizes, sample_sizes)
+    assert np.array_equal(serial_estimates, estimates)
+    assert np.array_equal(serial_variances, variances)
+
+
+class FailingModel(Model):
+    """
+    Wraps a model and raises an error for every sample once failing is set.
+    """
+    def __init__(self, model):
+        self._model = model
+        self.cost = model.cost
+        self.failing = False
+
+    def evaluate(self, sample):
+        if self.failing:
+            raise RuntimeError("Model evaluation failed.")
+
+        return self._model.evaluate(sample)
+
+
+@pytest.mark.parametrize('batch_size', [None, 3])
+def test_executor_propagates_model_errors(data_input, models_from_data,
+                                          batch_size):
+    """
+    Ensures that an error raised by a model evaluated through an executor is
+    raised out of simulate.
+    """
+    models = [FailingModel(model) for model in models_from_data]
+
+    sim = MLMCSimulator(models=models, data=data_input,
+                        batch_size=batch_size, executor=ExecutorForTesting())
+
+    models[1].failing = True
+
+    with pytest.raises(RuntimeError):
+        sim.simulate(epsilon=.1, initial_sample_sizes=50)
+
+
+def test_thread_pool_executor(data_input, models_from_data):
+    """
+    Runs the simulator with a concurrent.futures thread pool when available.
+    """
+    futures = pytest.importorskip('concurrent.futures')
+
+    serial_sim = MLMCSimulator(models=models_from_data, data=data_input)
+    serial_estimates, serial_sample_sizes, serial_variances = \
+        serial_sim.simulate(epsilon=.1, initial_sample_sizes=50)
+
+    executor = futures.ThreadPoolExecutor(max_workers=4)
+
+    sim = MLMCSimulator(models=models_from_data, data=data_input,
+                        executor=executor)
+    estimates, sample_sizes, variances = \
+        sim.simulate(epsilon=.1, initial_sample_sizes=50)
+
+    executor.shutdown()
+
+    assert np.array_equal(serial_sample_sizes, sample_sizes)
+    assert np.array_equal(serial_estimates, estimates)
+
+
+def test_init_fails_on_bad_executor(data_input, models_from_data):
+    """
+    Ensures that objects without a submit function are rejected as executors.
+    """
+    with pytest.raises(TypeError):
+        MLMCSimulator(models=models_from_data, data=data_input,
+                      executor='threads')
+
+
+@pytest.mark.parametrize('max_in_flight', [1, 8, 1000])
+def test_simulate_async_matches_simulate(data_input, models_from_data,
+                                         max_in_flight):
+    """
+    Ensures that simulate_async() keeps multiple evaluations in flight without
+    exceeding the limit and produces the same results as simulate().
+    """
+    sim = MLMCSimulator(models=models_from_data, data=data_input)
+    expected_estimates, expected_sample_sizes, expected_variances = \
+        sim.simulate(epsilon=.1, initial_sample_sizes=50)
+
+    async_models = [AsyncModelForTesting(model) for model in models_from_data]
+
+    async_sim = MLMCSimulator(models=async_models, data=data_input)
+    estimates, sample_sizes, variances = \
+        async_sim.simulate_async(epsilon=.1, initial_sample_sizes=50,
+                                 max_in_flight=max_in_flight)
+
+    for model in async_models:
+        assert model.num_in_flight == 0
+        assert model.max_num_in_flight <= max(max_in_flight, 1)
+
+    assert async_models[0].max_num_in_flight >= min(max_in_flight, 50)
+
+    assert np.array_equal(expected_sample_sizes, sample_sizes)
+    assert np.array_equal(expected_estimates, estimates)
+    assert np.array_equal(expected_variances, variances)
+
+    # Simulation mode is restored afterwards.
+    assert async_sim._max_in_flight is None
+
+
+@pytest.mark.parametrize('max_in_flight, error', [[0, ValueError],
+                                                  [2.5, TypeError]])
+def test_simulate_async_fails_on_bad_max_in_flight(data_input,
+                                                   models_from_data,
+                                                   max_in_flight, error):
+    """
+    Ensures that invalid in flight limits are rejected.
+    """
+    sim = MLMCSimulator(models=models_from_data, data=data_input)
+
+    with pytest.raises(error):
+        sim.simulate_async(epsilon=.1, max_in_flight=max_in_flight)
+
+
+class PairCountingModel(NestedSpringMassModel):
+    """
+    Nested spring mass model that counts calls to evaluate_pair().
+    """
+    def __init__(self, *args, **kwargs):
+        NestedSpringMassModel.__init__(self, *args, **kwargs)
+        self.num_pair_calls = 0
+
+    def evaluate_pair(self, inputs):
+        self.num_pair_calls += 1
+        return NestedSpringMassModel.evaluate_pair(self, inputs)
+
+
+def test_evaluate_pair_used_for_level_differences(beta_distribution_input):
+    """
+    Ensures that the simulator computes level differences with evaluate_pair()
+    when available and that the results agree with evaluating both models
+    separately.
+    """
+    models = [SpringMassModel(mass=1.5, time_step=1.0, cost=1.0),
+              SpringMassModel(mass=1.5, time_step=0.1, cost=10.0),
+              SpringMassModel(mass=1.5, time_step=0.01, cost=100.0)]
+
+    pair_models = [models[0],
+                   PairCountingModel(mass=1.5, time_step=0.1,
+                                     coarse_time_step=1.0, cost=10.0),
+                   PairCountingModel(mass=1.5, time_step=0.01,
+                                     coarse_time_step=0.1, cost=100.0)]
+
+    sim = MLMCSimulator(models=models, data=beta_distribution_input)
+    samples = sim._data.draw_samples(20)
+
+    pair_sim = MLMCSimulator(models=pair_models, data=beta_distribution_input)
+    pair_sim._determine_input_output_size()
+    sim._determine_input_output_size()
+
+    for level in [1, 2]:
+
+        expected_differences = sim._evaluate_level(samples, level)
+        differences = pair_sim._evaluate_level(samples, level)
+
+        assert pair_models[level].num_pair_calls == 20
+        assert np.allclose(differences, expected_differences, atol=1e-7)
+
+
+def test_nested_spring_mass_model_requires_nested_grids():
+    """
+    Ensures that a nested spring mass model is only created when the coarse
+    time grid is contained in its time grid.
+    """
+    with pytest.raises(ValueError):
+        NestedSpringMassModel(mass=1.5, time_step=0.1, coarse_time_step=.25)
+
+    model = NestedSpringMassModel(mass=1.5, time_step=0.01,
+                                  coarse_time_step=0.1)
+
+    assert model._stride == 10
+
+
+def test_pair_cost_used_for_level_costs(data_input):
+    """
+    Ensures that the cost of a combined evaluation is used as the level cost
+    when provided.
+    """
+    models = [SpringMassModel(mass=1.5, time_step=1.0, cost=1.0),
+              NestedSpringMassModel(mass=1.5, time_step=0.1,
+                                    coarse_time_step=1.0, cost=10.0,
+                                    pair_cost=10.5),
+              NestedSpringMassModel(mass=1.5, time_step=0.01,
+                                    coarse_time_step=0.1, cost=100.0)]
+
+    sim = MLMCSimulator(models=models, data=data_input)
+
+    assert np.array_equal(sim._get_costs_from_models(), [1., 10.5, 110.])
+
+
+@pytest.mark.parametrize('time_step', [1.0, 0.1, 0.01])
+def test_batch_spring_mass_model_consistency(time_step):
+    """
+    Ensures that the vectorized spring mass model produces the same outputs
+    for a block of samples as for each sample individually, and that it
+    agrees with the odeint based model for small time steps.
+    """
+    np.random.seed(1)
+    samples = np.random.uniform(1., 3.5, (50, 1))
+
+    model = BatchSpringMassModel(mass=1.5, time_step=time_step)
+
+    batch_outputs = model.evaluate_batch(samples)
+    outputs = np.array([model.evaluate(sample) for sample in samples])
+
+    assert batch_outputs.shape == (50, 1)
+    assert np.allclose(batch_outputs, outputs)
+
+    if time_step < .1:
+        odeint_model = SpringMassModel(mass=1.5, time_step=time_step)
+        odeint_outputs = np.array([odeint_model.evaluate(sample)
+                                   for sample in samples])
+
+        assert np.allclose(batch_outputs, odeint_outputs, atol=1e-5)
+
+
+def test_calculate_estimate_for_batch_spring_mass(beta_distribution_input):
+    """
+    Tests simulator estimate with vectorized spring mass models against the
+    estimate obtained from evaluating the odeint based spring mass models one
+    sample at a time with the same time steps and random seed.
+    """
+    time_steps = [0.1, 0.05, 0.01]
+    costs = [1.0, 2.0, 10.0]
+
+    batch_models = [BatchSpringMassModel(mass=1.5, time_step=time_step,
+                                         cost=cost)
+                    for time_step, cost in zip(time_steps, costs)]
+    odeint_models = [SpringMassModel(mass=1.5, time_step=time_step, cost=cost)
+                     for time_step, cost in zip(time_steps, costs)]
+
+    np.random.seed(1)
+    sim = MLMCSimulator(models=batch_models, data=beta_distribution_input)
+    batch_estimate, batch_sample_sizes, batch_variances = \
+        sim.simulate(0.1, 100)
+
+    beta_distribution_input.reset_sampling()
+    np.random.seed(1)
+    sim = MLMCSimulator(models=odeint_models, data=beta_distribution_input)
+    estimate, sample_sizes, variances = sim.simulate(0.1, 100)
+
+    assert np.array_equal(batch_sample_sizes, sample_sizes)
+    assert np.allclose(batch_estimate, estimate, rtol=0., atol=1e-5)
+    assert np.allclose(batch_variances, variances, rtol=1e-4)
+
+
+class SumModel(Model):
+    """
+    Returns the sum of the sample values and counts its evaluations.
+    """
+    def __init__(self, cost):
+        self.cost = cost
+        self.num_evaluations = 0
+
+    def evaluate(self, sample):
+        self.num_evaluations += 1
+        return np.array([np.sum(sample)])
+
+
+def test_cache_lookup_with_multidimensional_inputs():
+    """
+    Ensures that cached outputs are only used for samples matching a cached
+    sample in every dimension.
+    """
+    def uniform_2d(size):
+        return np.random.uniform(0., 1., (size, 2))
+
+    models = [SumModel(cost=1.), SumModel(cost=2.)]
+    sim = MLMCSimulator(models=models,
+                        data=RandomInput(uniform_2d, random_seed=1))
+
+    sim.simulate(1., initial_sample_sizes=10)
+
+    cached_sample = sim._cached_inputs[0, 3]
+    cached_output = sim._cached_outputs[0, 3]
+
+    # Shares its first value with the cached sample.
+    partial_match = np.array([cached_sample[0], 5.])
+
+    num_evaluations = models[0].num_evaluations
+
+    assert np.array_equal(sim._evaluate_sample(cached_sample, 0),
+                          cached_output)
+    assert models[0].num_evaluations == num_evaluations
+
+    assert np.array_equal(sim._evaluate_sample(partial_match, 0),
+                          [cached_sample[0] + 5.])
+    assert models[0].num_evaluations == num_evaluations + 1
+
+
+def test_reuse_setup_samples_evaluates_each_sample_once(
+        beta_distribution_input):
+    """
+    Ensures that when setup samples are reused, each sample is only evaluated
+    once and every level is run with at least its setup sample size.
+    """
+    models = [BatchCountingModel(SpringMassModel(mass=1.5, time_step=1.0,
+                                                 cost=1.0)),
+              BatchCountingModel(SpringMassModel(mass=1.5, time_step=0.1,
+                                                 cost=10.0))]
+
+    sim = MLMCSimulator(models=models, data=beta_distribution_input)
+
+    estimate, sample_sizes, variances = \
+        sim.simulate(.5, initial_sample_sizes=20, reuse_setup_samples=True)
+
+    assert np.all(sample_sizes >= 20)
+    assert np.sum(models[0].batch_sizes) == np.sum(sample_sizes)
+    assert np.sum(models[1].batch_sizes) == sample_sizes[1]
+
+
+def test_reuse_setup_samples_estimate(beta_distribution_input, spring_models):
+    """
+    Tests simulator estimate with setup samples reused against expected value
+    for beta distribution.
+    """
+    # Result from 20,000 sample monte carlo spring mass simulation.
+    mc_20000_output_sample_mean = 12.3186216602
+
+    sim = MLMCSimulator(models=spring_models, data=beta_distribution_input)
+
+    estimate, sample_sizes, variances = \
+        sim.simulate(0.1, 100, reuse_setup_samples=True)
+
+    assert np.isclose(estimate[0], mc_20000_output_sample_mean, atol=.25)
+
+
+def test_cached_model_outputs_reused_across_levels():
+    """
+    Ensures that model outputs computed in the setup phase are reused by
+    other levels evaluating the same model on the same sample.
+    """
+    def uniform_2d(size):
+        return np.random.uniform(0., 1., (size, 2))
+
+    models = [SumModel(cost=1.), SumModel(cost=2.)]
+    sim = MLMCSimulator(models=models,
+                        data=RandomInput(uniform_2d, random_seed=1))
+
+    sim.simulate(1., initial_sample_sizes=10)
+
+    # Model 0 was evaluated on the level 1 setup samples as the lower level.
+    level_1_sample = sim._cached_inputs[1, 0]
+    level_0_sample = sim._cached_inputs[0, 0]
+
+    num_evaluations = [model.num_evaluations for model in models]
+
+    assert np.array_equal(sim._evaluate_sample(level_1_sample, 0),
+                          [np.sum(level_1_sample)])
+    assert models[0].num_evaluations == num_evaluations[0]
+
+    # Only the model at level 1 needs to be run for a level 0 setup sample.
+    assert np.allclose(sim._evaluate_sample(level_0_sample, 1), [0.])
+    assert models[0].num_evaluations == num_evaluations[0]
+    assert models[1].num_evaluations == num_evaluations[1] + 1
+
+
+def test_only_setup_samples_looked_up_in_cache():
+    """
+    Ensures that the simulation only looks up the outputs of samples drawn
+    again from the range of the setup samples, while still reusing all of
+    their outputs.
+    """
+    models = [SumModel(cost=1.), SumModel(cost=2.)]
+    sim = MLMCSimulator(models=models,
+                        data=RandomInput(np.random.uniform, random_seed=1))
+
+    num_cache_keys = [0]
+    get_cache_key = sim._get_cache_key
+
+    def count_cache_keys(sample):
+        num_cache_keys[0] += 1
+        return get_cache_key(sample)
+
+    sim._get_cache_key = count_cache_keys
+
+    estimates, sample_sizes, variances = \
+        sim.simulate(.01, initial_sample_sizes=10)
+
+    assert sample_sizes[0] > 20
+
+    # Model 0 outputs of the 20 setup samples are added to the cache and
+    # found again on level 0, and model outputs of both setup levels are
+    # saved once.
+    assert num_cache_keys[0] == 30 + 20
+
+    # Besides a test sample evaluated when checking the output sizes of the
+    # models, and one when determining the input and output sizes.
+    assert models[0].num_evaluations == 2 + np.sum(sample_sizes)
+    assert models[1].num_evaluations == 1 + 10 + sample_sizes[1]
+
+
+@pytest.mark.parametrize('epsilon', [.5, .1])
+def test_adaptive_simulation_meets_target_precision(beta_distribution_input,
+                                                    spring_models, epsilon):
+    """
+    Ensures that an adaptive simulation continues until the variance of the
+    estimate is below epsilon squared and agrees with the expected value.
+    """
+    # Result from 20,000 sample monte carlo spring mass simulation.
+    mc_20000_output_sample_mean = 12.3186216602
+
+    sim = MLMCSimulator(models=spring_models, data=beta_distribution_input)
+
+    estimate, sample_sizes, variances = \
+        sim.simulate(epsilon, initial_sample_sizes=20, adaptive=True)
+
+    assert variances[0] < epsilon ** 2
+    assert np.all(sample_sizes >= 20)
+    assert np.isclose(estimate[0], mc_20000_output_sample_mean,
+                      atol=3 * epsilon)
+
+
+def test_adaptive_simulation_evaluates_only_shortfall(beta_distribution_input):
+    """
+    Ensures that an adaptive simulation evaluates each sample once, including
+    the setup samples.
+    """
+    models = [BatchCountingModel(SpringMassModel(mass=1.5, time_step=1.0,
+                                                 cost=1.0)),
+              BatchCountingModel(SpringMassModel(mass=1.5, time_step=0.1,
+                                                 cost=10.0))]
+
+    sim = MLMCSimulator(models=models, data=beta_distribution_input)
+
+    estimate, sample_sizes, variances = \
+        sim.simulate(.1, initial_sample_sizes=20, adaptive=True)
+
+    assert np.sum(models[0].batch_sizes) == np.sum(sample_sizes)
+    assert np.sum(models[1].batch_sizes) == sample_sizes[1]
+
+
+def test_adaptive_simulation_with_bad_parameters(data_input,
+                                                 models_from_data):
+    """
+    Ensures that adaptive simulations can not be combined with a target cost
+    or fixed sample sizes.
+    """
+    sim = MLMCSimulator(models=models_from_data, data=data_input)
+
+    with pytest.raises(ValueError):
+        sim.simulate(1., target_cost=10., adaptive=True)
+
+    with pytest.raises(ValueError):
+        sim.simulate(1., sample_sizes=[10, 5, 2], adaptive=True)
+
+
+def test_continuation_meets_each_target_precision(beta_distribution_input,
+                                                  spring_models):
+    """
+    Ensures that a continuation simulation returns a result meeting each
+    tolerance of the schedule, with sample sizes that never decrease.
+    """
+    epsilons = [.5, .2, .1]
+
+    sim = MLMCSimulator(models=spring_models, data=beta_distribution_input)
+
+    results = sim.simulate_continuation(epsilons, initial_sample_sizes=20)
+
+    assert len(results) == len(epsilons)
+
+    previous_sample_sizes = np.zeros(len(spring_models))
+    for epsilon, (estimate, sample_sizes, variances) in zip(epsilons,
+                                                            results):
+
+        assert variances[0] < epsilon ** 2
+        assert np.all(sample_sizes >= previous_sample_sizes)
+        assert np.isclose(estimate[0], 12.3186216602, atol=3 * epsilon)
+
+        previous_sample_sizes = sample_sizes
+
+
+def test_continuation_evaluates_each_sample_once(beta_distribution_input):
+    """
+    Ensures that tighter tolerances of a continuation simulation only
+    evaluate the samples needed beyond those of looser ones.
+    """
+    models = [BatchCountingModel(SpringMassModel(mass=1.5, time_step=1.0,
+                                                 cost=1.0)),
+              BatchCountingModel(SpringMassModel(mass=1.5, time_step=0.1,
+                                                 cost=10.0))]
+
+    sim = MLMCSimulator(models=models, data=beta_distribution_input)
+
+    results = sim.simulate_continuation([.2, .1, .05],
+                                        initial_sample_sizes=20)
+
+    sample_sizes = results[-1][1]
+
+    assert np.sum(models[0].batch_sizes) == np.sum(sample_sizes)
+    assert np.sum(models[1].batch_sizes) == sample_sizes[1]
+
+
+def test_continuation_with_bad_parameters(data_input, models_from_data):
+    """
+    Ensures that continuation simulations require a non-empty list of
+    decreasing tolerances.
+    """
+    sim = MLMCSimulator(models=models_from_data, data=data_input)
+
+    with pytest.raises(TypeError):
+        sim.simulate_continuation(.1)
+
+    with pytest.raises(TypeError):
+        sim.simulate_continuation([])
+
+    with pytest.raises(ValueError):
+        sim.simulate_continuation([.5, 1.])
+
+    with pytest.raises(ValueError):
+        sim.simulate_continuation(np.array([.5, 1.]))
+
+
+@pytest.mark.parametrize('schedule_type', [list, tuple, np.array])
+def test_continuation_accepts_sequences(beta_distribution_input,
+                                        spring_models, schedule_type):
+    """
+    Ensures that continuation simulations accept the tolerance schedule as
+    any one dimensional sequence, and give the same results for each.
+    """
+    np.random.seed(1)
+    sim = MLMCSimulator(models=spring_models, data=beta_distribution_input)
+    expected = sim.simulate_continuation([.5, .2], initial_sample_sizes=20)
+
+    beta_distribution_input.reset_sampling()
+    np.random.seed(1)
+    sim = MLMCSimulator(models=spring_models, data=beta_distribution_input)
+    results = sim.simulate_continuation(schedule_type([.5, .2]),
+                                        initial_sample_sizes=20)
+
+    assert len(results) == len(expected)
+
+    for result, expected_result in zip(results, expected):
+        for value, expected_value in zip(result, expected_result):
+            assert np.allclose(value, expected_value)
+
+
+class RefinedModel(Model):
+    """
+    Model whose output converges to the sample value with an error of
+    2^-level times the sample value, at a cost of 2^level.
+    """
+    def __init__(self, level):
+        self.level = level
+        self.cost = 2. ** level
+
+    def evaluate(self, sample):
+        return np.array([np.sum(sample) * (1. + 2. ** -self.level)])
+
+
+def test_model_factory_adds_levels_until_bias_is_small(
+        beta_distribution_input):
+    """
+    Ensures that an adaptive simulation with a model factory adds levels
+    until the estimated bias is within the target precision, and estimates
+    the convergence rates of the models.
+    """
+    epsilon = .05
+
+    sim = MLMCSimulator(models=RefinedModel, data=beta_distribution_input)
+
+    estimate, sample_sizes, variances = \
+        sim.simulate(epsilon, initial_sample_sizes=20, adaptive=True)
+
+    # The mean of the beta distribution is 1 + 2.5 * 3 / 5 = 2.5, so the
+    # bias 2.5 * 2^-L is within epsilon / sqrt(2) from L = 7.
+    assert len(sample_sizes) == 8
+    assert len(sim._models) == 8
+    assert variances[0] < .5 * epsilon ** 2
+    assert np.isclose(estimate[0], 2.5, atol=3 * epsilon)
+
+    alpha, beta, gamma = sim.get_convergence_rates()
+
+    # The variances of the finest levels are estimated from few samples.
+    assert np.isclose(alpha[0], 1., atol=.1)
+    assert np.isclose(beta[0], 2., atol=.5)
+    assert np.isclose(gamma, 1., atol=.1)
+
+
+def test_model_factory_respects_max_levels(beta_distribution_input):
+    """
+    Ensures that no more than max_levels levels are created.
+    """
+    sim = MLMCSimulator(models=RefinedModel, data=beta_distribution_input,
+                        max_levels=4)
+
+    estimate, sample_sizes, variances = \
+        sim.simulate(.01, initial_sample_sizes=20, adaptive=True)
+
+    assert len(sample_sizes) == 4
+
+
+def test_model_factory_with_bad_parameters(beta_distribution_input):
+    """
+    Ensures that max_levels is validated when using a model factory.
+    """
+    with pytest.raises(TypeError):
+        MLMCSimulator(models=RefinedModel, data=beta_distribution_input,
+                      max_levels=4.)
+
+    with pytest.raises(ValueError):
+        MLMCSimulator(models=RefinedModel, data=beta_distribution_input,
+                      max_levels=2)
+
+
+def test_simulate_qmc_spring_models(spring_models):
+    """
+    Ensures that a multilevel quasi-Monte Carlo simulation reaches the target
+    variance and approximates the estimate of the spring mass models.
+    """
+    beta = lambda u: 1. + 2.5 * scipy.stats.beta.ppf(u, 3., 2.)
+    data = QMCInput(1, distributions=beta, random_seed=1)
+
+    sim = MLMCSimulator(models=spring_models, data=data)
+
+    epsilon = .05
+    estimate, sample_sizes, variances = \
+        sim.simulate_qmc(epsilon, initial_sample_sizes=4,
+                         num_randomizations=8)
+
+    assert variances[0] < epsilon ** 2
+    assert np.all(sample_sizes % 8 == 0)
+    assert np.isclose(estimate[0], 12.3186216602, atol=3 * epsilon)
+
+
+def test_simulate_qmc_needs_fewer_samples_than_monte_carlo(spring_models):
+    """
+    Ensures that quasi-Monte Carlo points reach the target variance of a
+    smooth model with fewer samples than random samples do.
+    """
+    beta = lambda u: 1. + 2.5 * scipy.stats.beta.ppf(u, 3., 2.)
+
+    sim = MLMCSimulator(models=spring_models[:1],
+                        data=QMCInput(1, distributions=beta, random_seed=1))
+    qmc_sample_sizes = sim.simulate_qmc(.01, initial_sample_sizes=4)[1]
+
+    np.random.seed(1)
+    random_input = RandomInput(distribution_function=lambda size:
+                               beta(np.random.rand(size)))
+
+    sim = MLMCSimulator(models=spring_models[:1], data=random_input)
+    mc_sample_sizes = sim.simulate(.01)[1]
+
+    assert qmc_sample_sizes[0] < mc_sample_sizes[0]
+
+
+def test_simulate_qmc_fails_on_bad_parameters(beta_distribution_input,
+                                              spring_models):
+    """
+    Ensures that simulate_qmc requires suitable data and randomizations.
+    """
+    sim = MLMCSimulator(models=spring_models, data=beta_distribution_input)
+
+    with pytest.raises(TypeError):
+        sim.simulate_qmc(.1)
+
+    sim = MLMCSimulator(models=spring_models, data=QMCInput(1))
+
+    with pytest.raises(TypeError):
+        sim.simulate_qmc(.1, num_randomizations=4.)
+
+    with pytest.raises(ValueError):
+        sim.simulate_qmc(.1, num_randomizations=1)
+
+
+def test_antithetic_pairs_reduce_variance(spring_models):
+    """
+    Ensures that the outputs of antithetic pairs are averaged, so that the
+    variance of the estimate of a monotone model falls for the same sample
+    sizes, and that sample sizes are whole numbers of pairs.
+    """
+    variances = []
+    for antithetic_function, expected_sample_sizes in \
+            [[None, [1000, 99, 10]], [lambda x: 4.5 - x, [1000, 100, 10]]]:
+
+        np.random.seed(1)
+        data = RandomInput(np.random.uniform, low=1., high=3.5,
+                           antithetic_function=antithetic_function)
+
+        sim = MLMCSimulator(models=spring_models, data=data)
+        estimates, sample_sizes, level_variances = \
+            sim.simulate(.1, sample_sizes=[1000, 99, 10])
+
+        assert np.array_equal(sample_sizes, expected_sample_sizes)
+        variances.append(level_variances)
+
+    assert variances[1] < .5 * variances[0]
+
+    np.random.seed(1)
+    data = RandomInput(np.random.uniform, low=1., high=3.5,
+                       antithetic_function=lambda x: 4.5 - x)
+
+    sim = MLMCSimulator(models=spring_models, data=data)
+    sim._initial_sample_sizes = np.array([100, 100, 100])
+    sim._determine_input_output_size()
+    costs, variances = sim._compute_costs_and_variances()
+
+    # Variances per sample are those of the means of pairs times two.
+    all_outputs = sim._cached_outputs
+    pair_means = (all_outputs[:, ::2] + all_outputs[:, 1::2]) / 2.
+
+    assert np.allclose(variances, 2. * np.var(pair_means, axis=1))
+
+    sample_sizes = sim.simulate(.1, initial_sample_sizes=51)[1]
+    assert np.all(sample_sizes % 2 == 0)
+
+    sample_sizes = sim.simulate(.1, initial_sample_sizes=51,
+                                adaptive=True)[1]
+    assert np.all(sample_sizes % 2 == 0)
+
+
+class PerturbedSumModel(Model):
+    """
+    Returns the sum s of the values of a sample perturbed by
+    perturbation * sin(s).
+    """
+    def __init__(self, perturbation, cost):
+        self._perturbation = perturbation
+        self.cost = cost
+
+    def evaluate(self, sample):
+        output_sum = np.sum(sample)
+        return np.array([output_sum + self._perturbation * np.sin(output_sum)])
+
+
+def test_importance_sampling_of_tail_probabilities():
+    """
+    Ensures that level differences are weighted by the likelihood ratios of
+    samples drawn from a biasing density, so that far tail probabilities are
+    estimated without bias and with a much smaller variance than with
+    samples of the nominal density.
+    """
+    grid = np.array([2.5, 3., 3.5]) * np.sqrt(2.)
+    expected_probabilities = scipy.stats.norm.sf([2.5, 3., 3.5])
+
+    models = [CDFWrapperModel(PerturbedSumModel(perturbation, cost), grid,
+                              exceedance=True)
+              for perturbation, cost in [(.1, 1.), (0., 4.)]]
+
+    np.random.seed(1)
+    nominal_input = RandomInput(lambda size: np.random.normal(size=(size, 2)))
+    biased_input = ImportanceSamplingInput(
+        RandomInput(lambda size: np.random.normal(2.5, 1., (size, 2))),
+        scipy.stats.norm(), scipy.stats.norm(2.5))
+
+    results = []
+    for data in [nominal_input, biased_input]:
+
+        sim = MLMCSimulator(models=models, data=data)
+        results.append(sim.simulate(1., sample_sizes=[4000, 1000]))
+
+    estimates, _, variances = results[1]
+
+    assert np.all(np.abs(estimates - expected_probabilities) <
+                  4. * np.sqrt(variances))
+    assert np.all(variances < .1 * results[0][2])
+
+    samples = biased_input.draw_samples(10)
+    likelihood_ratios = biased_input.get_likelihood_ratios(samples)
+
+    assert np.allclose(sim._evaluate_level(samples, 0),
+                       models[0].evaluate_batch(samples) *
+                       likelihood_ratios[:, np.newaxis])
+
+
+@pytest.mark.parametrize('reuse_setup_samples', [False, True])
+def test_block_inputs_need_fewer_samples(spring_models, reuse_setup_samples):
+    """
+    Ensures that stratified and Latin hypercube blocks reach the target
+    precision with fewer samples than independent samples, with sample sizes
+    in whole blocks and at least two blocks of each level in setup.
+    """
+    uniform = scipy.stats.uniform(1., 2.5)
+
+    np.random.seed(1)
+    sim = MLMCSimulator(models=spring_models,
+                        data=RandomInput(np.random.uniform, low=1., high=3.5))
+    random_sample_sizes = sim.simulate(.1, initial_sample_sizes=20)[1]
+
+    for data in [StratifiedInput(1, 10, uniform, random_seed=1),
+                 LatinHypercubeInput(1, 8, uniform, random_seed=1)]:
+
+        sim = MLMCSimulator(models=spring_models, data=data)
+        sample_sizes = sim.simulate(
+            .1, initial_sample_sizes=5,
+            reuse_setup_samples=reuse_setup_samples)[1]
+
+        block_size = data.sample_group_size
+
+        assert np.array_equal(sim._initial_sample_sizes,
+                              [2 * block_size] * 3)
+        assert np.all(sample_sizes % block_size == 0)
+        assert sample_sizes[0] < .5 * random_sample_sizes[0]
+
+
+@pytest.mark.parametrize('target_cost', [None, 2000.])
+def test_block_inputs_report_positive_variance(spring_models, target_cost):
+    """
+    Ensures that every level of a stratified simulation is given no blocks or
+    at least two, so that the variance of the estimate, which is estimated from
+    the spread of the block means, is not reported as zero.
+    """
+    uniform = scipy.stats.uniform(1., 2.5)
+    data = StratifiedInput(1, 10, uniform, random_seed=1)
+
+    sim = MLMCSimulator(models=spring_models, data=data)
+    estimates, sample_sizes, variances = \
+        sim.simulate(.05, 20, target_cost=target_cost)
+
+    # A target cost may leave out the finest levels.
+    used_levels = sample_sizes > 0
+
+    assert used_levels[0]
+    assert np.all(sample_sizes[used_levels] >= 2 * data.sample_group_size)
+    assert np.all(variances > 0.)
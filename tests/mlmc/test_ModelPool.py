@@ -0,0 +1,198 @@
+import pytest
+import numpy as np
+import multiprocessing
+import os
+import sys
+
+# Needed when running mpiexec. Be sure to run from tests directory.
+if 'PYTHONPATH' not in os.environ:
+
+    base_path = os.path.abspath('..')
+
+    sys.path.insert(0, base_path)
+
+from MLMCPy.mlmc import MLMCSimulator
+from MLMCPy.mlmc import ModelPool
+from MLMCPy.model import ModelFromData
+from MLMCPy.input import InputFromData
+
+from tests.testing_scripts.spring_mass import SpringMassModel
+from tests.testing_scripts.spring_mass import NestedSpringMassModel
+
+my_path = os.path.dirname(os.path.abspath(__file__))
+data_path = my_path + "/../testing_data"
+
+
+@pytest.fixture
+def data_input():
+    """
+    Creates an InputFromData object that produces samples from a file
+    containing spring mass input data.
+    """
+    return InputFromData(os.path.join(data_path, "spring_mass_1D_inputs.txt"),
+                         shuffle_data=False)
+
+
+def create_models_from_data():
+    """
+    Creates a list of three ModelFromData objects of increasing fidelity.
+    """
+    input_filepath = os.path.join(data_path, "spring_mass_1D_inputs.txt")
+    output1_filepath = os.path.join(data_path, "spring_mass_1D_outputs_1.0.txt")
+    output2_filepath = os.path.join(data_path, "spring_mass_1D_outputs_0.1.txt")
+    output3_filepath = os.path.join(data_path,
+                                    "spring_mass_1D_outputs_0.01.txt")
+
+    model1 = ModelFromData(input_filepath, output1_filepath, 1.)
+    model2 = ModelFromData(input_filepath, output2_filepath, 4.)
+    model3 = ModelFromData(input_filepath, output3_filepath, 16.)
+
+    return [model1, model2, model3]
+
+
+@pytest.fixture
+def models_from_data():
+    return create_models_from_data()
+
+
+def count_initializations(models, counter):
+    """
+    Initializer hook used to count the number of started workers.
+    """
+    assert len(models) == 3
+
+    with counter.get_lock():
+        counter.value += 1
+
+
+@pytest.mark.parametrize('chunk_size', [None, 1, 7, 1000])
+def test_evaluate_matches_model_outputs(data_input, models_from_data,
+                                        chunk_size):
+    """
+    Ensures that outputs computed by the workers match the outputs of the
+    models evaluated in this process and are returned in sample order.
+    """
+    samples = data_input.draw_samples(50)
+
+    with ModelPool(models_from_data, num_workers=2,
+                   chunk_size=chunk_size) as pool:
+
+        for model_index, model in enumerate(models_from_data):
+
+            outputs, evaluation_time = pool.evaluate(model_index, samples)
+
+            expected_outputs = np.array([model.evaluate(sample)
+                                         for sample in samples])
+
+            assert outputs.shape == (50, 1)
+            assert np.array_equal(np.squeeze(outputs), expected_outputs)
+            assert evaluation_time >= 0.
+
+
+def test_models_built_once_per_worker(data_input):
+    """
+    Ensures that a model factory and the initializer hook are run exactly once
+    on each worker regardless of the number of evaluations.
+    """
+    counter = multiprocessing.Value('i', 0)
+
+    samples = data_input.draw_samples(40)
+
+    with ModelPool(create_models_from_data, num_workers=3, chunk_size=2,
+                   initializer=count_initializations,
+                   initargs=(counter,)) as pool:
+
+        for _ in range(3):
+            pool.evaluate(2, samples)
+
+    assert counter.value == 3
+
+
+def test_simulation_matches_serial_simulation(data_input, models_from_data):
+    """
+    Ensures that running the simulator with a ModelPool executor produces the
+    same results as a serial simulation.
+    """
+    serial_sim = MLMCSimulator(models=models_from_data, data=data_input)
+    serial_estimates, serial_sample_sizes, serial_variances = \
+        serial_sim.simulate(epsilon=.1, initial_sample_sizes=50)
+
+    with ModelPool(models_from_data, num_workers=2) as pool:
+
+        sim = MLMCSimulator(models=models_from_data, data=data_input,
+                            executor=pool)
+        estimates, sample_sizes, variances = \
+            sim.simulate(epsilon=.1, initial_sample_sizes=50)
+
+    assert np.array_equal(serial_sample_sizes, sample_sizes)
+    assert np.array_equal(serial_estimates, estimates)
+    assert np.array_equal(serial_variances, variances)
+
+
+def test_costs_measured_from_worker_evaluation_time(data_input):
+    """
+    Ensures that setup phase costs reflect the time spent evaluating models on
+    the workers rather than the wall time of evaluating a level.
+    """
+    np.random.seed(1)
+
+    models = [SpringMassModel(mass=1.5, time_step=1.0),
+              SpringMassModel(mass=1.5, time_step=0.01)]
+
+    with ModelPool(models, num_workers=2) as pool:
+
+        sim = MLMCSimulator(models=models, data=data_input, executor=pool)
+        sim._initial_sample_sizes = np.array([20, 20])
+        sim._determine_input_output_size()
+
+        costs, variances = sim._compute_costs_and_variances()
+
+    assert sim._worker_evaluation_time > 0.
+    assert np.isclose(np.sum(costs) * 20, sim._worker_evaluation_time)
+    assert costs[1] > costs[0]
+
+
+@pytest.mark.parametrize('parameters, error',
+                         [[{'models': 'models'}, TypeError],
+                          [{'num_workers': 0}, ValueError],
+                          [{'num_workers': 1.5}, TypeError],
+                          [{'chunk_size': 0}, ValueError],
+                          [{'chunk_size': 'all'}, TypeError],
+                          [{'initializer': 'init'}, TypeError]])
+def test_init_fails_on_bad_parameters(models_from_data, parameters, error):
+    """
+    Ensures that invalid parameters are rejected.
+    """
+    arguments = {'models': models_from_data}
+    arguments.update(parameters)
+
+    with pytest.raises(error):
+        ModelPool(**arguments)
+
+
+def test_evaluate_pair_matches_model_outputs(data_input):
+    """
+    Ensures that outputs of combined evaluations on the workers match those
+    computed in this process.
+    """
+    models = [SpringMassModel(mass=1.5, time_step=1.0),
+              NestedSpringMassModel(mass=1.5, time_step=0.1,
+                                    coarse_time_step=1.0)]
+
+    samples = data_input.draw_samples(10)
+
+    with ModelPool(models, num_workers=2, chunk_size=3) as pool:
+
+        outputs, lower_level_outputs, evaluation_time = \
+            pool.evaluate_pair(1, samples)
+
+    for i, sample in enumerate(samples):
+
+        expected_output, expected_lower_level_output = \
+            models[1].evaluate_pair(sample)
+
+        assert np.array_equal(outputs[i], expected_output)
+        assert np.array_equal(lower_level_outputs[i],
+                              expected_lower_level_output)
+
+    assert evaluation_time > 0.
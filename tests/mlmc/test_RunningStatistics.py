@@ -0,0 +1,84 @@
+import pytest
+import numpy as np
+import os
+import sys
+
+# Needed when running mpiexec. Be sure to run from tests directory.
+if 'PYTHONPATH' not in os.environ:
+
+    base_path = os.path.abspath('..')
+
+    sys.path.insert(0, base_path)
+
+from MLMCPy.mlmc.RunningStatistics import RunningStatistics
+
+
+@pytest.mark.parametrize('block_size', [1, 7, 100])
+def test_statistics_match_two_pass_results(block_size):
+    """
+    Ensures that statistics accumulated over blocks of outputs match the
+    mean and variance computed from all outputs at once.
+    """
+    np.random.seed(1)
+    outputs = [1e6 + np.random.randn(100, 3), np.random.randn(40, 3)]
+
+    statistics = RunningStatistics(2, 3)
+
+    for level, level_outputs in enumerate(outputs):
+        for start in range(0, level_outputs.shape[0], block_size):
+            statistics.update(level, level_outputs[start: start + block_size])
+
+    assert np.array_equal(statistics.sample_sizes, [100, 40])
+
+    for level, level_outputs in enumerate(outputs):
+        assert np.allclose(statistics.means[level],
+                           np.mean(level_outputs, axis=0))
+        assert np.allclose(statistics.get_variances()[level],
+                           np.var(level_outputs, axis=0))
+
+    assert np.allclose(statistics.get_estimates(),
+                       np.mean(outputs[0], axis=0) +
+                       np.mean(outputs[1], axis=0))
+
+    assert np.allclose(statistics.get_estimator_variances(),
+                       np.var(outputs[0], axis=0) / 100. +
+                       np.var(outputs[1], axis=0) / 40.)
+
+
+def test_empty_levels():
+    """
+    Ensures that levels without samples do not contribute to the estimates.
+    """
+    statistics = RunningStatistics(2, 1)
+    statistics.update(0, np.array([[1.], [3.]]))
+    statistics.update(1, np.zeros((0, 1)))
+
+    assert np.array_equal(statistics.get_estimates(), [2.])
+    assert np.array_equal(statistics.get_variances(), [[1.], [0.]])
+    assert np.array_equal(statistics.get_estimator_variances(), [.5])
+
+
+def test_combined_summaries_match_updates():
+    """
+    Ensures that combining summaries of blocks, as done for blocks computed
+    on different CPUs, matches updating with the blocks themselves, and that
+    a single block is taken exactly.
+    """
+    np.random.seed(2)
+    blocks = [np.random.randn(size, 2) for size in [5, 0, 12, 1]]
+
+    updated = RunningStatistics(1, 2)
+    combined = RunningStatistics(1, 2)
+
+    for block in blocks:
+        updated.update(0, block)
+        combined.combine(0, *RunningStatistics.summarize(block))
+
+    assert np.array_equal(combined.sample_sizes, updated.sample_sizes)
+    assert np.allclose(combined.means, updated.means)
+    assert np.allclose(combined.get_variances(), updated.get_variances())
+
+    single = RunningStatistics(1, 2)
+    single.update(0, blocks[0])
+
+    assert np.array_equal(single.means[0], np.mean(blocks[0], axis=0))
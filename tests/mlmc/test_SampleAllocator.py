@@ -0,0 +1,236 @@
+import pytest
+import numpy as np
+import os
+import sys
+
+# Needed when running mpiexec. Be sure to run from tests directory.
+if 'PYTHONPATH' not in os.environ:
+
+    base_path = os.path.abspath('..')
+
+    sys.path.insert(0, base_path)
+
+from MLMCPy.mlmc.SampleAllocator import SampleAllocator
+
+
+def brute_force_allocation(costs, variances, minimums, multiple, target,
+                           minimize_cost, max_units=120):
+    """
+    Finds the best sample sizes by trying every combination of up to
+    max_units units per level. With 2d variances, every quantity of
+    interest must meet its target.
+    """
+    ranges = [np.arange(int(np.ceil(minimum / float(multiple))), max_units)
+              for minimum in minimums]
+
+    sample_sizes = np.stack(np.meshgrid(*ranges, indexing='ij'), axis=-1) * \
+        multiple
+
+    total_costs = np.dot(sample_sizes, costs)
+
+    with np.errstate(divide='ignore'):
+        total_variances = np.dot(1. / sample_sizes, variances)
+
+    if minimize_cost:
+        meets_target = total_variances <= target
+        if meets_target.ndim > total_costs.ndim:
+            meets_target = np.all(meets_target, axis=-1)
+
+        return np.min(total_costs[meets_target])
+
+    return np.min(total_variances[total_costs <= target])
+
+
+@pytest.mark.parametrize('seed', range(10))
+@pytest.mark.parametrize('multiple', [1, 3])
+def test_allocation_matches_brute_force(seed, multiple):
+    """
+    Ensures that the sample sizes found are optimal integer allocations for
+    both minimizing cost and minimizing variance.
+    """
+    np.random.seed(seed)
+
+    costs = np.random.uniform(2., 10., 3)
+    variances = np.random.uniform(.1, 5., 3)
+    minimums = np.random.randint(0, 3, 3)
+
+    allocator = SampleAllocator(costs, variances, minimums, multiple)
+
+    target_variance = np.random.uniform(.5, 2.)
+    sample_sizes = allocator.minimize_cost(target_variance)
+
+    assert allocator.is_optimal
+    assert np.all(sample_sizes % multiple == 0)
+    assert np.all(sample_sizes >= minimums)
+    assert np.sum(variances / sample_sizes) <= target_variance * (1 + 1e-9)
+    assert np.isclose(np.dot(costs, sample_sizes),
+                      brute_force_allocation(costs, variances, minimums,
+                                             multiple, target_variance, True))
+
+    budget = np.random.uniform(2., 5.) * multiple * np.sum(costs)
+    sample_sizes = allocator.minimize_variance(budget)
+
+    assert np.all(sample_sizes % multiple == 0)
+    assert np.all(sample_sizes >= minimums)
+    assert np.dot(costs, sample_sizes) <= budget
+    assert np.isclose(np.sum(variances / sample_sizes),
+                      brute_force_allocation(costs, variances, minimums,
+                                             multiple, budget, False))
+
+
+def test_budget_used_better_than_rounded_relaxation():
+    """
+    Ensures that the budget is filled closely when the most expensive level
+    takes a large share of each sample.
+    """
+    costs = np.array([1., 30., 400.])
+    variances = np.array([1., .1, .01])
+    budget = 2000.
+
+    sample_sizes = SampleAllocator(costs, variances).minimize_variance(budget)
+
+    assert np.dot(costs, sample_sizes) <= budget
+    assert np.dot(costs, sample_sizes) > budget - costs[0]
+
+
+def test_levels_without_variance_take_minimum():
+    """
+    Ensures that levels with zero variance only receive their minimum
+    sample size.
+    """
+    allocator = SampleAllocator([1., 5.], [1., 0.], [0, 2])
+
+    assert np.array_equal(allocator.minimize_cost(.01), [100, 2])
+    assert np.array_equal(allocator.minimize_variance(20.), [10, 2])
+
+
+def test_lower_bound_when_search_is_stopped():
+    """
+    Ensures that the optimum is bounded when the node limit is reached.
+    """
+    levels = np.arange(8)
+    allocator = SampleAllocator(2. ** levels, 2. ** (-1.5 * levels),
+                                max_nodes=10, relative_gap=0.)
+
+    allocator.minimize_cost(1e-6)
+
+    assert not allocator.is_optimal
+    assert allocator.lower_bound <= allocator.objective
+    assert allocator.objective < 1.001 * allocator.lower_bound
+
+
+def test_rounded_relaxation_accepted_within_relative_gap():
+    """
+    Ensures that the rounded up relaxed sample sizes are returned without a
+    search when their cost is within relative_gap of the relaxed optimum,
+    and that they meet the target variance.
+    """
+    levels = np.arange(8)
+    costs = 2. ** levels
+    variances = 2. ** (-1.5 * levels)
+
+    allocator = SampleAllocator(costs, variances, max_nodes=10,
+                                relative_gap=1e-2)
+    sample_sizes = allocator.minimize_cost(1e-6)
+
+    assert np.array_equal(sample_sizes,
+                          allocator.round_up_cost_relaxation(1e-6))
+    assert allocator._num_nodes == 0
+    assert np.sum(variances / sample_sizes) <= 1e-6 * (1 + 1e-9)
+    assert allocator.objective <= 1.01 * allocator.lower_bound
+
+
+def test_fails_on_bad_parameters():
+    """
+    Ensures that parameters are validated.
+    """
+    with pytest.raises(ValueError):
+        SampleAllocator([1., 2.], [1.])
+
+    with pytest.raises(ValueError):
+        SampleAllocator([1., 0.], [1., 1.])
+
+    with pytest.raises(ValueError):
+        SampleAllocator([1., 2.], [1., -1.])
+
+    with pytest.raises(TypeError):
+        SampleAllocator([1., 2.], [1., 1.], sample_size_multiple=2.)
+
+    with pytest.raises(ValueError):
+        SampleAllocator([1., 2.], [1., 1.], relative_gap=-.1)
+
+    allocator = SampleAllocator([1., 2.], [1., 1.], [5, 5])
+
+    with pytest.raises(ValueError):
+        allocator.minimize_variance(10.)
+
+    with pytest.raises(ValueError):
+        allocator.minimize_cost(0.)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_joint_allocation_meets_every_target(seed):
+    """
+    Ensures that joint sample sizes meet the target of every quantity of
+    interest, cost no more than the largest of the sample sizes for each
+    quantity of interest, and are close to the integer optimum.
+    """
+    np.random.seed(seed)
+
+    costs = np.random.uniform(2., 10., 3)
+    variances = np.random.uniform(0., 5., (3, 4))
+    targets = np.random.uniform(.5, 2., 4)
+
+    allocator = SampleAllocator(costs, variances, [1, 1, 1])
+    sample_sizes = allocator.minimize_joint_cost(targets)
+
+    assert np.all(np.sum(variances / sample_sizes[:, np.newaxis], axis=0) <=
+                  targets * (1 + 1e-9))
+
+    separate_sample_sizes = np.amax(
+        [SampleAllocator(costs, variances[:, i], [1, 1, 1]).minimize_cost(
+            target) for i, target in enumerate(targets)], axis=0)
+
+    assert np.dot(costs, sample_sizes) <= np.dot(costs, separate_sample_sizes)
+
+    optimal_cost = brute_force_allocation(costs, variances, [1, 1, 1], 1,
+                                          targets, True)
+
+    assert allocator.lower_bound <= optimal_cost + 1e-9
+    assert optimal_cost <= np.dot(costs, sample_sizes) <= \
+        optimal_cost + np.sum(costs)
+    assert allocator.objective == np.dot(costs, sample_sizes)
+
+
+def test_joint_allocation_of_single_output_matches_minimize_cost():
+    """
+    Ensures that joint sample sizes for one quantity of interest cost about
+    as much as the optimal sample sizes.
+    """
+    costs = np.array([1., 5., 25.])
+    variances = np.array([4., .5, .01])
+
+    optimal_sample_sizes = \
+        SampleAllocator(costs, variances).minimize_cost(.01)
+    joint_sample_sizes = \
+        SampleAllocator(costs, variances).minimize_joint_cost([.01])
+
+    assert np.dot(costs, joint_sample_sizes) <= \
+        np.dot(costs, optimal_sample_sizes) + np.sum(costs)
+
+
+def test_joint_allocation_fails_on_bad_targets():
+    """
+    Ensures that targets are validated for joint allocations, and that the
+    single output allocations reject several quantities of interest.
+    """
+    allocator = SampleAllocator([1., 2.], np.ones((2, 3)))
+
+    with pytest.raises(ValueError):
+        allocator.minimize_joint_cost([1., 1.])
+
+    with pytest.raises(ValueError):
+        allocator.minimize_joint_cost([1., 0., 1.])
+
+    with pytest.raises(ValueError):
+        allocator.minimize_cost(1.)
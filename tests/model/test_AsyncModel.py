@@ -0,0 +1,44 @@
+import pytest
+import numpy as np
+
+from MLMCPy.model import AsyncModel
+from tests.testing_scripts import AsyncModelForTesting
+from tests.testing_scripts import ModelForTesting
+
+
+def test_evaluate_requires_evaluate_async():
+    """
+    Ensures that AsyncModel subclasses must implement evaluate_async().
+    """
+    class IncompleteModel(AsyncModel):
+        pass
+
+    with pytest.raises(NotImplementedError):
+        IncompleteModel().evaluate(np.zeros(1))
+
+
+def test_evaluate_waits_for_result():
+    """
+    Ensures that evaluate() returns the output of the started evaluation and
+    leaves no evaluations in flight.
+    """
+    model = AsyncModelForTesting(ModelForTesting('repeat'))
+
+    output = model.evaluate(np.array([.5, 2.]))
+
+    assert np.array_equal(output, [.5, 2.])
+    assert model.num_in_flight == 0
+    assert model.max_num_in_flight == 1
+
+
+def test_evaluate_batch_uses_evaluate_async():
+    """
+    Ensures that the default evaluate_batch() is available to async models.
+    """
+    model = AsyncModelForTesting(ModelForTesting('repeat'))
+    samples = np.random.random((5, 2))
+
+    outputs = model.evaluate_batch(samples)
+
+    assert np.array_equal(outputs, samples)
+    assert model.num_in_flight == 0
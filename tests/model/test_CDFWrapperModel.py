@@ -109,6 +109,9 @@ def test_init_fails_on_bad_parameters(spring_model, grid_0_1):
     with pytest.raises(TypeError):
         CDFWrapperModel(spring_model, grid_0_1, "Super smooth")
 
+    with pytest.raises(TypeError):
+        CDFWrapperModel(spring_model, grid_0_1, exceedance=1)
+
 
 @pytest.mark.parametrize('sample', [0, -1, .5, 2.])
 def test_simple_indicator(grid_0_1, sample):
@@ -162,6 +165,29 @@ def test_evaluate_returns_expected_results_from_data(data_input, num_samples,
     assert np.isclose(cdf_sum, 1., atol=.01)
 
 
+@pytest.mark.parametrize('num_samples', [1, 5, 100])
+def test_evaluate_batch_matches_evaluate(data_input, models_from_data,
+                                         num_samples):
+    """
+    Ensures that evaluating a block of samples with evaluate_batch produces
+    the same indicators as evaluating each sample individually.
+    """
+    grid = np.linspace(8, 25, 100)
+
+    cdfw = CDFWrapperModel(models_from_data[1], grid)
+
+    input_samples = data_input.draw_samples(num_samples)
+
+    expected_outputs = np.zeros((num_samples, grid.size))
+    for i, sample in enumerate(input_samples):
+        expected_outputs[i] = cdfw.evaluate(sample)
+
+    batch_outputs = cdfw.evaluate_batch(input_samples)
+
+    assert batch_outputs.shape == expected_outputs.shape
+    assert np.array_equal(batch_outputs, expected_outputs)
+
+
 @pytest.mark.parametrize('model_num', [0, 1, 2])
 def test_single_cdf_wrapper_output_consistency(data_input, models_from_data,
                                                model_num):
@@ -298,3 +324,48 @@ def test_sim_evaluate_returns_expected_results_from_data(initial_sample_size,
     # Verify that area under function sums to one.
     cdf_sum = np.sum(cdf[1:-1] - cdf[:-2])
     assert np.isclose(cdf_sum, 1., atol=.05)
+
+
+def test_exceedance_indicators_complement_cdf_indicators(data_input,
+                                                         models_from_data):
+    """
+    Ensures that exceedance indicators are those of outputs above each grid
+    point, for both evaluate and evaluate_batch.
+    """
+    grid = np.linspace(8, 25, 20)
+
+    cdfw = CDFWrapperModel(models_from_data[0], grid)
+    exceedance_cdfw = CDFWrapperModel(models_from_data[0], grid,
+                                      exceedance=True)
+
+    samples = data_input.draw_samples(50)
+
+    indicators = cdfw.evaluate_batch(samples)
+    exceedance_indicators = exceedance_cdfw.evaluate_batch(samples)
+
+    assert np.array_equal(exceedance_indicators, 1. - indicators)
+
+    for sample, expected_indicators in zip(samples, exceedance_indicators):
+        assert np.array_equal(exceedance_cdfw.evaluate(sample),
+                              expected_indicators)
+
+
+def test_nan_outputs_counted_alike_by_evaluate_and_batch():
+    """
+    Ensures that NaN outputs give the same indicators from evaluate and
+    evaluate_batch, in both modes.
+    """
+    samples = np.array([[1.], [np.nan], [3.]])
+    grid = np.array([0., 2., 4.])
+
+    for exceedance in [False, True]:
+
+        cdfw = CDFWrapperModel(ModelForTesting('repeat'), grid,
+                               exceedance=exceedance)
+
+        expected_indicators = np.array([cdfw.evaluate(sample)
+                                        for sample in samples])
+
+        assert np.array_equal(cdfw.evaluate_batch(samples),
+                              expected_indicators)
+        assert not np.any(expected_indicators[1])
@@ -0,0 +1,288 @@
+import pytest
+import numpy as np
+import os
+import threading
+
+from MLMCPy.model import CachingModel
+from MLMCPy.model import Model
+from MLMCPy.model import ModelFromData
+from MLMCPy.input import InputFromData
+from MLMCPy.mlmc import MLMCSimulator
+from tests.testing_scripts import NestedSpringMassModel
+
+my_path = os.path.dirname(os.path.abspath(__file__))
+data_path = my_path + "/../testing_data"
+
+
+class CountingModel(Model):
+    """
+    Model returning the sum and product of its inputs that counts the number
+    of samples it has evaluated.
+    """
+    def __init__(self):
+        self.num_evaluations = 0
+
+    def evaluate(self, sample):
+        self.num_evaluations += 1
+        return np.array([np.sum(sample), np.prod(sample)])
+
+    def evaluate_batch(self, samples):
+        self.num_evaluations += samples.shape[0]
+        return np.column_stack((np.sum(samples, axis=1),
+                                np.prod(samples, axis=1)))
+
+
+@pytest.fixture
+def data_input():
+    """
+    Creates an InputFromData object that produces samples from a file
+    containing spring mass input data.
+    """
+    return InputFromData(os.path.join(data_path, "spring_mass_1D_inputs.txt"),
+                         shuffle_data=False)
+
+
+@pytest.fixture
+def models_from_data():
+    """
+    Creates a list of three ModelFromData objects of increasing fidelity.
+    """
+    input_filepath = os.path.join(data_path, "spring_mass_1D_inputs.txt")
+    output1_filepath = os.path.join(data_path, "spring_mass_1D_outputs_1.0.txt")
+    output2_filepath = os.path.join(data_path, "spring_mass_1D_outputs_0.1.txt")
+    output3_filepath = os.path.join(data_path,
+                                    "spring_mass_1D_outputs_0.01.txt")
+
+    model1 = ModelFromData(input_filepath, output1_filepath, cost=1.)
+    model2 = ModelFromData(input_filepath, output2_filepath, cost=4.)
+    model3 = ModelFromData(input_filepath, output3_filepath, cost=16.)
+
+    return [model1, model2, model3]
+
+
+def test_repeated_samples_evaluated_once():
+    """
+    Ensures that repeated samples are answered from the cache and that hits
+    and misses are counted.
+    """
+    inner_model = CountingModel()
+    model = CachingModel(inner_model)
+
+    samples = np.array([[1., 2.], [3., 4.], [1., 2.]])
+
+    for sample in samples:
+        output = model.evaluate(sample)
+        assert np.array_equal(output, inner_model.evaluate(sample))
+
+    assert inner_model.num_evaluations == 5
+    assert model.hits == 1
+    assert model.misses == 2
+    assert len(model) == 2
+
+
+def test_returned_outputs_do_not_alter_cache():
+    """
+    Ensures that modifying a returned output does not change cached values.
+    """
+    model = CachingModel(CountingModel())
+    sample = np.array([1., 2.])
+
+    output = model.evaluate(sample)
+    output -= 10.
+
+    assert np.array_equal(model.evaluate(sample), [3., 2.])
+
+
+def test_evaluate_batch_only_evaluates_missing_samples():
+    """
+    Ensures that evaluate_batch passes only distinct uncached samples to the
+    inner model and returns outputs in sample order.
+    """
+    inner_model = CountingModel()
+    model = CachingModel(inner_model)
+
+    model.evaluate(np.array([3., 4.]))
+
+    samples = np.array([[1., 2.], [3., 4.], [1., 2.], [5., 6.]])
+    outputs = model.evaluate_batch(samples)
+
+    expected_outputs = np.column_stack((np.sum(samples, axis=1),
+                                        np.prod(samples, axis=1)))
+
+    assert np.array_equal(outputs, expected_outputs)
+    assert inner_model.num_evaluations == 3
+    assert model.hits == 2
+    assert model.misses == 3
+
+
+def test_least_recently_used_entry_evicted():
+    """
+    Ensures that the least recently used output is discarded once the maximum
+    number of entries is exceeded.
+    """
+    inner_model = CountingModel()
+    model = CachingModel(inner_model, max_entries=2)
+
+    model.evaluate(np.array([1.]))
+    model.evaluate(np.array([2.]))
+
+    # Use the first sample again so that the second is least recently used.
+    model.evaluate(np.array([1.]))
+    model.evaluate(np.array([3.]))
+
+    assert len(model) == 2
+
+    model.evaluate(np.array([1.]))
+    assert model.hits == 2
+
+    model.evaluate(np.array([2.]))
+    assert model.misses == 4
+
+
+def test_max_bytes_limit():
+    """
+    Ensures that the total size of cached outputs stays within max_bytes.
+    """
+    output_bytes = CountingModel().evaluate(np.zeros(1)).nbytes
+
+    model = CachingModel(CountingModel(), max_bytes=3 * output_bytes)
+
+    for value in range(10):
+        model.evaluate(np.array([float(value)]))
+
+    assert len(model) == 3
+    assert model._cache_bytes == 3 * output_bytes
+
+
+def test_clear():
+    """
+    Ensures that clear() empties the cache and resets the counters.
+    """
+    model = CachingModel(CountingModel())
+    model.evaluate(np.array([1.]))
+    model.evaluate(np.array([1.]))
+
+    model.clear()
+
+    assert len(model) == 0
+    assert model.hits == 0
+    assert model.misses == 0
+
+
+def test_simulation_with_caching_models(data_input, models_from_data):
+    """
+    Ensures that simulations with caching models match simulations without
+    them and that repeated simulations are answered from the caches.
+    """
+    sim = MLMCSimulator(models=models_from_data, data=data_input)
+    expected_estimates, expected_sample_sizes, expected_variances = \
+        sim.simulate(epsilon=.1, initial_sample_sizes=50)
+
+    caching_models = [CachingModel(model) for model in models_from_data]
+
+    sim = MLMCSimulator(models=caching_models, data=data_input)
+    estimates, sample_sizes, variances = \
+        sim.simulate(epsilon=.1, initial_sample_sizes=50)
+
+    assert caching_models[0].hits > 0
+    assert np.array_equal(expected_sample_sizes, sample_sizes)
+    assert np.array_equal(expected_estimates, estimates)
+    assert np.array_equal(expected_variances, variances)
+
+    # Outputs of a repeated simulation are already cached.
+    misses = [model.misses for model in caching_models]
+    sim.simulate(epsilon=.1, initial_sample_sizes=50)
+
+    assert [model.misses for model in caching_models] == misses
+
+
+def test_evaluate_pair_forwarded_and_cached():
+    """
+    Ensures that the evaluate_pair function and pair_cost of the inner model
+    are kept, that both outputs of a pair are cached, and that wrappers of
+    models without evaluate_pair do not provide it.
+    """
+    inner_model = NestedSpringMassModel(mass=1.5, time_step=0.1,
+                                        coarse_time_step=1.0, cost=10.,
+                                        pair_cost=11.)
+    model = CachingModel(inner_model)
+
+    assert hasattr(model, 'evaluate_pair')
+    assert model.pair_cost == 11.
+
+    sample = np.array([2.5])
+    expected_output, expected_lower_level_output = \
+        inner_model.evaluate_pair(sample)
+
+    for _ in range(2):
+        output, lower_level_output = model.evaluate_pair(sample)
+
+        assert np.array_equal(output, expected_output)
+        assert np.array_equal(lower_level_output, expected_lower_level_output)
+
+    assert model.misses == 1
+    assert model.hits == 1
+
+    # Pairs do not answer evaluate().
+    model.evaluate(sample)
+    assert model.misses == 2
+
+    assert not hasattr(CachingModel(CountingModel()), 'evaluate_pair')
+    assert not hasattr(CachingModel(CountingModel()), 'pair_cost')
+
+
+def test_concurrent_evaluation_from_threads():
+    """
+    Ensures that evaluating overlapping samples from several threads at once
+    returns the right outputs and keeps the cache within its limits.
+    """
+    model = CachingModel(CountingModel(), max_entries=50)
+    samples = np.arange(200.).reshape(100, 2)
+    errors = []
+
+    def evaluate(offset):
+        try:
+            for i in range(500):
+                sample = samples[(offset + i) % len(samples)]
+                output = model.evaluate(sample)
+
+                assert np.array_equal(output, [np.sum(sample),
+                                               np.prod(sample)])
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=evaluate, args=(offset,))
+               for offset in range(0, 80, 10)]
+
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+
+    for thread in threads:
+        thread.join(30.)
+
+    assert not any(thread.is_alive() for thread in threads)
+    assert errors == []
+
+    output_bytes = CountingModel().evaluate(np.zeros(2)).nbytes
+
+    assert len(model) == 50
+    assert model._cache_bytes == 50 * output_bytes
+    assert model.hits + model.misses == 8 * 500
+
+
+def test_init_fails_on_bad_parameters():
+    """
+    Ensures that invalid parameters are rejected.
+    """
+    with pytest.raises(TypeError):
+        CachingModel("Model")
+
+    with pytest.raises(TypeError):
+        CachingModel(CountingModel(), max_entries=1.5)
+
+    with pytest.raises(ValueError):
+        CachingModel(CountingModel(), max_entries=0)
+
+    with pytest.raises(ValueError):
+        CachingModel(CountingModel(), max_bytes=-1)
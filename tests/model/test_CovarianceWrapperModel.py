@@ -76,3 +76,17 @@ def test_covariance_end_to_end():
     assert covariance[2] == pytest.approx(0)
     assert covariance[4] == pytest.approx(0)
     assert covariance[5] == pytest.approx(0)
+
+
+@pytest.mark.parametrize("output_size", range(1, 5))
+def test_evaluate_batch_matches_evaluate(output_size):
+    model = DummyModel(output_size)
+    covariance_model = CovarianceWrapperModel(model)
+
+    samples = np.random.random((10, 1))
+    expected_outputs = np.array([covariance_model.evaluate(sample)
+                                 for sample in samples])
+
+    batch_outputs = covariance_model.evaluate_batch(samples)
+
+    np.testing.assert_array_almost_equal(batch_outputs, expected_outputs)
@@ -0,0 +1,275 @@
+import gc
+import pytest
+import numpy as np
+import os
+import sys
+import threading
+import time
+
+from MLMCPy.model import ExternalCommandModel
+from MLMCPy.input import RandomInput
+from MLMCPy.mlmc import MLMCSimulator
+from tests.testing_scripts import ExecutorForTesting
+from tests.testing_scripts import ModelForTesting
+
+my_path = os.path.dirname(os.path.abspath(__file__))
+solver_path = os.path.join(my_path, "..", "testing_scripts", "line_solver.py")
+
+
+@pytest.fixture
+def solver_command():
+    """
+    Command template that runs the testing solver with the current Python
+    interpreter.
+    """
+    return [sys.executable, solver_path, '{scale}']
+
+
+@pytest.fixture
+def random_input_2d():
+    """
+    Creates a seeded RandomInput object that produces two dimensional samples.
+    """
+    def uniform_2d(size):
+        return np.random.uniform(size=(size, 2))
+
+    return RandomInput(uniform_2d, random_seed=1)
+
+
+def expected_output(sample, scale):
+    sample = np.atleast_1d(sample)
+    return np.hstack((scale * sample, np.sum(sample)))
+
+
+@pytest.mark.parametrize('sample', [np.array([1.5]), np.array([.1, 2., 3.]),
+                                    2.])
+def test_evaluate(solver_command, sample):
+    """
+    Ensures that samples are sent to the solver and its outputs are parsed
+    into ndarrays.
+    """
+    with ExternalCommandModel(solver_command, scale=2.) as model:
+
+        output = model.evaluate(sample)
+
+    assert isinstance(output, np.ndarray)
+    assert np.allclose(output, expected_output(sample, 2.))
+
+
+def test_command_string_template(solver_command):
+    """
+    Ensures that a command given as a string is filled in and split into
+    arguments.
+    """
+    command = ' '.join(solver_command)
+
+    with ExternalCommandModel(command, scale=3.) as model:
+
+        output = model.evaluate(np.array([1., 2.]))
+
+    assert np.allclose(output, [3., 6., 3.])
+
+
+@pytest.mark.parametrize('num_workers', [1, 3])
+def test_out_of_order_results(solver_command, num_workers):
+    """
+    Ensures that outputs are matched to their samples regardless of the order
+    in which results are requested.
+    """
+    samples = np.random.random((10, 2))
+
+    with ExternalCommandModel(solver_command, num_workers=num_workers,
+                              scale=2.) as model:
+
+        handles = [model.evaluate_async(sample) for sample in samples]
+        outputs = [handle.result() for handle in reversed(handles)]
+
+    for sample, output in zip(reversed(samples), outputs):
+        assert np.allclose(output, expected_output(sample, 2.))
+
+
+@pytest.mark.parametrize('num_workers', [1, 4])
+def test_evaluate_batch(solver_command, num_workers):
+    """
+    Ensures that evaluate_batch returns one row of outputs per sample in
+    sample order.
+    """
+    samples = np.random.random((25, 3))
+
+    with ExternalCommandModel(solver_command, num_workers=num_workers,
+                              scale=.5) as model:
+
+        outputs = model.evaluate_batch(samples)
+
+    expected_outputs = np.array([expected_output(sample, .5)
+                                 for sample in samples])
+
+    assert np.allclose(outputs, expected_outputs)
+
+
+def test_simulation_with_external_models(solver_command, random_input_2d):
+    """
+    Ensures that ExternalCommandModels produce the same simulation results as
+    equivalent models evaluated in this process.
+    """
+    class ScaleModel(ModelForTesting):
+
+        def __init__(self, scale, cost):
+            self._scale = scale
+            self.cost = cost
+
+        def evaluate(self, sample):
+            return expected_output(sample, self._scale)
+
+    reference_models = [ScaleModel(1., 1.), ScaleModel(1.1, 2.)]
+    sim = MLMCSimulator(models=reference_models, data=random_input_2d)
+    expected_estimates, expected_sample_sizes, expected_variances = \
+        sim.simulate(epsilon=.05, initial_sample_sizes=10)
+
+    external_models = [ExternalCommandModel(solver_command, num_workers=2,
+                                            cost=cost, scale=scale)
+                       for scale, cost in [[1., 1.], [1.1, 2.]]]
+
+    sim = MLMCSimulator(models=external_models, data=random_input_2d)
+    estimates, sample_sizes, variances = \
+        sim.simulate_async(epsilon=.05, initial_sample_sizes=10)
+
+    for model in external_models:
+        model.close()
+
+    assert np.array_equal(expected_sample_sizes, sample_sizes)
+    assert np.allclose(expected_estimates, estimates)
+    assert np.allclose(expected_variances, variances)
+
+
+def test_solver_exit_raises_error(solver_command):
+    """
+    Ensures that an error is raised if the solver exits without producing an
+    output.
+    """
+    model = ExternalCommandModel(solver_command, scale=1.)
+
+    with pytest.raises(RuntimeError):
+        model.evaluate(np.array([-1.]))
+
+    model.close()
+
+
+def wait_for_exit(processes, timeout=10.):
+    """
+    Returns whether all processes exit within the timeout.
+    """
+    end_time = time.time() + timeout
+
+    while time.time() < end_time:
+        if all(process.poll() is not None for process in processes):
+            return True
+
+        time.sleep(.01)
+
+    return False
+
+
+def test_solver_processes_stopped_on_error_in_with_block(solver_command):
+    """
+    Ensures that the solver processes exit when an error leaves a with block.
+    """
+    with pytest.raises(ValueError):
+        with ExternalCommandModel(solver_command, num_workers=2,
+                                  scale=1.) as model:
+
+            processes = [worker._process for worker in model._workers]
+            raise ValueError("Simulation failed.")
+
+    assert wait_for_exit(processes)
+
+
+def test_solver_processes_stopped_without_close(solver_command):
+    """
+    Ensures that the solver processes of models that are not closed exit
+    when the model is garbage collected or the interpreter exits.
+    """
+    model = ExternalCommandModel(solver_command, num_workers=2, scale=1.)
+    processes = [worker._process for worker in model._workers]
+
+    del model
+    gc.collect()
+
+    assert wait_for_exit(processes)
+
+    model = ExternalCommandModel(solver_command, num_workers=2, scale=1.)
+    processes = [worker._process for worker in model._workers]
+
+    # Called by atexit when the interpreter exits.
+    sys.modules[ExternalCommandModel.__module__]._close_all_workers()
+
+    assert wait_for_exit(processes)
+
+    model.close()
+
+
+@pytest.mark.parametrize('command, num_workers, error',
+                         [[5, 1, TypeError],
+                          [[], 1, ValueError],
+                          [['solver'], 0, ValueError],
+                          [['solver'], 1.5, TypeError]])
+def test_init_fails_on_bad_parameters(command, num_workers, error):
+    """
+    Ensures that invalid parameters are rejected.
+    """
+    with pytest.raises(error):
+        ExternalCommandModel(command, num_workers=num_workers)
+
+
+def test_concurrent_evaluation_from_threads(solver_command):
+    """
+    Ensures that samples evaluated from many threads at once on a single
+    solver process each receive their own output.
+    """
+    samples = np.random.random((50, 2))
+    outputs = [None] * len(samples)
+
+    def evaluate(index):
+        outputs[index] = model.evaluate(samples[index])
+
+    with ExternalCommandModel(solver_command, scale=2.) as model:
+
+        threads = [threading.Thread(target=evaluate, args=(index,))
+                   for index in range(len(samples))]
+
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+
+        for thread in threads:
+            thread.join(10.)
+
+        assert not any(thread.is_alive() for thread in threads)
+
+    for sample, output in zip(samples, outputs):
+        assert np.allclose(output, expected_output(sample, 2.))
+
+
+def test_simulation_with_thread_executor(solver_command, random_input_2d):
+    """
+    Ensures that a simulation submitting model evaluations to threads gives
+    the same results with ExternalCommandModels as without an executor.
+    """
+    models = [ExternalCommandModel(solver_command, cost=cost, scale=scale)
+              for scale, cost in [[1., 1.], [1.1, 2.]]]
+
+    sim = MLMCSimulator(models=models, data=random_input_2d)
+    expected_estimates, expected_sample_sizes, expected_variances = \
+        sim.simulate(epsilon=.05, initial_sample_sizes=10)
+
+    sim = MLMCSimulator(models=models, data=random_input_2d, batch_size=3,
+                        executor=ExecutorForTesting())
+    estimates, sample_sizes, variances = \
+        sim.simulate(epsilon=.05, initial_sample_sizes=10)
+
+    for model in models:
+        model.close()
+
+    assert np.array_equal(expected_sample_sizes, sample_sizes)
+    assert np.allclose(expected_estimates, estimates)
+    assert np.allclose(expected_variances, variances)
@@ -0,0 +1,36 @@
+from MLMCPy.model.AsyncModel import AsyncModel
+
+
+class HandleForTesting(object):
+
+    def __init__(self, model, sample):
+
+        self._model = model
+        self._sample = sample
+
+    def result(self):
+
+        self._model.num_in_flight -= 1
+
+        return self._model.inner_model.evaluate(self._sample)
+
+
+class AsyncModelForTesting(AsyncModel):
+    """
+    Wraps a model and tracks the number of evaluations in flight at once.
+    """
+    def __init__(self, inner_model):
+
+        self.inner_model = inner_model
+        self.cost = getattr(inner_model, 'cost', None)
+
+        self.num_in_flight = 0
+        self.max_num_in_flight = 0
+
+    def evaluate_async(self, sample):
+
+        self.num_in_flight += 1
+        self.max_num_in_flight = max(self.max_num_in_flight,
+                                     self.num_in_flight)
+
+        return HandleForTesting(self, sample)
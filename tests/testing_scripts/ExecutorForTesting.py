@@ -0,0 +1,53 @@
+import random
+import sys
+import threading
+import time
+
+
+class FutureForTesting(object):
+    """
+    Runs a task in its own thread. As with a concurrent.futures.Future, an
+    exception raised by the task is raised again by result().
+    """
+    def __init__(self, function, args):
+
+        self._result = None
+        self._exc_info = None
+        self._thread = threading.Thread(target=self._run,
+                                        args=(function, args))
+        self._thread.start()
+
+    def _run(self, function, args):
+
+        # Finish tasks in an arbitrary order.
+        time.sleep(random.random() * .001)
+
+        try:
+            self._result = function(*args)
+        except Exception:
+            self._exc_info = sys.exc_info()
+
+    def result(self):
+
+        self._thread.join()
+
+        if self._exc_info is not None:
+            raise self._exc_info[0], self._exc_info[1], self._exc_info[2]
+
+        return self._result
+
+
+class ExecutorForTesting(object):
+    """
+    Minimal stand in for a concurrent.futures.Executor that runs each
+    submitted task in its own thread.
+    """
+    def __init__(self):
+
+        self.num_submitted = 0
+
+    def submit(self, function, *args):
+
+        self.num_submitted += 1
+
+        return FutureForTesting(function, args)
@@ -1,3 +1,7 @@
+from AsyncModelForTesting import AsyncModelForTesting
+from ExecutorForTesting import ExecutorForTesting
 from InputForTesting import InputForTesting
 from ModelForTesting import ModelForTesting
 from spring_mass import SpringMassModel
+from spring_mass import NestedSpringMassModel
+from spring_mass import BatchSpringMassModel
@@ -0,0 +1,32 @@
+"""
+Stand in for an external solver executable used to test
+ExternalCommandModel. Reads one sample per line from standard input and
+writes the scaled sample values followed by their sum to standard output.
+Exits with an error when it receives a negative value.
+"""
+import sys
+
+
+def main():
+
+    scale = float(sys.argv[1])
+
+    while True:
+
+        line = sys.stdin.readline()
+        if not line:
+            break
+
+        values = [float(value) for value in line.split()]
+
+        if any(value < 0 for value in values):
+            sys.exit(1)
+
+        outputs = [scale * value for value in values] + [sum(values)]
+
+        sys.stdout.write(' '.join(repr(output) for output in outputs) + '\n')
+        sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()